@@ -9,8 +9,22 @@ export type ListCanvasesResponse = {
   created_at: string
 }
 
-export async function listCanvases(): Promise<ListCanvasesResponse[]> {
-  const response = await fetch('/api/canvas/list')
+export type ListCanvasesPage = {
+  canvases: ListCanvasesResponse[]
+  next_cursor: string | null
+}
+
+export const CANVAS_PAGE_SIZE = 24
+
+export async function listCanvases(
+  cursor?: string | null,
+  limit: number = CANVAS_PAGE_SIZE
+): Promise<ListCanvasesPage> {
+  const params = new URLSearchParams({ limit: String(limit) })
+  if (cursor) {
+    params.set('cursor', cursor)
+  }
+  const response = await fetch(`/api/canvas/list?${params}`)
   return await response.json()
 }
 
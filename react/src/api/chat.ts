@@ -7,6 +7,28 @@ export const getChatSession = async (sessionId: string) => {
   return data as Message[]
 }
 
+export const CHAT_PAGE_SIZE = 100
+
+export type ChatSessionPage = {
+  messages: Message[]
+  // Cursor of the older page, null when the whole history is loaded
+  next_cursor: number | null
+}
+
+export const getChatSessionPage = async (
+  sessionId: string,
+  before?: number | null,
+  limit: number = CHAT_PAGE_SIZE
+) => {
+  const params = new URLSearchParams({ limit: String(limit) })
+  if (before != null) {
+    params.set('before', String(before))
+  }
+  const response = await fetch(`/api/chat_session/${sessionId}?${params}`)
+  const data = await response.json()
+  return data as ChatSessionPage
+}
+
 export const sendMessages = async (payload: {
   sessionId: string
   canvasId: string
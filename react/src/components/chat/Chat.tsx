@@ -1,4 +1,4 @@
-import { sendMessages } from '@/api/chat'
+import { getChatSessionPage, sendMessages } from '@/api/chat'
 import Blur from '@/components/common/Blur'
 import { ScrollArea } from '@/components/ui/scroll-area'
 import { eventBus, TEvents } from '@/lib/event'
@@ -42,6 +42,7 @@ import { ModelInfo, ToolInfo } from '@/api/model'
 import { Button } from '@/components/ui/button'
 import { Share2 } from 'lucide-react'
 import { useAuth } from '@/contexts/AuthContext'
+import { useSocket } from '@/contexts/socket'
 import { useQueryClient } from '@tanstack/react-query'
 import MixedContent, { MixedContentImages, MixedContentText } from './Message/MixedContent'
 
@@ -65,6 +66,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({
   const { authStatus } = useAuth()
   const [showShareDialog, setShowShareDialog] = useState(false)
   const queryClient = useQueryClient()
+  const { socketManager, connected } = useSocket()
 
   useEffect(() => {
     if (sessionList.length > 0) {
@@ -81,6 +83,8 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({
   }, [sessionList, searchSessionId])
 
   const [messages, setMessages] = useState<Message[]>([])
+  // Cursor of the older history page, null when everything is loaded
+  const [olderCursor, setOlderCursor] = useState<number | null>(null)
   const [pending, setPending] = useState<PendingType>(
     initCanvas ? 'text' : false
   )
@@ -475,6 +479,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({
     eventBus.on('Socket::Session::ToolCallResult', handleToolCallResult)
     eventBus.on('Socket::Session::ImageGenerated', handleImageGenerated)
     eventBus.on('Socket::Session::AllMessages', handleAllMessages)
+    eventBus.on('Socket::Session::MessagesPatch', handleMessagesPatch)
     eventBus.on('Socket::Session::Done', handleDone)
     eventBus.on('Socket::Session::Error', handleError)
     eventBus.on('Socket::Session::Info', handleInfo)
@@ -502,6 +507,7 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({
       eventBus.off('Socket::Session::ToolCallResult', handleToolCallResult)
       eventBus.off('Socket::Session::ImageGenerated', handleImageGenerated)
       eventBus.off('Socket::Session::AllMessages', handleAllMessages)
+      eventBus.off('Socket::Session::MessagesPatch', handleMessagesPatch)
       eventBus.off('Socket::Session::Done', handleDone)
       eventBus.off('Socket::Session::Error', handleError)
       eventBus.off('Socket::Session::Info', handleInfo)
@@ -515,11 +521,11 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({
 
     sessionIdRef.current = sessionId
 
-    const resp = await fetch('/api/chat_session/' + sessionId)
-    const data = await resp.json()
-    const msgs = data?.length ? data : []
+    const page = await getChatSessionPage(sessionId)
+    const msgs = page?.messages?.length ? page.messages : []
 
     setMessages(mergeToolCallResult(msgs))
+    setOlderCursor(page?.next_cursor ?? null)
     if (msgs.length > 0) {
       setInitCanvas(false)
     }
@@ -531,6 +537,66 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({
     initChat()
   }, [sessionId, initChat])
 
+  const loadEarlierMessages = useCallback(async () => {
+    // Indexes of streamed patches are relative to the loaded list, don't shift it mid-stream
+    if (!sessionId || olderCursor === null || pending) {
+      return
+    }
+    const page = await getChatSessionPage(sessionId, olderCursor)
+    if (sessionIdRef.current !== sessionId) {
+      return
+    }
+
+    // Keep the viewport on the same message while older ones are prepended
+    const scrollEl = scrollRef.current
+    const previousHeight = scrollEl?.scrollHeight ?? 0
+    setMessages((prev) => [...mergeToolCallResult(page.messages), ...prev])
+    setOlderCursor(page.next_cursor)
+    requestAnimationFrame(() => {
+      if (scrollEl) {
+        scrollEl.scrollTop += scrollEl.scrollHeight - previousHeight
+      }
+    })
+  }, [sessionId, olderCursor, pending])
+
+  const lastPatchSeqRef = useRef(0)
+
+  const handleMessagesPatch = useCallback(
+    (data: TEvents['Socket::Session::MessagesPatch']) => {
+      if (data.session_id && data.session_id !== sessionId) {
+        return
+      }
+
+      // start 为 0 是完整快照；否则序号必须连续，出现缺口时请求重新同步
+      if (data.start > 0 && data.seq !== lastPatchSeqRef.current + 1) {
+        socketManager?.resync(data.session_id, (active) => {
+          if (!active) {
+            initChat()
+          }
+        })
+        return
+      }
+      lastPatchSeqRef.current = data.seq
+
+      setMessages(
+        produce((prev) => {
+          prev.splice(data.start)
+          prev.push(...data.messages)
+          mergeToolCallResult(prev)
+        })
+      )
+      scrollToBottom()
+    },
+    [sessionId, socketManager, initChat, scrollToBottom]
+  )
+
+  // Only receive socket events of this canvas and session
+  useEffect(() => {
+    if (connected) {
+      socketManager?.subscribe(canvasId, sessionId)
+    }
+  }, [socketManager, connected, canvasId, sessionId])
+
   const onSelectSession = (sessionId: string) => {
     setSession(sessionList.find((s) => s.id === sessionId) || null)
     window.history.pushState(
@@ -558,6 +624,8 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({
     (data: Message[], configs: { textModel: Model; toolList: ToolInfo[] }) => {
       setPending('text')
       setMessages(data)
+      // The first patch of the new stream continues after `data` with seq 1
+      lastPatchSeqRef.current = 0
 
       sendMessages({
         sessionId: sessionId!,
@@ -619,6 +687,18 @@ const ChatInterface: React.FC<ChatInterfaceProps> = ({
         <ScrollArea className='h-[calc(100vh-45px)]' viewportRef={scrollRef}>
           {messages.length > 0 ? (
             <div className='flex flex-col flex-1 px-4 pb-50 pt-15'>
+              {olderCursor !== null && (
+                <Button
+                  variant='ghost'
+                  size='sm'
+                  className='self-center mb-2'
+                  disabled={!!pending}
+                  onClick={loadEarlierMessages}
+                >
+                  {t('chat:loadEarlierMessages')}
+                </Button>
+              )}
+
               {/* Messages */}
               {messages.map((message, idx) => (
                 <div key={`${idx}`} className='flex flex-col gap-4 mb-2'>
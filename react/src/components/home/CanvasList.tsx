@@ -1,6 +1,7 @@
 import { listCanvases } from '@/api/canvas'
 import CanvasCard from '@/components/home/CanvasCard'
-import { useQuery } from '@tanstack/react-query'
+import { Button } from '@/components/ui/button'
+import { useInfiniteQuery } from '@tanstack/react-query'
 import { useNavigate, useLocation } from '@tanstack/react-router'
 import { AnimatePresence, motion } from 'motion/react'
 import { memo } from 'react'
@@ -11,12 +12,16 @@ const CanvasList: React.FC = () => {
   const location = useLocation()
   const isHomePage = location.pathname === '/'
 
-  const { data: canvases, refetch } = useQuery({
-    queryKey: ['canvases'],
-    queryFn: listCanvases,
-    enabled: isHomePage, // 每次进入首页时都重新查询
-    refetchOnMount: 'always',
-  })
+  const { data, refetch, fetchNextPage, hasNextPage, isFetchingNextPage } =
+    useInfiniteQuery({
+      queryKey: ['canvases'],
+      queryFn: ({ pageParam }) => listCanvases(pageParam),
+      initialPageParam: null as string | null,
+      getNextPageParam: (lastPage) => lastPage.next_cursor,
+      enabled: isHomePage, // 每次进入首页时都重新查询
+      refetchOnMount: 'always',
+    })
+  const canvases = data?.pages.flatMap((page) => page.canvases)
 
   const navigate = useNavigate()
   const handleCanvasClick = (id: string) => {
@@ -49,6 +54,17 @@ const CanvasList: React.FC = () => {
           ))}
         </div>
       </AnimatePresence>
+
+      {hasNextPage && (
+        <Button
+          variant="secondary"
+          className="self-center mb-10"
+          disabled={isFetchingNextPage}
+          onClick={() => fetchNextPage()}
+        >
+          {t('home:loadMore')}
+        </Button>
+      )}
     </div>
   )
 }
@@ -7,12 +7,18 @@ export interface SocketConfig {
   autoConnect?: boolean
 }
 
+export interface SocketSubscription {
+  canvas_id?: string
+  session_id?: string
+}
+
 export class SocketIOManager {
   private socket: Socket | null = null
   private connected = false
   private reconnectAttempts = 0
   private maxReconnectAttempts = 5
   private reconnectDelay = 1000
+  private subscription: SocketSubscription = {}
 
   constructor(private config: SocketConfig = {}) {
     if (config.autoConnect !== false) {
@@ -34,6 +40,9 @@ export class SocketIOManager {
         reconnection: true,
         reconnectionAttempts: this.maxReconnectAttempts,
         reconnectionDelay: this.reconnectDelay,
+        // Evaluated on every (re)connect, so the server puts the socket back
+        // into the current canvas/session rooms
+        auth: (cb) => cb({ ...this.subscription }),
       })
 
       this.socket.on('connect', () => {
@@ -122,9 +131,22 @@ export class SocketIOManager {
       case ISocket.SessionEventType.VideoGenerated:
         eventBus.emit('Socket::Session::VideoGenerated', data)
         break
+      case ISocket.SessionEventType.MediaBatchGenerated:
+        // Replay the batch as single events, placement is already done by the server
+        data.items.forEach((item) =>
+          this.handleSessionUpdate({
+            ...item,
+            session_id: data.session_id,
+            canvas_id: data.canvas_id,
+          } as ISocket.SessionUpdateEvent)
+        )
+        break
       case ISocket.SessionEventType.AllMessages:
         eventBus.emit('Socket::Session::AllMessages', data)
         break
+      case ISocket.SessionEventType.MessagesPatch:
+        eventBus.emit('Socket::Session::MessagesPatch', data)
+        break
       case ISocket.SessionEventType.Done:
         eventBus.emit('Socket::Session::Done', data)
         break
@@ -142,6 +164,25 @@ export class SocketIOManager {
     }
   }
 
+  subscribe(canvasId?: string, sessionId?: string) {
+    this.subscription = { canvas_id: canvasId, session_id: sessionId }
+    if (this.socket && this.connected) {
+      this.socket.emit('subscribe', this.subscription)
+    }
+  }
+
+  // Ask the server to resend the full message list of a streaming session.
+  // `onResult(false)` means the session is not streaming anymore.
+  resync(sessionId: string, onResult: (active: boolean) => void) {
+    if (this.socket && this.connected) {
+      this.socket.emit(
+        'resync',
+        { session_id: sessionId },
+        (res?: { active: boolean }) => onResult(!!res?.active)
+      )
+    }
+  }
+
   ping(data: unknown) {
     if (this.socket && this.connected) {
       this.socket.emit('ping', data)
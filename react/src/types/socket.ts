@@ -8,11 +8,13 @@ export enum SessionEventType {
   Info = 'info',
   ImageGenerated = 'image_generated',
   VideoGenerated = 'video_generated',
+  MediaBatchGenerated = 'media_batch_generated',
   Delta = 'delta',
   ToolCall = 'tool_call',
   ToolCallArguments = 'tool_call_arguments',
   ToolCallResult = 'tool_call_result',
   AllMessages = 'all_messages',
+  MessagesPatch = 'messages_patch',
   ToolCallProgress = 'tool_call_progress',
   ToolCallPendingConfirmation = 'tool_call_pending_confirmation',
   ToolCallConfirmed = 'tool_call_confirmed',
@@ -48,6 +50,15 @@ export interface SessionVideoGeneratedEvent extends SessionBaseEvent {
   canvas_id: string
   video_url: string
 }
+export interface SessionMediaBatchGeneratedEvent extends SessionBaseEvent {
+  type: SessionEventType.MediaBatchGenerated
+  canvas_id: string
+  // Each item is an image_generated / video_generated event of the same canvas
+  items: (
+    | Omit<SessionImageGeneratedEvent, 'session_id' | 'canvas_id'>
+    | Omit<SessionVideoGeneratedEvent, 'session_id' | 'canvas_id'>
+  )[]
+}
 
 export interface SessionDeltaEvent extends SessionBaseEvent {
   type: SessionEventType.Delta
@@ -72,6 +83,16 @@ export interface SessionAllMessagesEvent extends SessionBaseEvent {
   type: SessionEventType.AllMessages
   messages: Message[]
 }
+// Replaces messages[start:] with `messages`; `seq` increases by one per patch
+// of a stream starting at 1, a patch with start === 0 is a full snapshot. The
+// first patch of a stream starts after the messages the client posted
+export interface SessionMessagesPatchEvent extends SessionBaseEvent {
+  type: SessionEventType.MessagesPatch
+  seq: number
+  start: number
+  total: number
+  messages: Message[]
+}
 export interface SessionToolCallProgressEvent extends SessionBaseEvent {
   type: SessionEventType.ToolCallProgress
   tool_call_id: string
@@ -103,7 +124,9 @@ export type SessionUpdateEvent =
   | SessionToolCallProgressEvent
   | SessionImageGeneratedEvent
   | SessionVideoGeneratedEvent
+  | SessionMediaBatchGeneratedEvent
   | SessionAllMessagesEvent
+  | SessionMessagesPatchEvent
   | SessionDoneEvent
   | SessionErrorEvent
   | SessionInfoEvent
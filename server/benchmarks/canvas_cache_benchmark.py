@@ -0,0 +1,80 @@
+"""
+Benchmark: GET /api/canvas/{id} with and without the canvas document cache
+
+For canvases of 100, 1k and 10k elements, measures db_service.get_canvas_data:
+- cold:   the document is dropped from the cache before every call, so the
+          rows are read and parsed from SQLite and sessions are listed
+- cached: the parsed document is served from the cache
+and the cost of a generated image append while the canvas is cached.
+
+Run from the server directory:
+    python -m benchmarks.canvas_cache_benchmark --sizes 100 1000 10000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# Point the services at a throwaway data dir before they are imported
+os.environ.setdefault("USER_DATA_DIR", tempfile.mkdtemp(prefix="jaaz_bench_"))
+
+from services.db_service import db_service  # noqa: E402
+
+
+def _element(i: int):
+    return {
+        "id": f"el_{i}", "type": "image", "x": (i % 4) * 532, "y": (i // 4) * 532,
+        "width": 512, "height": 512, "fileId": f"file_{i}", "version": 1, "versionNonce": i,
+    }
+
+
+async def _ms(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+async def main(sizes, repeat: int) -> None:
+    await db_service.initialize()
+    try:
+        print(f"{'elements':>9} {'cold ms':>9} {'cached ms':>10} {'append ms':>10}")
+        for n in sizes:
+            canvas_id = f"bench_{n}"
+            await db_service.create_canvas(canvas_id, canvas_id)
+            await db_service.create_chat_session(f"session_{n}", "model", "provider", canvas_id, "bench")
+            await db_service.save_canvas_data(canvas_id, {
+                "elements": [_element(i) for i in range(n)],
+                "files": {f"file_{i}": {"id": f"file_{i}", "dataURL": f"/api/file/{i}.png"} for i in range(n)},
+                "appState": {},
+            })
+
+            async def cold():
+                db_service._canvas_documents.drop(canvas_id)
+                await db_service.get_canvas_data(canvas_id)
+
+            cold_ms = await _ms(cold, repeat)
+            await db_service.get_canvas_data(canvas_id)
+            cached_ms = await _ms(lambda: db_service.get_canvas_data(canvas_id), repeat)
+
+            counter = iter(range(n, n + repeat))
+
+            async def append():
+                i = next(counter)
+                await db_service.append_canvas_elements(canvas_id, [_element(i)], {f"file_{i}": {"id": f"file_{i}"}})
+
+            append_ms = await _ms(append, repeat)
+            print(f"{n:>9} {cold_ms:>9.3f} {cached_ms:>10.3f} {append_ms:>10.3f}")
+        print(db_service.get_canvas_cache_stats())
+    finally:
+        await db_service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
@@ -0,0 +1,183 @@
+"""
+Benchmark: next element position, original O(n^2) row grouping vs CanvasSpatialIndex
+
+For canvases of 100, 1k and 10k media elements, measures:
+- original: find_next_best_element_position as it was before the index
+- rebuild:  building a CanvasSpatialIndex from the elements and querying it
+- indexed:  placing `--placements` new elements one after another on a
+            warm index (query + upsert, as save_image_to_canvas does)
+
+Every run also checks that the index returns the same positions as the
+original algorithm, on generated layouts and on randomly shuffled ones.
+
+Run from the server directory:
+    python -m benchmarks.canvas_position_benchmark --sizes 100 1000 10000
+"""
+
+import argparse
+import random
+import time
+from typing import Any, Dict, List
+
+from utils.canvas import CanvasSpatialIndex
+
+
+def original_position(elements: List[Dict[str, Any]], max_num_per_row=4, spacing=20):
+    """find_next_best_element_position before the spatial index"""
+    media_elements = [
+        e for e in elements
+        if e.get("type") in ["image", "embeddable", "video"] and not e.get("isDeleted")
+    ]
+    if not media_elements:
+        return 0, 0
+    media_elements.sort(key=lambda e: (e.get("y", 0), e.get("x", 0)))
+    rows: List[List[Dict[str, Any]]] = []
+    for element in media_elements:
+        y, height = element.get("y", 0), element.get("height", 0)
+        placed = False
+        for row in rows:
+            if any(max(y, r.get("y", 0)) < min(y + height, r.get("y", 0) + r.get("height", 0)) for r in row):
+                row.append(element)
+                placed = True
+                break
+        if not placed:
+            rows.append([element])
+    rows.sort(key=lambda row: sum(e.get("y", 0) for e in row) / len(row))
+    last_row = rows[-1]
+    last_row.sort(key=lambda e: e.get("x", 0))
+    if len(last_row) < max_num_per_row:
+        rightmost_element = last_row[-1]
+        return rightmost_element.get("x", 0) + rightmost_element.get("width", 0) + spacing, min(e.get("y", 0) for e in last_row)
+    return 0, max(e.get("y", 0) + e.get("height", 0) for e in last_row) + spacing
+
+
+def _new_element(i: int, x: float, y: float, rng: random.Random) -> Dict[str, Any]:
+    return {
+        "id": f"el_{i}",
+        "type": rng.choice(["image", "image", "video", "embeddable"]),
+        "x": x,
+        "y": y,
+        "width": rng.choice([256, 512, 768, 1024]),
+        "height": rng.choice([256, 512, 768, 1024]),
+    }
+
+
+def generated_canvas(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """A canvas filled the way generated media is placed, with some text in between"""
+    rng = random.Random(seed)
+    index = CanvasSpatialIndex()
+    elements: List[Dict[str, Any]] = []
+    for i in range(n):
+        x, y = index.next_position()
+        element = _new_element(i, x, y, rng)
+        elements.append(element)
+        index.upsert(element, len(elements) - 1)
+        if rng.random() < 0.1:
+            elements.append({"id": f"text_{i}", "type": "text", "x": x, "y": y, "width": 100, "height": 20})
+    return elements
+
+
+def random_canvas(n: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    elements = []
+    for i in range(n):
+        element = _new_element(i, rng.randrange(0, 4000, 10), rng.randrange(0, 4000, 10), rng)
+        element["height"] = rng.choice([0, 100, 256, 512])
+        element["isDeleted"] = rng.random() < 0.05
+        elements.append(element)
+    return elements
+
+
+def check_equivalence(rounds: int = 300) -> None:
+    for seed in range(rounds):
+        elements = random_canvas(random.Random(seed).randint(0, 60), seed)
+        expected = original_position(elements)
+        actual = CanvasSpatialIndex(elements).next_position()
+        assert expected == actual, (seed, expected, actual)
+
+        # Incremental updates must match a fresh computation too
+        index = CanvasSpatialIndex(elements)
+        rng = random.Random(seed)
+        for step in range(20):
+            if elements and rng.random() < 0.3:
+                moved = dict(rng.choice(elements), y=rng.randrange(0, 4000, 10))
+                elements = [moved if e["id"] == moved["id"] else e for e in elements]
+                index.upsert(moved)
+            else:
+                x, y = index.next_position()
+                element = _new_element(1000 + step, x, y, rng)
+                elements.append(element)
+                index.upsert(element, len(elements) - 1)
+            assert index.next_position() == original_position(elements), (seed, step)
+    print(f"✅ index matches the original layout on {rounds} random canvases")
+
+
+def check_batch_equivalence(rounds: int = 100, batch: int = 16) -> None:
+    for seed in range(rounds):
+        elements = random_canvas(random.Random(seed).randint(0, 60), seed)
+        rng = random.Random(seed)
+        sizes = [(rng.choice([256, 512]), rng.choice([0, 256, 512])) for _ in range(batch)]
+        positions = CanvasSpatialIndex(elements).next_positions(sizes)
+        placed = list(elements)
+        for i, (width, height) in enumerate(sizes):
+            x, y = original_position(placed)
+            assert (x, y) == positions[i], (seed, i)
+            placed.append({"id": f"batch_{i}", "type": "image", "x": x, "y": y, "width": width, "height": height})
+    print(f"✅ next_positions matches placing one by one on {rounds} random canvases")
+
+
+def sequential_batch(elements: List[Dict[str, Any]], sizes) -> List[Any]:
+    """How ComfyUI outputs were placed: a fresh layout of canvas_data per output"""
+    canvas_elements = list(elements)
+    positions = []
+    for i, (width, height) in enumerate(sizes):
+        x, y = CanvasSpatialIndex(canvas_elements).next_position()
+        positions.append((x, y))
+        canvas_elements.append({"id": f"batch_{i}", "type": "image", "x": x, "y": y, "width": width, "height": height})
+    return positions
+
+
+def _ms(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main(sizes: List[int], placements: int, batch: int) -> None:
+    check_equivalence()
+    check_batch_equivalence(batch=batch)
+    print(f"{'elements':>9} {'original ms':>12} {'rebuild ms':>11} {'indexed ms/placement':>21}")
+    for n in sizes:
+        elements = generated_canvas(n)
+        assert original_position(elements) == CanvasSpatialIndex(elements).next_position()
+        original_ms = _ms(lambda: original_position(elements), 1 if n > 1000 else 5)
+        rebuild_ms = _ms(lambda: CanvasSpatialIndex(elements).next_position(), 5)
+
+        index = CanvasSpatialIndex(elements)
+        rng = random.Random(n)
+        start = time.perf_counter()
+        for i in range(placements):
+            x, y = index.next_position()
+            index.upsert(_new_element(n + i, x, y, rng), len(elements) + i)
+        indexed_ms = (time.perf_counter() - start) * 1000 / placements
+        print(f"{n:>9} {original_ms:>12.3f} {rebuild_ms:>11.3f} {indexed_ms:>21.4f}")
+
+    print(f"\n{'elements':>9} {f'sequential x{batch} ms':>20} {f'next_positions x{batch} ms':>24}")
+    for n in sizes:
+        elements = generated_canvas(n)
+        index = CanvasSpatialIndex(elements)
+        sizes_batch = [(512, 512)] * batch
+        assert sequential_batch(elements, sizes_batch) == index.next_positions(sizes_batch)
+        sequential_ms = _ms(lambda: sequential_batch(elements, sizes_batch), 1 if n > 1000 else 5)
+        batch_ms = _ms(lambda: index.next_positions(sizes_batch), 20)
+        print(f"{n:>9} {sequential_ms:>20.3f} {batch_ms:>24.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--placements", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=16)
+    args = parser.parse_args()
+    main(args.sizes, args.placements, args.batch)
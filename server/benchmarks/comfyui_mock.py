@@ -0,0 +1,178 @@
+"""
+Local stand-in for a ComfyUI server
+
+Implements the parts of the ComfyUI API jaaz uses, on aiohttp:
+- GET /ws?clientId=...: status events on connect and whenever the queue
+  changes, executing / progress / executed events of the prompts queued
+  with that client_id
+- POST /prompt, GET /queue, GET /history/{prompt_id}, GET /view
+- POST /upload/image, GET /object_info/{class_type} (ckpt_name choices are
+  the `models` of the mock)
+Both the plain and the /api prefixed paths are served. Prompts run one at
+a time, each node takes `node_seconds`.
+
+    python -m benchmarks.comfyui_mock --port 8188 --models a.safetensors
+"""
+
+import argparse
+import asyncio
+import base64
+import uuid
+from typing import Any, Dict, List, Optional
+
+from aiohttp import WSMsgType, web
+
+# 1x1 transparent PNG served by /view
+PNG_1X1 = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==')
+
+
+class MockComfyUI:
+    def __init__(self, port: int, models: Optional[List[str]] = None, node_seconds: float = 0.05):
+        self.port = port
+        self.models = list(models or [])
+        self.node_seconds = node_seconds
+        self.url = f'http://127.0.0.1:{port}'
+        self._sockets: Dict[str, web.WebSocketResponse] = {}
+        self._pending: 'asyncio.Queue[str]' = asyncio.Queue()
+        self._prompts: Dict[str, Dict[str, Any]] = {}
+        self._queue: List[str] = []
+        self._history: Dict[str, Any] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self._worker: Optional['asyncio.Task[None]'] = None
+        # instrumentation
+        self.executed = 0
+        self.uploads: List[str] = []
+        self.upload_bytes = 0
+
+    async def start(self) -> None:
+        app = web.Application(client_max_size=1024 ** 3)
+        for prefix in ('', '/api'):
+            app.router.add_get(f'{prefix}/ws', self._ws)
+            app.router.add_get(f'{prefix}/prompt', self._get_prompt)
+            app.router.add_post(f'{prefix}/prompt', self._post_prompt)
+            app.router.add_get(f'{prefix}/queue', self._get_queue)
+            app.router.add_get(f'{prefix}/history/{{prompt_id}}', self._get_history)
+            app.router.add_get(f'{prefix}/view', self._view)
+            app.router.add_post(f'{prefix}/upload/image', self._upload)
+            app.router.add_get(f'{prefix}/object_info/{{class_type}}', self._object_info)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '127.0.0.1', self.port).start()
+        self._worker = asyncio.create_task(self._work())
+
+    async def stop(self) -> None:
+        """Shut down like a crashed server: sockets closed, queue lost"""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for ws in list(self._sockets.values()):
+            await ws.close()
+        self._sockets.clear()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        self._queue.clear()
+        self._pending = asyncio.Queue()
+
+    async def _send(self, client_id: Optional[str], message: Dict[str, Any]) -> None:
+        ws = self._sockets.get(client_id or '')
+        if ws is not None and not ws.closed:
+            await ws.send_json(message)
+
+    def _status(self) -> Dict[str, Any]:
+        return {'type': 'status', 'data': {'status': {'exec_info': {'queue_remaining': len(self._queue)}}}}
+
+    async def _broadcast_status(self) -> None:
+        for client_id in list(self._sockets):
+            await self._send(client_id, self._status())
+
+    async def _ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client_id = request.query.get('clientId', str(uuid.uuid4()))
+        self._sockets[client_id] = ws
+        await ws.send_json(self._status())
+        async for message in ws:
+            if message.type == WSMsgType.ERROR:
+                break
+        self._sockets.pop(client_id, None)
+        return ws
+
+    async def _get_prompt(self, request: web.Request) -> web.Response:
+        return web.json_response({'exec_info': {'queue_remaining': len(self._queue)}})
+
+    async def _post_prompt(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        prompt_id = str(uuid.uuid4())
+        self._prompts[prompt_id] = body
+        self._queue.append(prompt_id)
+        self._pending.put_nowait(prompt_id)
+        await self._broadcast_status()
+        return web.json_response({'prompt_id': prompt_id, 'number': len(self._queue), 'node_errors': {}})
+
+    async def _get_queue(self, request: web.Request) -> web.Response:
+        items = [[i, prompt_id, self._prompts[prompt_id]['prompt'], {}, []]
+                 for i, prompt_id in enumerate(self._queue)]
+        return web.json_response({'queue_running': items[:1], 'queue_pending': items[1:]})
+
+    async def _get_history(self, request: web.Request) -> web.Response:
+        prompt_id = request.match_info['prompt_id']
+        if prompt_id not in self._history:
+            return web.json_response({})
+        return web.json_response({prompt_id: self._history[prompt_id]})
+
+    async def _view(self, request: web.Request) -> web.Response:
+        return web.Response(body=PNG_1X1, content_type='image/png')
+
+    async def _upload(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        image = form['image']
+        data = image.file.read()  # type: ignore
+        self.uploads.append(image.filename)  # type: ignore
+        self.upload_bytes += len(data)
+        return web.json_response({'name': image.filename, 'subfolder': form.get('subfolder', ''), 'type': 'input'})  # type: ignore
+
+    async def _object_info(self, request: web.Request) -> web.Response:
+        class_type = request.match_info['class_type']
+        return web.json_response({class_type: {'input': {'required': {
+            'ckpt_name': [list(self.models), {}],
+        }}}})
+
+    async def _work(self) -> None:
+        while True:
+            prompt_id = await self._pending.get()
+            body = self._prompts[prompt_id]
+            client_id = body.get('client_id')
+            workflow: Dict[str, Any] = body['prompt']
+            outputs: Dict[str, Any] = {}
+            for node_id in workflow:
+                await self._send(client_id, {'type': 'executing', 'data': {'node': node_id, 'prompt_id': prompt_id}})
+                await asyncio.sleep(self.node_seconds)
+            # The last node saves one image
+            node_id = list(workflow)[-1]
+            output = {'images': [{'filename': f'{prompt_id}.png', 'subfolder': '', 'type': 'output'}]}
+            outputs[node_id] = output
+            await self._send(client_id, {'type': 'executed', 'data': {
+                'node': node_id, 'output': output, 'prompt_id': prompt_id}})
+            self._history[prompt_id] = {'outputs': outputs, 'status': {'completed': True}}
+            self._queue.remove(prompt_id)
+            self.executed += 1
+            await self._send(client_id, {'type': 'executing', 'data': {'node': None, 'prompt_id': prompt_id}})
+            await self._broadcast_status()
+
+
+async def main(port: int, models: List[str], node_seconds: float) -> None:
+    mock = MockComfyUI(port, models, node_seconds)
+    await mock.start()
+    print(f'Mock ComfyUI listening on {mock.url}')
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8188)
+    parser.add_argument('--models', nargs='*', default=['v1-5-pruned-emaonly.safetensors'])
+    parser.add_argument('--node-seconds', type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main(args.port, args.models, args.node_seconds))
@@ -0,0 +1,87 @@
+"""
+Load test: ComfyUI jobs spread over several backends by comfy_scheduler
+
+Starts `--backends` mock ComfyUI servers (benchmarks.comfyui_mock). Only
+the first `--with-model` of them have the checkpoint the workflow loads.
+Runs `--jobs` concurrent executions over the pool, then the same with one
+backend shut down while the jobs are running, and prints per backend
+stats of the scheduler:
+- jobs should only land on backends that have the model
+- jobs of the stopped backend should be requeued and still complete
+
+Run from the server directory:
+    python -m benchmarks.comfyui_scheduler_benchmark --backends 3 --jobs 12
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import routers.comfyui_execution as comfyui_execution
+from benchmarks.comfyui_mock import MockComfyUI
+from routers.comfyui_execution import execute
+from services.comfyui_scheduler import comfy_scheduler
+from services.comfyui_ws_service import comfy_connections
+
+MODEL = 'v1-5-pruned-emaonly.safetensors'
+WORKFLOW = {
+    '4': {'class_type': 'CheckpointLoaderSimple', 'inputs': {'ckpt_name': MODEL}},
+    '6': {'class_type': 'CLIPTextEncode', 'inputs': {'text': 'a cat', 'clip': ['4', 1]}},
+    '3': {'class_type': 'KSampler', 'inputs': {'seed': 1, 'model': ['4', 0]}},
+    '9': {'class_type': 'SaveImage', 'inputs': {'images': ['3', 0]}},
+}
+
+
+async def _run_jobs(urls: list[str], jobs: int) -> tuple[float, int]:
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *[execute(WORKFLOW, urls) for _ in range(jobs)], return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    completed = sum(1 for result in results if not isinstance(result, BaseException) and result.outputs)
+    return elapsed, completed
+
+
+async def main(backends: int, with_model: int, jobs: int, node_seconds: float, port: int) -> None:
+    mocks = [
+        MockComfyUI(port + i, [MODEL] if i < with_model else ['other.safetensors'], node_seconds)
+        for i in range(backends)
+    ]
+    for mock in mocks:
+        await mock.start()
+    urls = [mock.url for mock in mocks]
+
+    try:
+        elapsed, completed = await _run_jobs(urls[:1], jobs)
+        print(f'1 backend:  {completed}/{jobs} jobs in {elapsed:.2f}s')
+
+        before = [mock.executed for mock in mocks]
+        elapsed, completed = await _run_jobs(urls, jobs)
+        print(f'{backends} backends: {completed}/{jobs} jobs in {elapsed:.2f}s, '
+              f'executed per backend: {[mock.executed - n for mock, n in zip(mocks, before)]}')
+
+        # Shut down a backend with the model while its jobs are running,
+        # don't wait long for it to come back
+        comfyui_execution.RECONNECT_GRACE = 2
+        run = asyncio.create_task(_run_jobs(urls, jobs))
+        await asyncio.sleep(node_seconds * 6)
+        await mocks[0].stop()
+        elapsed, completed = await run
+        print(f'1 backend stopped: {completed}/{jobs} jobs in {elapsed:.2f}s')
+
+        print(json.dumps(comfy_scheduler.get_stats(), indent=2))
+    finally:
+        await comfy_connections.close()
+        for mock in mocks:
+            await mock.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backends', type=int, default=3)
+    parser.add_argument('--with-model', type=int, default=2)
+    parser.add_argument('--jobs', type=int, default=12)
+    parser.add_argument('--node-seconds', type=float, default=0.05)
+    parser.add_argument('--port', type=int, default=58188)
+    args = parser.parse_args()
+    asyncio.run(main(args.backends, args.with_model, args.jobs, args.node_seconds, args.port))
@@ -0,0 +1,119 @@
+"""
+Micro-benchmark: per-call aiosqlite.connect() vs pooled connections
+
+Runs the hot DatabaseService methods (create_message, get_canvas_data,
+save_canvas_data, list_sessions) against a throwaway database, once with a
+fresh connection per call (the old behaviour) and once through the pool.
+
+Run from the server directory:
+    python -m benchmarks.db_pool_benchmark --iterations 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+# Point the services at a throwaway data dir before they are imported
+os.environ.setdefault("USER_DATA_DIR", tempfile.mkdtemp(prefix="jaaz_bench_"))
+
+import aiosqlite  # noqa: E402
+from services.db_service import db_service  # noqa: E402
+
+CANVAS_ID = "bench_canvas"
+SESSION_ID = "bench_session"
+
+
+async def _per_call_create_message(session_id: str, role: str, message: str):
+    async with aiosqlite.connect(db_service.db_path) as db:
+        await db.execute("""
+            INSERT INTO chat_messages (session_id, role, message)
+            VALUES (?, ?, ?)
+        """, (session_id, role, message))
+        await db.commit()
+
+
+async def _per_call_list_sessions(canvas_id: str):
+    async with aiosqlite.connect(db_service.db_path) as db:
+        db.row_factory = sqlite3.Row
+        cursor = await db.execute("""
+            SELECT id, title, model, provider, created_at, updated_at
+            FROM chat_sessions
+            WHERE canvas_id = ?
+            ORDER BY updated_at DESC
+        """, (canvas_id,))
+        return [dict(row) for row in await cursor.fetchall()]
+
+
+async def _per_call_get_canvas_data(id: str):
+    async with aiosqlite.connect(db_service.db_path) as db:
+        db.row_factory = sqlite3.Row
+        cursor = await db.execute(
+            "SELECT data, name FROM canvases WHERE id = ?", (id,))
+        row = await cursor.fetchone()
+    sessions = await _per_call_list_sessions(id)
+    return {'data': json.loads(row['data']) if row['data'] else {}, 'name': row['name'], 'sessions': sessions}
+
+
+async def _per_call_save_canvas_data(id: str, data: str):
+    # Whole-blob rewrite, as DatabaseService did before the pool
+    async with aiosqlite.connect(db_service.db_path) as db:
+        await db.execute("""
+            UPDATE canvases
+            SET data = ?, updated_at = STRFTIME('%Y-%m-%dT%H:%M:%fZ', 'now')
+            WHERE id = ?
+        """, (data, id))
+        await db.commit()
+
+
+async def _time(label: str, iterations: int, fn) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        await fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<34} {elapsed * 1000 / iterations:8.3f} ms/call")
+    return elapsed
+
+
+async def main(iterations: int) -> None:
+    await db_service.initialize()
+    await db_service.create_canvas(CANVAS_ID, "Benchmark canvas")
+    await db_service.create_chat_session(SESSION_ID, "gpt-4o", "openai", CANVAS_ID, "bench")
+    canvas_doc = {"elements": [{"id": f"el_{i}", "x": i, "y": i} for i in range(200)], "files": {}}
+    canvas_blob = json.dumps(canvas_doc)
+    await db_service.save_canvas_data(CANVAS_ID, canvas_doc)
+    message = json.dumps({"role": "assistant", "content": "x" * 512})
+
+    cases = [
+        ("create_message",
+         lambda i: _per_call_create_message(SESSION_ID, "assistant", message),
+         lambda i: db_service.create_message(SESSION_ID, "assistant", message)),
+        ("get_canvas_data",
+         lambda i: _per_call_get_canvas_data(CANVAS_ID),
+         lambda i: db_service.get_canvas_data(CANVAS_ID)),
+        ("save_canvas_data",
+         lambda i: _per_call_save_canvas_data(CANVAS_ID, canvas_blob),
+         lambda i: db_service.save_canvas_data(CANVAS_ID, canvas_doc)),
+        ("list_sessions",
+         lambda i: _per_call_list_sessions(CANVAS_ID),
+         lambda i: db_service.list_sessions(CANVAS_ID)),
+    ]
+
+    print(f"DB: {db_service.db_path}, iterations: {iterations}")
+    for name, per_call, pooled in cases:
+        print(name)
+        baseline = await _time("per-call aiosqlite.connect()", iterations, per_call)
+        optimized = await _time("pooled connection", iterations, pooled)
+        print(f"  speedup: {baseline / optimized:.1f}x")
+
+    await db_service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
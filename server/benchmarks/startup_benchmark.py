@@ -0,0 +1,90 @@
+"""
+Cold start check: time to import the server, and what it imports
+
+Imports main.py in `--runs` fresh interpreters and reports the median time.
+Fails (exit code 1) if
+- the median is above `--max-seconds`, or
+- a module that must load on first use was imported at startup: the tool
+  modules of the registry, the image and video providers, the video
+  generation package and pymediainfo, the ComfyUI workflow tools
+
+Run from the server directory:
+    python -m benchmarks.startup_benchmark --runs 5 --max-seconds 4
+Add --profile to print the import time per module of one run.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Modules (prefixes) the server must not import before they are used
+LAZY_MODULES = (
+    'tools.generate_',
+    'tools.image_providers.',
+    'tools.video_providers.',
+    'tools.video_generation',
+    'pymediainfo',
+    'tools.utils.image_generation_core',
+    'tools.comfy_dynamic',
+    'replicate',
+)
+
+_CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print("__STARTUP__" + json.dumps({"seconds": elapsed, "modules": sorted(sys.modules)}))
+'''
+
+
+def _run_once(profile: bool) -> dict:
+    env = dict(os.environ)
+    env['USER_DATA_DIR'] = tempfile.mkdtemp(prefix='jaaz_startup_')
+    env.setdefault('OPENAI_API_KEY', 'x')
+    if profile:
+        env['JAAZ_PROFILE_STARTUP'] = '1'
+        child = 'from utils import startup_profile\n' + _CHILD + 'startup_profile.report()\n'
+    else:
+        child = _CHILD
+    result = subprocess.run([sys.executable, '-c', child], env=env, capture_output=True,
+                            text=True, encoding='utf-8', errors='replace')
+    if result.returncode != 0:
+        raise RuntimeError(f'import main failed:\n{result.stderr[-2000:]}')
+    if profile:
+        print(result.stdout[result.stdout.index('⏱️'):])
+    line = next(line for line in result.stdout.splitlines() if line.startswith('__STARTUP__'))
+    return json.loads(line[len('__STARTUP__'):])
+
+
+def main(runs: int, max_seconds: float, profile: bool) -> int:
+    results = [_run_once(profile and i == 0) for i in range(runs)]
+    times = [result['seconds'] for result in results]
+    median = statistics.median(times)
+    print(f"import main: median {median:.3f}s, min {min(times):.3f}s, max {max(times):.3f}s over {runs} runs, "
+          f"{len(results[0]['modules'])} modules")
+
+    failed = False
+    eager = [m for m in results[0]['modules'] if m.startswith(LAZY_MODULES)]
+    if eager:
+        print(f"❌ Imported at startup but should load on first use: {', '.join(eager)}")
+        failed = True
+    if median > max_seconds:
+        print(f"❌ Cold start {median:.3f}s is above the limit of {max_seconds:.3f}s")
+        failed = True
+    if not failed:
+        print('✅ Cold start OK')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=4.0)
+    parser.add_argument('--profile', action='store_true')
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.max_seconds, args.profile))
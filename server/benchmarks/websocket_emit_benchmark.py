@@ -0,0 +1,92 @@
+"""
+Load test: cost of session_update emits vs number of connected clients
+
+Starts the socket.io server in-process with uvicorn, connects N clients that
+each subscribe to their own canvas/session, then streams `--events` token
+deltas to one session and measures, for both broadcast modes:
+- average time spent in broadcast_session_update per event
+- how many events were delivered in total (legacy delivers to every client)
+
+Run from the server directory:
+    python -m benchmarks.websocket_emit_benchmark --clients 1 10 50 100
+"""
+
+import argparse
+import asyncio
+import time
+
+import socketio  # type: ignore
+import uvicorn
+
+import routers.websocket_router  # noqa: F401  registers connect/subscribe handlers
+import services.websocket_service as websocket_service
+from services.websocket_state import sio, get_connection_count
+
+HOST = "127.0.0.1"
+
+
+async def _connect_clients(url: str, n: int, received: list[int]) -> list[socketio.AsyncClient]:
+    clients = []
+    for i in range(n):
+        client = socketio.AsyncClient(reconnection=False)
+
+        def make_handler(index: int):
+            async def on_session_update(data):
+                received[index] += 1
+            return on_session_update
+
+        client.on("session_update", make_handler(i))
+        await client.connect(url, transports=["websocket"],
+                             auth={"canvas_id": f"canvas_{i}", "session_id": f"session_{i}"})
+        clients.append(client)
+    while get_connection_count() < n:
+        await asyncio.sleep(0.01)
+    return clients
+
+
+async def _run_mode(mode: str, events: int, received: list[int]) -> float:
+    websocket_service.BROADCAST_MODE = mode
+    for i in range(len(received)):
+        received[i] = 0
+    start = time.perf_counter()
+    for _ in range(events):
+        await websocket_service.broadcast_session_update(
+            "session_0", "canvas_0", {"type": "delta", "text": "token"})
+    elapsed = time.perf_counter() - start
+    # Let in-flight packets reach the clients before counting
+    await asyncio.sleep(0.5)
+    return elapsed * 1000 / events
+
+
+async def main(client_counts: list[int], events: int, port: int) -> None:
+    app = socketio.ASGIApp(sio, socketio_path="/socket.io")
+    server = uvicorn.Server(uvicorn.Config(app, host=HOST, port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    url = f"http://{HOST}:{port}"
+    print(f"{'clients':>8} {'mode':>7} {'ms/event':>9} {'delivered':>10}")
+    try:
+        for n in client_counts:
+            received = [0] * n
+            clients = await _connect_clients(url, n, received)
+            for mode in ("legacy", "rooms"):
+                ms_per_event = await _run_mode(mode, events, received)
+                print(f"{n:>8} {mode:>7} {ms_per_event:>9.3f} {sum(received):>10}")
+            for client in clients:
+                await client.disconnect()
+            while get_connection_count() > 0:
+                await asyncio.sleep(0.01)
+    finally:
+        server.should_exit = True
+        await serve_task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--port", type=int, default=57999)
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.events, args.port))
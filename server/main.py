@@ -4,10 +4,14 @@ import io
 # Ensure stdout and stderr use utf-8 encoding to prevent emoji logs from crashing python server
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+# Startup profiling mode (JAAZ_PROFILE_STARTUP=1 or --profile-startup): must be enabled before the imports below
+from utils import startup_profile
+if startup_profile.requested():
+    startup_profile.enable()
 print('Importing websocket_router')
 from routers.websocket_router import *  # DO NOT DELETE THIS LINE, OTHERWISE, WEBSOCKET WILL NOT WORK
 print('Importing routers')
-from routers import config_router, image_router, root_router, workspace, canvas, ssl_test, chat_router, settings, tool_confirmation
+from routers import config_router, image_router, root_router, workspace, canvas, ssl_test, chat_router, settings, tool_confirmation, metrics
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi import FastAPI
@@ -24,10 +28,20 @@ print('Importing config_service')
 from services.config_service import config_service
 print('Importing tool_service')
 from services.tool_service import tool_service
+print('Importing db_service')
+from services.db_service import db_service
+from services.message_journal import message_journal
+from utils.http_client import HttpClient
+from services.comfyui_ws_service import comfy_connections
+import asyncio
 
 async def initialize():
     print('Initializing config_service')
     await config_service.initialize()
+    print('Initializing db_service')
+    await db_service.initialize()
+    print('Opening shared HTTP clients')
+    await HttpClient.open()
     print('Initializing broadcast_init_done')
     await broadcast_init_done()
 
@@ -39,8 +53,22 @@ async def lifespan(app: FastAPI):
     # TODO: Check if there will be racing conditions when user send chat request but tools and models are not initialized yet.
     await initialize()
     await tool_service.initialize()
+    startup_profile.mark('lifespan initialized')
+    if startup_profile.is_enabled():
+        startup_profile.report()
+        startup_profile.disable()
+    # Tool modules are imported on first use, warm them up in the background (TOOL_PRELOAD=0 disables)
+    preload_task = None
+    if os.environ.get('TOOL_PRELOAD', '1') != '0':
+        preload_task = asyncio.create_task(tool_service.preload())
     yield
     # onshutdown
+    if preload_task is not None and not preload_task.done():
+        preload_task.cancel()
+    await message_journal.flush()
+    await db_service.close()
+    await comfy_connections.close()
+    await HttpClient.close()
 
 print('Creating FastAPI app')
 app = FastAPI(lifespan=lifespan)
@@ -56,6 +84,7 @@ app.include_router(image_router.router)
 app.include_router(ssl_test.router)
 app.include_router(chat_router.router)
 app.include_router(tool_confirmation.router)
+app.include_router(metrics.router)
 
 # Mount the React build directory
 react_build_dir = os.environ.get('UI_DIST_DIR', os.path.join(
@@ -88,6 +117,7 @@ async def serve_react_app():
 
 print('Creating socketio app')
 socket_app = socketio.ASGIApp(sio, other_asgi_app=app, socketio_path='/socket.io')
+startup_profile.mark('main imported')
 
 if __name__ == "__main__":
     # bypass localhost request for proxy, fix ollama proxy issue
@@ -100,6 +130,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--port', type=int, default=57988,
                         help='Port to run the server on')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Report the import time of each module at startup')
     args = parser.parse_args()
     import uvicorn
     print("🌟Starting server, UI_DIST_DIR:", os.environ.get('UI_DIST_DIR'))
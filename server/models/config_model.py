@@ -1,5 +1,7 @@
 from pydantic import BaseModel
-from typing import Literal, TypedDict
+from typing import Literal
+# pydantic (FastAPI response models) needs typing_extensions.TypedDict on Python < 3.12
+from typing_extensions import TypedDict
 
 class LLMConfig(BaseModel):
     model: str
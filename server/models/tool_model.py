@@ -1,20 +1,23 @@
-from typing import Optional, TypedDict
+from typing import Optional
+# pydantic (FastAPI response models) needs typing_extensions.TypedDict on Python < 3.12
+from typing_extensions import TypedDict
 from langchain_core.tools import BaseTool
 
 class ToolInfoRequired(TypedDict):
-    tool_function: BaseTool
     provider: str
 
 class ToolInfoOptional(TypedDict, total=False):
     display_name: Optional[str]
     type: Optional[str]
 
-class ToolInfo(ToolInfoRequired, ToolInfoOptional):
-    pass
+class ToolInfo(ToolInfoRequired, ToolInfoOptional, total=False):
+    # The tool itself, or the dotted path it is imported from on first use
+    tool_function: BaseTool
+    import_path: str
 
 class ToolInfoJsonRequired(TypedDict):
     provider: str
     id: str
 
 class ToolInfoJson(ToolInfoJsonRequired, ToolInfoOptional):
-    pass
\ No newline at end of file
+    pass
@@ -1,15 +1,40 @@
-from fastapi import APIRouter, Request
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
 #from routers.agent import chat
 from services.chat_service import handle_chat
 from services.db_service import db_service
+from services.canvas_write_service import canvas_write_coordinator
+from services.thumbnail_service import get_thumbnail_file, store_thumbnail
 import asyncio
-import json
 
 router = APIRouter(prefix="/api/canvas")
 
+# Thumbnail files are content-addressed, a URL never changes content
+THUMBNAIL_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
 @router.get("/list")
-async def list_canvases():
-    return await db_service.list_canvases()
+async def list_canvases(limit: Optional[int] = Query(None, ge=1, le=200), cursor: Optional[str] = None):
+    try:
+        canvases, next_cursor = await db_service.list_canvases(limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if limit is None and cursor is None:
+        # Unpaginated callers get the plain list, as before
+        return canvases
+    return {"canvases": canvases, "next_cursor": next_cursor}
+
+@router.get("/thumbnail/{name}")
+async def get_thumbnail(name: str, request: Request):
+    stored = get_thumbnail_file(name)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    path, content_hash = stored
+    headers = {"ETag": f'"{content_hash}"', "Cache-Control": THUMBNAIL_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match", "")
+    if headers["ETag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers)
 
 @router.post("/create")
 async def create_canvas(request: Request):
@@ -28,8 +53,11 @@ async def get_canvas(id: str):
 @router.post("/{id}/save")
 async def save_canvas(id: str, request: Request):
     payload = await request.json()
-    data_str = json.dumps(payload['data'])
-    await db_service.save_canvas_data(id, data_str, payload['thumbnail'])
+    # Inline data: URLs are written once as files, only the URL is stored
+    thumbnail = await store_thumbnail(payload.get('thumbnail'))
+    # Don't interleave a full save with elements being appended by generations
+    async with canvas_write_coordinator.lock(id):
+        await db_service.save_canvas_data(id, payload['data'], thumbnail)
     return {"id": id }
 
 @router.post("/{id}/rename")
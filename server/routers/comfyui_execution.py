@@ -8,15 +8,21 @@ import urllib.parse
 import uuid
 from datetime import timedelta
 import asyncio
+from typing import Awaitable, Callable, List, Optional, Union
 
 import httpx
 import websockets
-import typer
 from rich import print as pprint
 from rich.progress import BarColumn, Column, Progress, Table, TimeElapsedColumn
 from utils.http_client import HttpClient
 
 from services.websocket_service import send_to_websocket
+from services.comfyui_ws_service import comfy_connections, DISCONNECTED, RECONNECTED
+from services.comfyui_scheduler import comfy_scheduler, ComfyBackendError
+
+# How long a running execution waits for a dropped websocket to come back
+# before the job is given up on this backend and requeued
+RECONNECT_GRACE = 30
 
 
 async def check_comfy_server_running(base_url):
@@ -28,23 +34,58 @@ async def check_comfy_server_running(base_url):
 
 async def execute(
     workflow: dict,
-    base_url,
+    base_url: Union[str, List[str]],
     wait=True,
     verbose=False,
     local_paths=False,
     timeout=300,
     ctx: dict = {},
+    prepare: Optional[Callable[[str], Awaitable[dict]]] = None,
 ):
-    if not await check_comfy_server_running(base_url):
+    """
+    Run a workflow on one ComfyUI server, or on the best one of a pool.
+
+    base_url can be a list of ComfyUI base URLs: comfy_scheduler picks one by
+    health, model locality and queue depth and requeues the job on the next
+    one if the backend fails. prepare(base_url), if given, returns the workflow
+    to run on the chosen backend (e.g. after uploading input images to it).
+    """
+    urls = [base_url] if isinstance(base_url, str) else list(base_url)
+
+    async def execute_on(url: str):
+        return await _execute_on(
+            workflow, url, wait, verbose, local_paths, timeout, ctx, prepare
+        )
+
+    try:
+        return await comfy_scheduler.run(urls, workflow, execute_on)
+    except ComfyBackendError as e:
         pprint(
-            f"[bold red]ComfyUI not running on specified address ({base_url})[/bold red]"
+            f"[bold red]ComfyUI not available on specified address ({', '.join(urls)}): {e}[/bold red]"
         )
-        raise typer.Exit(code=1)
+        raise
+
+
+async def _execute_on(
+    workflow: dict,
+    base_url: str,
+    wait,
+    verbose,
+    local_paths,
+    timeout,
+    ctx: dict,
+    prepare: Optional[Callable[[str], Awaitable[dict]]],
+):
+    if prepare is not None:
+        try:
+            workflow = await prepare(base_url)
+        except httpx.TransportError as e:
+            raise ComfyBackendError(f"{base_url}: {e}") from e
 
     progress = None
     start = time.time()
     if wait:
-        pprint("Executing comfyui workflow")
+        pprint(f"Executing comfyui workflow on {base_url}")
         progress = ExecutionProgress()
         # Remove or comment out the line below to avoid starting the live display
         # progress.start()
@@ -77,6 +118,8 @@ async def execute(
             )
         else:
             pprint("[bold green]Workflow queued[/bold green]")
+    except httpx.TransportError as e:
+        raise ComfyBackendError(f"{base_url}: {e}") from e
     finally:
         if progress:
             progress.stop()
@@ -136,21 +179,18 @@ class WorkflowExecution:
         self.progress_task = None
         self.progress_node = None
         self.prompt_id = None
-        self.ws = None
+        self.connection = None
+        self.messages = None
         self.timeout = timeout
         self.ctx = ctx
 
     async def connect(self):
-        if self.base_url.startswith("https"):
-            self.ws_core = "wss://"
-        else:
-            self.ws_core = "ws://"
-        ws_url = self.base_url.split("//")[1]
-        if "/" in ws_url:
-            ws_url = ws_url.split("/")[0]
-        self.ws = await websockets.connect(
-            f"{self.ws_core}{ws_url}/ws?clientId={self.client_id}"
-        )
+        # Events are received on the shared connection of the ComfyUI server,
+        # prompts are queued with its client_id
+        self.connection = comfy_connections.get(self.base_url)
+        if not await self.connection.ensure_connected(timeout=10):
+            raise ComfyBackendError(f"Could not connect to ComfyUI websocket at {self.base_url}")
+        self.client_id = self.connection.client_id
 
     async def queue(self):
         data = {"prompt": self.workflow, "client_id": self.client_id}
@@ -159,6 +199,8 @@ class WorkflowExecution:
                 response = await client.post(f"{self.base_url}/prompt", json=data)
                 body = response.json()
                 self.prompt_id = body["prompt_id"]
+                if self.connection is not None:
+                    self.messages = self.connection.subscribe(self.prompt_id)
             except httpx.HTTPStatusError as e:
                 message = "An unknown error occurred"
                 if e.response.status_code == 500:
@@ -177,26 +219,65 @@ class WorkflowExecution:
                 raise Exception(message)
 
     async def watch_execution(self):
-        async for message in self.ws:
-            if isinstance(message, str):
-                message = json.loads(message)
-                if message.get("data", {}).get("prompt_id") != self.prompt_id:
+        try:
+            while True:
+                message = await self.messages.get()
+                if message is DISCONNECTED:
+                    # The backend may be gone: give it a moment, else requeue the job
+                    if not await self.connection.ensure_connected(timeout=RECONNECT_GRACE):
+                        raise ComfyBackendError(f"Lost the websocket of {self.base_url}")
+                    continue
+                if message is RECONNECTED:
+                    # Events may have been lost while disconnected
+                    if await self.fetch_history():
+                        break
+                    if not await self.is_queued():
+                        # e.g. ComfyUI restarted: the prompt is gone
+                        raise ComfyBackendError(f"Prompt {self.prompt_id} was lost by {self.base_url}")
                     continue
                 if not await self.on_message(message):
-                    # get task_id and check if task_id is saved to prompt
-                    async with HttpClient.create() as client:
-                        try:
-                            response = await client.get(f"{self.base_url}/history/{self.prompt_id}")
-                            if response.status_code != 200:
-                                raise Exception(response)
-                            response_body = response.json()
-                            if self.prompt_id in response_body:
-                                break
-                            else:
-                                continue
-                        except Exception as e:
-                            pprint(f"[bold red]Error getting history\n{str(e)}[/bold red]")
-                            raise Exception(message)
+                    # Completion signal: one history fetch for the final outputs
+                    await self.fetch_history()
+                    break
+        finally:
+            self.connection.unsubscribe(self.prompt_id)
+
+    async def fetch_history(self):
+        """Returns True if the prompt finished, outputs missed on the websocket are added"""
+        async with HttpClient.create() as client:
+            try:
+                response = await client.get(f"{self.base_url}/history/{self.prompt_id}")
+                if response.status_code != 200:
+                    raise Exception(response)
+                response_body = response.json()
+            except httpx.TransportError:
+                raise
+            except Exception as e:
+                pprint(f"[bold red]Error getting history\n{str(e)}[/bold red]")
+                raise Exception(f"Error getting ComfyUI history: {e}")
+
+        history = response_body.get(self.prompt_id)
+        if history is None:
+            return False
+        if not self.outputs:
+            for node_output in (history.get("outputs") or {}).values():
+                for img in node_output.get("images", []):
+                    self.outputs.append(self.format_image_path(img))
+                for gif in node_output.get("gifs", []):
+                    self.outputs.append(self.format_image_path(gif))
+        return True
+
+    async def is_queued(self):
+        """Whether the prompt is still pending or running on the server"""
+        async with HttpClient.create() as client:
+            response = await client.get(f"{self.base_url}/queue")
+            if response.status_code != 200:
+                return True
+            body = response.json()
+        for item in body.get("queue_running", []) + body.get("queue_pending", []):
+            if len(item) > 1 and item[1] == self.prompt_id:
+                return True
+        return False
 
     def update_overall_progress(self):
         self.progress.update(
@@ -0,0 +1,49 @@
+"""
+Metrics router - runtime counters of server-side optimizations
+
+GET /api/metrics returns a snapshot of in-process counters, intended for
+diagnostics and benchmarking. Counters reset when the server restarts.
+Stats of tool modules are imported in the handler, the tools load on
+first use and must not be imported at startup by this router.
+"""
+
+from fastapi import APIRouter
+from services.message_journal import message_journal
+from services.websocket_service import get_emit_stats
+from services.stream_coalescer import get_coalescer_stats
+from services.langgraph_service.agent_cache import agent_cache
+from services.langgraph_service.chat_history import chat_history_cache
+from services.langgraph_service.context_budget import context_budgeter
+from services.canvas_write_service import canvas_write_coordinator
+from services.db_service import db_service
+from utils.http_client import HttpClient
+from services.comfyui_ws_service import comfy_connections
+from services.comfyui_scheduler import comfy_scheduler
+
+router = APIRouter(prefix="/api")
+
+
+@router.get("/metrics")
+async def get_metrics():
+    from services.comfyui_upload_cache import comfy_uploads
+    from tools.utils.comfyui_template import comfy_workflow_templates
+    from tools.utils.generation_cache import generation_cache
+    from tools.utils.image_utils import get_input_image_cache_stats
+
+    return {
+        "message_journal": message_journal.get_stats(),
+        "websocket": get_emit_stats(),
+        "stream_coalescer": get_coalescer_stats(),
+        "agent_cache": agent_cache.get_stats(),
+        "chat_history": chat_history_cache.get_stats(),
+        "context_budget": context_budgeter.get_stats(),
+        "http_pool": HttpClient.get_pool_stats(),
+        "canvas_writes": canvas_write_coordinator.get_stats(),
+        "canvas_cache": db_service.get_canvas_cache_stats(),
+        "input_images": get_input_image_cache_stats(),
+        "generation_cache": generation_cache.get_stats(),
+        "comfyui_websockets": comfy_connections.get_stats(),
+        "comfyui_backends": comfy_scheduler.get_stats(),
+        "comfyui_uploads": comfy_uploads.get_stats(),
+        "comfyui_templates": comfy_workflow_templates.get_stats(),
+    }
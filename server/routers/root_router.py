@@ -1,5 +1,5 @@
 import os
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 import requests
 import httpx
 from models.tool_model import ToolInfoJson
@@ -9,7 +9,7 @@ from services.db_service import db_service
 from utils.http_client import HttpClient
 # services
 from models.config_model import ModelInfo
-from typing import List
+from typing import List, Optional
 from services.tool_service import TOOL_MAPPING
 
 router = APIRouter(prefix="/api")
@@ -136,5 +136,9 @@ async def list_chat_sessions():
 
 
 @router.get("/chat_session/{session_id}")
-async def get_chat_session(session_id: str):
-    return await db_service.get_chat_history(session_id)
+async def get_chat_session(session_id: str, limit: Optional[int] = Query(None, ge=1, le=1000), before: Optional[int] = None):
+    if limit is None and before is None:
+        # Unpaginated callers get the whole history, as before
+        return await db_service.get_chat_history(session_id)
+    messages, next_cursor = await db_service.get_chat_history_page(session_id, limit or 100, before)
+    return {"messages": messages, "next_cursor": next_cursor}
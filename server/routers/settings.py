@@ -31,6 +31,8 @@ from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
 from services.db_service import db_service
 from services.settings_service import settings_service
 from services.tool_service import tool_service
+from tools.utils.comfyui_template import comfy_workflow_templates
+from utils.http_client import HttpClient
 from services.knowledge_service import list_user_enabled_knowledge
 from pydantic import BaseModel
 
@@ -226,6 +228,8 @@ async def update_proxy_settings(request: Request):
 
     # 更新代理设置
     result = await settings_service.update_settings({"proxy": proxy_value})
+    # 之后的请求使用新建的连接池
+    HttpClient.reset()
     return result
 
 
@@ -268,6 +272,7 @@ async def list_workflows():
 @router.delete("/comfyui/delete_workflow/{id}")
 async def delete_workflow(id: int):
     result = await db_service.delete_comfy_workflow(id)
+    comfy_workflow_templates.invalidate(id)
     await tool_service.initialize()
     return result
 
@@ -1,15 +1,35 @@
 # routers/websocket_router.py
-from services.websocket_state import sio, add_connection, remove_connection
+from services.websocket_state import sio, add_connection, remove_connection, subscribe as subscribe_rooms
+from services.stream_service import get_stream_processor
 
 @sio.event
 async def connect(sid, environ, auth):
     print(f"Client {sid} connected")
     
-    user_info = auth or {}
+    user_info = auth if isinstance(auth, dict) else {}
     add_connection(sid, user_info)
+    # Join the canvas/session rooms right away if the client already knows them
+    await subscribe_rooms(sid, user_info.get('canvas_id'), user_info.get('session_id'))
     
     await sio.emit('connected', {'status': 'connected'}, room=sid)
 
+@sio.event
+async def subscribe(sid, data):
+    data = data or {}
+    rooms = await subscribe_rooms(sid, data.get('canvas_id'), data.get('session_id'))
+    return {'rooms': rooms}
+
+@sio.event
+async def resync(sid, data):
+    # The client missed a messages_patch: resend the full list if the session is
+    # still streaming, otherwise the client reloads the history over HTTP
+    session_id = (data or {}).get('session_id')
+    processor = get_stream_processor(session_id) if session_id else None
+    if processor is None:
+        return {'active': False}
+    await processor.resync()
+    return {'active': True}
+
 @sio.event
 async def disconnect(sid):
     print(f"Client {sid} disconnected")
@@ -0,0 +1,182 @@
+"""
+Canvas write coordinator - serializes canvas mutations per canvas
+
+Every server-side canvas write (generated images, videos, ComfyUI outputs,
+full saves from the frontend) goes through one per-canvas lock, so two
+writers never place elements on top of each other or overwrite each other.
+
+Appends of generated media are also coalesced: mutations that queue while a
+write is in flight are laid out together and committed by the next writer in
+one read-modify-write cycle (one layout pass, one DB write). Locks are
+reference counted and dropped as soon as a canvas has no holder or waiter.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+from services.db_service import db_service
+
+Position = Tuple[float, float]
+# Builds the elements and files of one mutation from its laid out positions
+BuildFn = Callable[[List[Position]], Awaitable[Tuple[List[Dict[str, Any]], Dict[str, Any]]]]
+
+
+class _PendingAppend:
+    __slots__ = ('sizes', 'build', 'future')
+
+    def __init__(self, sizes: List[Tuple[float, float]], build: BuildFn, future: 'asyncio.Future[Any]'):
+        self.sizes = sizes
+        self.build = build
+        self.future = future
+
+
+class _CanvasSlot:
+    __slots__ = ('lock', 'users', 'pending')
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        # Holders and waiters of the lock, the slot is dropped when it reaches 0
+        self.users = 0
+        self.pending: List[_PendingAppend] = []
+
+
+class CanvasWriteCoordinator:
+    """Per-canvas write lock with coalescing of queued element appends"""
+
+    def __init__(self) -> None:
+        self._slots: Dict[str, _CanvasSlot] = {}
+        # instrumentation
+        self._acquisitions = 0
+        self._contended = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._writes = 0
+        self._mutations = 0
+        self._max_batch = 0
+        self._evicted = 0
+
+    def _enter(self, canvas_id: str) -> _CanvasSlot:
+        slot = self._slots.get(canvas_id)
+        if slot is None:
+            slot = self._slots[canvas_id] = _CanvasSlot()
+        slot.users += 1
+        return slot
+
+    def _leave(self, canvas_id: str, slot: _CanvasSlot) -> None:
+        slot.users -= 1
+        if slot.users == 0 and not slot.pending and self._slots.get(canvas_id) is slot:
+            del self._slots[canvas_id]
+            self._evicted += 1
+
+    def _record_wait(self, seconds: float, contended: bool) -> None:
+        self._acquisitions += 1
+        self._contended += int(contended)
+        self._total_wait += seconds
+        self._max_wait = max(self._max_wait, seconds)
+
+    @asynccontextmanager
+    async def lock(self, canvas_id: str):
+        """Exclusive access to a canvas, for writes that can't be coalesced"""
+        slot = self._enter(canvas_id)
+        try:
+            contended = slot.lock.locked()
+            start = time.perf_counter()
+            async with slot.lock:
+                self._record_wait(time.perf_counter() - start, contended)
+                yield
+        finally:
+            self._leave(canvas_id, slot)
+
+    async def place_and_append(
+        self,
+        canvas_id: str,
+        sizes: Iterable[Tuple[float, float]],
+        build: BuildFn,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Lay out new media elements of the given (width, height) and append them
+
+        `build(positions)` returns the (elements, files) to append, it is called
+        under the canvas lock. Appends queued behind an in-flight write share
+        its successor's layout pass and DB write.
+        """
+        slot = self._enter(canvas_id)
+        pending = _PendingAppend(list(sizes), build, asyncio.get_running_loop().create_future())
+        slot.pending.append(pending)
+        try:
+            contended = slot.lock.locked()
+            start = time.perf_counter()
+            async with slot.lock:
+                self._record_wait(time.perf_counter() - start, contended)
+                if not pending.future.done():
+                    batch, slot.pending = slot.pending, []
+                    try:
+                        await self._commit(canvas_id, batch)
+                    except BaseException:
+                        # Cancelled mid-write, hand the others over to the next writer
+                        slot.pending[:0] = [item for item in batch if item is not pending and not item.future.done()]
+                        raise
+        finally:
+            if pending in slot.pending:
+                # Cancelled before anyone committed it
+                slot.pending.remove(pending)
+            self._leave(canvas_id, slot)
+        return pending.future.result()
+
+    async def _commit(self, canvas_id: str, batch: List[_PendingAppend]) -> None:
+        results: List[Tuple[_PendingAppend, Any]] = []
+        elements: List[Dict[str, Any]] = []
+        files: Dict[str, Any] = {}
+        try:
+            # Incrementally maintained layout index of the stored canvas
+            canvas_index = await db_service.get_canvas_index(canvas_id)
+            positions = canvas_index.next_positions([size for item in batch for size in item.sizes])
+            offset = 0
+            for item in batch:
+                item_positions = positions[offset:offset + len(item.sizes)]
+                offset += len(item.sizes)
+                try:
+                    result = await item.build(item_positions)
+                except Exception as e:
+                    item.future.set_exception(e)
+                    continue
+                elements.extend(result[0])
+                files.update(result[1])
+                results.append((item, result))
+
+            if elements or files:
+                await db_service.append_canvas_elements(canvas_id, elements, files)
+        except Exception as e:
+            print(f"❌ Canvas write failed for canvas {canvas_id}: {e}")
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        # Results are only handed out once they are written
+        for item, result in results:
+            item.future.set_result(result)
+        self._writes += 1
+        self._mutations += len(batch)
+        self._max_batch = max(self._max_batch, len(batch))
+        if len(batch) > 1:
+            print(f"🖼️ Coalesced {len(batch)} canvas writes into one for canvas {canvas_id}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'active_canvases': len(self._slots),
+            'evicted_locks': self._evicted,
+            'acquisitions': self._acquisitions,
+            'contended': self._contended,
+            'avg_wait_ms': round(self._total_wait * 1000 / self._acquisitions, 3) if self._acquisitions else 0.0,
+            'max_wait_ms': round(self._max_wait * 1000, 3),
+            'writes': self._writes,
+            'mutations': self._mutations,
+            'max_mutations_per_write': self._max_batch,
+        }
+
+
+# Create a singleton instance
+canvas_write_coordinator = CanvasWriteCoordinator()
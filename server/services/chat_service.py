@@ -8,8 +8,10 @@ from typing import Dict, Any, List, Optional
 # Import service modules
 from models.tool_model import ToolInfoJson
 from services.db_service import db_service
+from services.message_journal import message_journal
 from services.langgraph_service import langgraph_multi_agent
 from services.websocket_service import send_to_websocket
+from services.websocket_state import bind_session_to_canvas
 from services.stream_service import add_stream_task, remove_stream_task
 from models.config_model import ModelInfo
 
@@ -24,6 +26,7 @@ async def handle_chat(data: Dict[str, Any]) -> None:
     - Save chat session and messages to the database.
     - Launch langgraph_agent task to process chat.
     - Manage stream task lifecycle (add, remove).
+    - Flush buffered stream messages to the database.
     - Notify frontend via WebSocket when stream is done.
 
     Args:
@@ -41,6 +44,9 @@ async def handle_chat(data: Dict[str, Any]) -> None:
     text_model: ModelInfo = data.get('text_model', {})
     tool_list: List[ToolInfoJson] = data.get('tool_list', [])
 
+    # Route this session's events to clients that have the canvas open
+    bind_session_to_canvas(session_id, canvas_id)
+
     print('👇 chat_service got tool_list', tool_list)
 
     # TODO: save and fetch system prompt from db or settings config
@@ -69,6 +75,11 @@ async def handle_chat(data: Dict[str, Any]) -> None:
     finally:
         # Always remove the task from stream_tasks after completion/cancellation
         remove_stream_task(session_id)
+        # Persist messages still buffered by the stream (e.g. on cancellation)
+        try:
+            await message_journal.flush(session_id)
+        except Exception as e:
+            print(f"🟠 Failed to flush messages for session {session_id}: {e}")
         # Notify frontend WebSocket that chat processing is done
         await send_to_websocket(session_id, {
             'type': 'done'
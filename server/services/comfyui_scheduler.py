@@ -0,0 +1,218 @@
+"""
+Scheduling of ComfyUI jobs over several backends
+
+The comfyui provider config keeps its single `url` (used by the settings
+UI) and may list more workers in `urls`:
+
+    [comfyui]
+    url = "http://127.0.0.1:8188"
+    urls = ["http://10.0.0.2:8188", "http://10.0.0.3:8188"]
+
+For every job the scheduler picks a backend:
+- health: backends whose websocket cannot be opened, or that failed a job
+  with a ComfyBackendError, are skipped for UNHEALTHY_COOLDOWN seconds
+- model locality: the model files the workflow loads (ckpt_name,
+  lora_name, ...) are checked against the choices the backend offers for
+  that node in /object_info/<class>; backends that have them all are
+  preferred
+- queue depth: the `queue_remaining` of the backend's status events, or
+  the jobs we are running there if that is higher
+If the backend fails with a ComfyBackendError the job is requeued on the
+next best backend. Jobs, failures and latency are tracked per backend.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from services.comfyui_ws_service import comfy_connections
+from utils.http_client import HttpClient
+
+UNHEALTHY_COOLDOWN = 30
+HEALTH_CHECK_TIMEOUT = 5
+MODEL_INFO_TTL = 300
+# Node inputs that name a model file on the backend
+MODEL_INPUT_NAMES = (
+    'ckpt_name', 'unet_name', 'lora_name', 'vae_name', 'clip_name',
+    'control_net_name', 'upscale_model_name',
+)
+
+T = TypeVar('T')
+
+
+class ComfyBackendError(Exception):
+    """The backend is unreachable or broke off the job, it can run elsewhere"""
+
+
+def get_comfyui_urls(comfyui_config: Dict[str, Any]) -> List[str]:
+    """The primary `url` followed by the extra `urls`, without duplicates"""
+    urls: List[str] = []
+    for url in [comfyui_config.get('url', '')] + list(comfyui_config.get('urls') or []):
+        url = str(url or '').strip().rstrip('/')
+        if url and url not in urls:
+            urls.append(url)
+    return urls
+
+
+def required_models(workflow: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """(class_type, input name, model file) of every model the workflow loads"""
+    models: List[Tuple[str, str, str]] = []
+    for node in workflow.values():
+        if not isinstance(node, dict):
+            continue
+        for name, value in (node.get('inputs') or {}).items():
+            if name in MODEL_INPUT_NAMES and isinstance(value, str):
+                models.append((node.get('class_type', ''), name, value))
+    return models
+
+
+class _Backend:
+    def __init__(self, url: str):
+        self.url = url
+        self.running = 0
+        self.jobs = 0
+        self.failures = 0
+        self.requeued = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.unhealthy_until = 0.0
+        # class_type -> (fetched at, {input name: choices})
+        self.node_choices: Dict[str, Tuple[float, Dict[str, Set[str]]]] = {}
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def queue_depth(self) -> int:
+        return max(comfy_connections.get(self.url).queue_remaining, self.running)
+
+    def avg_latency(self) -> float:
+        completed = self.jobs - self.failures
+        return self.total_latency / completed if completed > 0 else 0.0
+
+    def mark_unhealthy(self) -> None:
+        self.unhealthy_until = time.monotonic() + UNHEALTHY_COOLDOWN
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'healthy': self.healthy,
+            'queue_depth': self.queue_depth(),
+            'running': self.running,
+            'jobs': self.jobs,
+            'failures': self.failures,
+            'requeued': self.requeued,
+            'avg_latency_s': round(self.avg_latency(), 3),
+            'max_latency_s': round(self.max_latency, 3),
+        }
+
+
+class ComfyScheduler:
+    """Picks a ComfyUI backend per job and requeues jobs of failed backends"""
+
+    def __init__(self) -> None:
+        self._backends: Dict[str, _Backend] = {}
+
+    def _backend(self, url: str) -> _Backend:
+        url = url.rstrip('/')
+        backend = self._backends.get(url)
+        if backend is None:
+            backend = _Backend(url)
+            self._backends[url] = backend
+        return backend
+
+    async def _node_choices(self, backend: _Backend, class_type: str) -> Optional[Dict[str, Set[str]]]:
+        cached = backend.node_choices.get(class_type)
+        if cached is not None and time.monotonic() - cached[0] < MODEL_INFO_TTL:
+            return cached[1]
+        try:
+            async with HttpClient.create(timeout=10) as client:
+                response = await client.get(f"{backend.url}/api/object_info/{class_type}")
+                if response.status_code != 200:
+                    return None
+                required = response.json().get(class_type, {}).get('input', {}).get('required', {})
+        except Exception as e:
+            print(f"⚠️ ComfyUI {backend.url} object_info {class_type} failed: {e}")
+            return None
+        choices = {
+            name: set(spec[0]) for name, spec in required.items()
+            if isinstance(spec, list) and spec and isinstance(spec[0], list)
+        }
+        backend.node_choices[class_type] = (time.monotonic(), choices)
+        return choices
+
+    async def _has_models(self, backend: _Backend, models: List[Tuple[str, str, str]]) -> Optional[bool]:
+        """True/False if the backend has/lacks a model, None if it could not be told"""
+        unknown = False
+        for class_type, name, value in models:
+            choices = await self._node_choices(backend, class_type)
+            if choices is None or name not in choices:
+                unknown = True
+            elif value not in choices[name]:
+                return False
+        return None if unknown else True
+
+    async def pick(self, urls: List[str], models: List[Tuple[str, str, str]], exclude: Set[str]) -> Optional[_Backend]:
+        """Best backend not in `exclude`, its `running` already counts the job"""
+        candidates = [self._backend(url) for url in urls if url.rstrip('/') not in exclude]
+        while candidates:
+            healthy = [backend for backend in candidates if backend.healthy] or candidates
+            if models and len(healthy) > 1:
+                localities = await asyncio.gather(*[self._has_models(backend, models) for backend in healthy])
+                with_models = [b for b, has in zip(healthy, localities) if has]
+                maybe = [b for b, has in zip(healthy, localities) if has is None]
+                healthy = with_models or maybe or healthy
+            backend = min(healthy, key=lambda b: (b.queue_depth(), b.avg_latency()))
+            # Reserve the slot right away, concurrent picks must see it
+            backend.running += 1
+            # Health check: the shared websocket must be open
+            if await comfy_connections.get(backend.url).ensure_connected(timeout=HEALTH_CHECK_TIMEOUT):
+                return backend
+            backend.running -= 1
+            print(f"⚠️ ComfyUI backend {backend.url} is not reachable")
+            backend.mark_unhealthy()
+            candidates.remove(backend)
+        return None
+
+    async def run(
+        self,
+        urls: List[str],
+        workflow: Dict[str, Any],
+        execute_on: Callable[[str], Awaitable[T]],
+    ) -> T:
+        """Run `execute_on(url)` on the best backend, on the next ones if it fails"""
+        models = required_models(workflow)
+        tried: Set[str] = set()
+        last_error: Optional[Exception] = None
+        while True:
+            backend = await self.pick(urls, models, tried)
+            if backend is None:
+                raise last_error or ComfyBackendError(f"No ComfyUI backend available: {', '.join(urls)}")
+            tried.add(backend.url)
+            backend.jobs += 1
+            started_at = time.monotonic()
+            try:
+                result = await execute_on(backend.url)
+            except ComfyBackendError as e:
+                backend.failures += 1
+                backend.mark_unhealthy()
+                last_error = e
+                if len(tried) < len(urls):
+                    backend.requeued += 1
+                    print(f"🔁 ComfyUI backend {backend.url} failed ({e}), requeueing the job")
+                continue
+            except BaseException:
+                backend.failures += 1
+                raise
+            finally:
+                backend.running -= 1
+            latency = time.monotonic() - started_at
+            backend.total_latency += latency
+            backend.max_latency = max(backend.max_latency, latency)
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {url: backend.get_stats() for url, backend in self._backends.items()}
+
+
+# Create a singleton instance
+comfy_scheduler = ComfyScheduler()
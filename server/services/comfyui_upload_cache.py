@@ -0,0 +1,109 @@
+"""
+Upload cache of ComfyUI input images
+
+Workflow tools upload their image arguments to the ComfyUI backend that
+runs the job. The same reference image is often used for many runs, so
+every backend remembers the content hashes of the files it already has
+and the name ComfyUI stored them under; a repeated upload is skipped.
+
+- content hashes are memoized by (path, mtime, size) and computed in a
+  thread
+- entries of a backend are only valid for the websocket connection they
+  were made on: a reconnect may mean ComfyUI restarted with another input
+  folder, so the file is uploaded again
+- concurrent uploads of the same file to the same backend share one request
+- files are streamed from disk, not read into memory first
+"""
+
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from routers.comfyui_execution import upload_image
+from services.comfyui_ws_service import comfy_connections
+from tools.utils.generation_cache import hash_file
+
+COMFYUI_UPLOAD_CACHE_SIZE = int(os.environ.get('COMFYUI_UPLOAD_CACHE_SIZE', '1024'))
+
+# (base_url, content hash)
+UploadKey = Tuple[str, str]
+
+
+class ComfyUploadCache:
+    """Per backend map of content hashes to uploaded image names"""
+
+    def __init__(self, max_entries: int = COMFYUI_UPLOAD_CACHE_SIZE):
+        self.max_entries = max(1, max_entries)
+        # key -> (connection generation, name on the backend)
+        self._entries: 'OrderedDict[UploadKey, Tuple[int, str]]' = OrderedDict()
+        self._pending: Dict[UploadKey, 'asyncio.Task[str]'] = {}
+        # (path, mtime, size) -> content hash
+        self._file_hashes: Dict[Tuple[str, int, int], str] = {}
+        # instrumentation
+        self._hits = 0
+        self._misses = 0
+        self._uploaded_bytes = 0
+        self._skipped_bytes = 0
+
+    async def _file_hash(self, path: str, stat: os.stat_result) -> str:
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._file_hashes.get(key)
+        if digest is None:
+            digest = await asyncio.to_thread(hash_file, path)
+            if len(self._file_hashes) >= self.max_entries:
+                self._file_hashes.clear()
+            self._file_hashes[key] = digest
+        return digest
+
+    async def _upload(self, base_url: str, path: str, filename: str) -> str:
+        # httpx reads the open file in chunks while sending the multipart body
+        with open(path, 'rb') as image_file:
+            return await upload_image(image_file, base_url, filename)
+
+    async def upload(self, base_url: str, path: str, filename: str) -> str:
+        """Name of the file on the backend, uploaded unless it is there already"""
+        base_url = base_url.rstrip('/')
+        stat = os.stat(path)
+        key = (base_url, await self._file_hash(path, stat))
+        generation = comfy_connections.get(base_url).connects
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == generation:
+            self._entries.move_to_end(key)
+            self._hits += 1
+            self._skipped_bytes += stat.st_size
+            return entry[1]
+        pending = self._pending.get(key)
+        if pending is not None:
+            self._hits += 1
+            self._skipped_bytes += stat.st_size
+            return await asyncio.shield(pending)
+
+        self._misses += 1
+        task = asyncio.create_task(self._upload(base_url, path, filename))
+        self._pending[key] = task
+        try:
+            name = await asyncio.shield(task)
+        finally:
+            self._pending.pop(key, None)
+        self._uploaded_bytes += stat.st_size
+        self._entries[key] = (generation, name)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return name
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self._hits,
+            'misses': self._misses,
+            'uploaded_bytes': self._uploaded_bytes,
+            'skipped_bytes': self._skipped_bytes,
+        }
+
+
+# Create a singleton instance
+comfy_uploads = ComfyUploadCache()
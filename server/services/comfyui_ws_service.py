@@ -0,0 +1,193 @@
+"""
+Shared ComfyUI websocket connections
+
+ComfyUI sends execution events (executing, progress, executed, ...) to the
+websocket of the client_id a prompt was queued with. Instead of one socket
+per workflow execution, every ComfyUI server (base URL) gets one persistent
+connection with its own client_id. All executions queue their prompts with
+that client_id and receive the events of their prompt_id on an asyncio
+queue.
+
+- events that arrive before the execution subscribed (the prompt can start
+  before POST /prompt returned) are buffered and replayed
+- the connection reconnects with exponential backoff; subscribers get a
+  DISCONNECTED event when it drops and a RECONNECTED event when it is back,
+  since events may have been lost meanwhile
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import websockets
+
+RECONNECT_MIN_DELAY = 0.5
+RECONNECT_MAX_DELAY = 10.0
+# Events of prompts nobody subscribed to (yet) are kept for this many prompts
+MAX_EARLY_PROMPTS = 64
+
+# Events put on subscriber queues when the connection drops and after a reconnect
+DISCONNECTED = {'type': 'jaaz_disconnected', 'data': {}}
+RECONNECTED = {'type': 'jaaz_reconnected', 'data': {}}
+
+
+def _ws_url(base_url: str, client_id: str) -> str:
+    scheme = 'wss://' if base_url.startswith('https') else 'ws://'
+    host = base_url.split('//')[1]
+    if '/' in host:
+        host = host.split('/')[0]
+    return f"{scheme}{host}/ws?clientId={client_id}"
+
+
+class ComfyConnection:
+    """One persistent websocket to a ComfyUI server, demultiplexed by prompt_id"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.client_id = str(uuid.uuid4())
+        self._subscribers: Dict[str, 'asyncio.Queue[Dict[str, Any]]'] = {}
+        self._early: 'OrderedDict[str, List[Dict[str, Any]]]' = OrderedDict()
+        self._connected = asyncio.Event()
+        self._task: Optional['asyncio.Task[None]'] = None
+        # Prompts waiting or running on the server, from its `status` events
+        self.queue_remaining = 0
+        # instrumentation
+        self.connects = 0
+        self.failures = 0
+        self.messages = 0
+        self.last_error: Optional[str] = None
+        self.connected_at: Optional[float] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def ensure_connected(self, timeout: float = 10) -> bool:
+        """Start the connection if needed and wait until it is open"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        if self._connected.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def subscribe(self, prompt_id: str) -> 'asyncio.Queue[Dict[str, Any]]':
+        queue: 'asyncio.Queue[Dict[str, Any]]' = asyncio.Queue()
+        for message in self._early.pop(prompt_id, []):
+            queue.put_nowait(message)
+        self._subscribers[prompt_id] = queue
+        return queue
+
+    def unsubscribe(self, prompt_id: str) -> None:
+        self._subscribers.pop(prompt_id, None)
+
+    def _dispatch(self, message: Dict[str, Any]) -> None:
+        self.messages += 1
+        data = message.get('data')
+        prompt_id = data.get('prompt_id') if isinstance(data, dict) else None
+        if prompt_id is None:
+            # status etc. are not about a single execution
+            if message.get('type') == 'status':
+                exec_info = data.get('status', {}).get('exec_info', {}) if isinstance(data, dict) else {}
+                self.queue_remaining = int(exec_info.get('queue_remaining', self.queue_remaining) or 0)
+            return
+
+        queue = self._subscribers.get(prompt_id)
+        if queue is not None:
+            queue.put_nowait(message)
+            return
+        # The execution has not subscribed yet: keep the event for it
+        self._early.setdefault(prompt_id, []).append(message)
+        self._early.move_to_end(prompt_id)
+        while len(self._early) > MAX_EARLY_PROMPTS:
+            self._early.popitem(last=False)
+
+    async def _run(self) -> None:
+        delay = RECONNECT_MIN_DELAY
+        url = _ws_url(self.base_url, self.client_id)
+        while True:
+            try:
+                async with websockets.connect(url, max_size=None) as ws:
+                    self.connects += 1
+                    self.connected_at = time.time()
+                    self._connected.set()
+                    delay = RECONNECT_MIN_DELAY
+                    if self.connects > 1:
+                        print(f"🔌 ComfyUI websocket reconnected: {self.base_url}")
+                        for queue in self._subscribers.values():
+                            queue.put_nowait(RECONNECTED)
+                    async for message in ws:
+                        # Binary frames are previews, not needed here
+                        if isinstance(message, str):
+                            self._dispatch(json.loads(message))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"⚠️ ComfyUI websocket {self.base_url} error: {e}, retrying in {delay}s")
+            finally:
+                if self._connected.is_set():
+                    self._connected.clear()
+                    # Unknown until the next status event
+                    self.queue_remaining = 0
+                    for queue in self._subscribers.values():
+                        queue.put_nowait(DISCONNECTED)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        self._connected.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'connected': self.connected,
+            'connects': self.connects,
+            'failures': self.failures,
+            'messages': self.messages,
+            'queue_remaining': self.queue_remaining,
+            'subscribers': len(self._subscribers),
+            'early_prompts': len(self._early),
+            'last_error': self.last_error,
+        }
+
+
+class ComfyConnectionManager:
+    """One ComfyConnection per ComfyUI base URL"""
+
+    def __init__(self) -> None:
+        self._connections: Dict[str, ComfyConnection] = {}
+
+    def get(self, base_url: str) -> ComfyConnection:
+        base_url = base_url.rstrip('/')
+        connection = self._connections.get(base_url)
+        if connection is None:
+            connection = ComfyConnection(base_url)
+            self._connections[base_url] = connection
+        return connection
+
+    async def close(self) -> None:
+        connections = list(self._connections.values())
+        self._connections.clear()
+        for connection in connections:
+            await connection.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {url: connection.get_stats() for url, connection in self._connections.items()}
+
+
+# Create a singleton instance
+comfy_connections = ComfyConnectionManager()
@@ -97,6 +97,8 @@ class ConfigService:
             "CONFIG_PATH", os.path.join(USER_DATA_DIR, "config.toml")
         )
         self.initialized = False
+        # Bumped whenever app_config changes, so caches built from it can be dropped
+        self.version = 0
 
     def _get_jaaz_url(self) -> str:
         """Get the correct jaaz URL"""
@@ -143,6 +145,7 @@ class ConfigService:
             traceback.print_exc()
         finally:
             self.initialized = True
+            self.version += 1
 
     def get_config(self) -> AppConfig:
         if 'jaaz' in self.app_config:
@@ -158,6 +161,7 @@ class ConfigService:
             with open(self.config_file, "w") as f:
                 toml.dump(data, f)
             self.app_config = data
+            self.version += 1
 
             return {
                 "status": "success",
@@ -0,0 +1,174 @@
+"""
+SQLite connection pool for DatabaseService
+
+Keeps a small number of long-lived aiosqlite connections open instead of
+opening a new connection (and a new worker thread) for every query.
+
+Every pooled connection is configured once when it is opened:
+- journal_mode=WAL: readers do not block the writer and vice versa
+- synchronous=NORMAL: safe with WAL, avoids an fsync on every commit
+- cache_size / temp_store: larger page cache, temp tables in memory
+- cached_statements: sqlite3 keeps prepared statements per connection,
+  so the same SQL text is not re-parsed on every call
+
+Usage:
+    pool = SQLiteConnectionPool(db_path)
+    await pool.open()
+    async with pool.acquire() as db:
+        await db.execute(...)
+        await db.commit()
+    await pool.close()
+"""
+
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, List, Optional, Set
+import aiosqlite
+
+DEFAULT_POOL_SIZE = 4
+# Negative value means KiB instead of pages: 16 MiB page cache per connection
+DEFAULT_CACHE_SIZE_KIB = 16 * 1024
+DEFAULT_CACHED_STATEMENTS = 256
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+# How long close() waits for connections that are still checked out
+DEFAULT_CLOSE_TIMEOUT = 10.0
+
+
+class SQLiteConnectionPool:
+    """A fixed-size pool of persistent aiosqlite connections"""
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int = DEFAULT_POOL_SIZE,
+        cache_size_kib: int = DEFAULT_CACHE_SIZE_KIB,
+        cached_statements: int = DEFAULT_CACHED_STATEMENTS,
+        busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+    ):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.cache_size_kib = cache_size_kib
+        self.cached_statements = cached_statements
+        self.busy_timeout_ms = busy_timeout_ms
+        self._connections: List[aiosqlite.Connection] = []
+        self._idle: Optional[asyncio.Queue[aiosqlite.Connection]] = None
+        # Checked out connections, and an event set when the last one comes back
+        self._in_use: Set[aiosqlite.Connection] = set()
+        self._released = asyncio.Event()
+        self._released.set()
+        self._open_lock = asyncio.Lock()
+        self._closed = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._idle is not None
+
+    async def _connect(self) -> aiosqlite.Connection:
+        """Open and configure a single pooled connection"""
+        conn = await aiosqlite.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)}")
+        await conn.execute("PRAGMA temp_store=MEMORY")
+        await conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    async def open(self) -> None:
+        """Open all connections of the pool. Safe to call more than once."""
+        async with self._open_lock:
+            if self._idle is not None:
+                return
+            idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+            try:
+                for _ in range(self.size):
+                    conn = await self._connect()
+                    self._connections.append(conn)
+                    idle.put_nowait(conn)
+            except Exception:
+                await self._close_connections()
+                raise
+            self._idle = idle
+            self._closed = False
+            print(f"🗄️ SQLite pool opened with {self.size} connections: {self.db_path}")
+
+    async def close(self, timeout: float = DEFAULT_CLOSE_TIMEOUT) -> None:
+        """Close the pool.
+
+        Idle connections are closed right away. Connections that are still
+        checked out are closed when their query finishes and they are
+        released; close() waits up to `timeout` seconds for them before
+        closing them anyway.
+        """
+        async with self._open_lock:
+            self._closed = True
+            idle, self._idle = self._idle, None
+            idle_connections: List[aiosqlite.Connection] = []
+            while idle is not None and not idle.empty():
+                idle_connections.append(idle.get_nowait())
+            await self._close_connections(idle_connections)
+
+            if self._in_use:
+                print(f"🗄️ Waiting for {len(self._in_use)} SQLite connections in use")
+                try:
+                    await asyncio.wait_for(self._released.wait(), timeout)
+                except asyncio.TimeoutError:
+                    print(f"⚠️ {len(self._in_use)} SQLite connections still in use after {timeout}s, closing them")
+                    await self._close_connections(list(self._in_use))
+                    self._in_use.clear()
+                    self._released.set()
+            self._connections = []
+            print("🗄️ SQLite pool closed")
+
+    async def _close_connections(self, connections: Optional[List[aiosqlite.Connection]] = None) -> None:
+        if connections is None:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            if conn in self._connections:
+                self._connections.remove(conn)
+            try:
+                await conn.close()
+            except Exception as e:
+                print(f"⚠️ Failed to close SQLite connection: {e}")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncGenerator[aiosqlite.Connection, None]:
+        """Borrow a connection from the pool.
+
+        The pool is opened lazily on first use, so callers that run outside
+        the FastAPI lifespan (scripts, background tasks) still work.
+        Any transaction left open by the caller is rolled back before the
+        connection goes back to the pool.
+        """
+        if self._idle is None:
+            if self._closed:
+                raise RuntimeError("SQLite connection pool is closed")
+            await self.open()
+        idle = self._idle
+        assert idle is not None
+        conn = await idle.get()
+        self._in_use.add(conn)
+        self._released.clear()
+        try:
+            yield conn
+        finally:
+            # Not in use any more if close() timed out and closed it already
+            if conn in self._in_use:
+                try:
+                    if conn.in_transaction:
+                        await conn.rollback()
+                except Exception as e:
+                    print(f"⚠️ Failed to rollback pooled SQLite connection: {e}")
+                self._in_use.discard(conn)
+                if self._idle is idle:
+                    idle.put_nowait(conn)
+                else:
+                    # The pool was closed while the connection was checked out
+                    await self._close_connections([conn])
+            if not self._in_use:
+                self._released.set()
@@ -1,12 +1,16 @@
 import sqlite3
 import json
 import os
-from typing import List, Dict, Any, Optional
-import aiosqlite
+import base64
+from typing import List, Dict, Any, Optional, Tuple
 from .config_service import USER_DATA_DIR
+from .db_pool import SQLiteConnectionPool
 from .migrations.manager import MigrationManager, CURRENT_VERSION
+from .thumbnail_service import remove_thumbnail
+from utils.canvas import CanvasSpatialIndex, CanvasIndexRegistry, CanvasDocument, CanvasDocumentCache
 
 DB_PATH = os.path.join(USER_DATA_DIR, "localmanus.db")
+CANVAS_CACHE_SIZE = int(os.environ.get("CANVAS_CACHE_SIZE", "16"))
 
 class DatabaseService:
     def __init__(self):
@@ -14,6 +18,20 @@ class DatabaseService:
         self._ensure_db_directory()
         self._migration_manager = MigrationManager()
         self._init_db()
+        self._pool = SQLiteConnectionPool(self.db_path)
+        # Layout indexes of recently used canvases, updated on every element write
+        self._canvas_indexes = CanvasIndexRegistry()
+        # Parsed documents of recently opened canvases, updated on every write
+        self._canvas_documents = CanvasDocumentCache(CANVAS_CACHE_SIZE)
+        self._canvas_generations: Dict[str, int] = {}
+
+    async def initialize(self):
+        """Open the pooled connections, called from the FastAPI lifespan"""
+        await self._pool.open()
+
+    async def close(self):
+        """Close the pooled connections, called on server shutdown"""
+        await self._pool.close()
 
     def _ensure_db_directory(self):
         """Ensure the database directory exists"""
@@ -45,47 +63,91 @@ class DatabaseService:
 
     async def create_canvas(self, id: str, name: str):
         """Create a new canvas"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._pool.acquire() as db:
             await db.execute("""
                 INSERT INTO canvases (id, name)
                 VALUES (?, ?)
             """, (id, name))
             await db.commit()
 
-    async def list_canvases(self) -> List[Dict[str, Any]]:
-        """Get all canvases"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = sqlite3.Row
-            cursor = await db.execute("""
-                SELECT id, name, description, thumbnail, created_at, updated_at
-                FROM canvases
-                ORDER BY updated_at DESC
-            """)
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+    async def list_canvases(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List canvases, most recently updated first
+
+        Returns a page of at most `limit` canvases (all of them without a
+        limit) and the cursor of the next page, None on the last page.
+        """
+        where, params = "", []
+        after = self._decode_canvas_cursor(cursor) if cursor else None
+        if after is not None:
+            where = "WHERE updated_at < ? OR (updated_at = ? AND id < ?)"
+            params = [after[0], after[0], after[1]]
+        query = f"""
+            SELECT id, name, description, thumbnail, created_at, updated_at
+            FROM canvases
+            {where}
+            ORDER BY updated_at DESC, id DESC
+        """
+        if limit is not None:
+            # One extra row tells whether there is a next page
+            query += " LIMIT ?"
+            params.append(limit + 1)
+
+        async with self._pool.acquire() as db:
+            rows_cursor = await db.execute(query, params)
+            rows = [dict(row) for row in await rows_cursor.fetchall()]
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_canvas_cursor(rows[-1]['updated_at'], rows[-1]['id'])
+        return rows, next_cursor
+
+    @staticmethod
+    def _encode_canvas_cursor(updated_at: str, id: str) -> str:
+        return base64.urlsafe_b64encode(json.dumps([updated_at, id]).encode()).decode()
+
+    @staticmethod
+    def _decode_canvas_cursor(cursor: str) -> Tuple[str, str]:
+        try:
+            updated_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except Exception:
+            raise ValueError(f"Invalid canvas list cursor: {cursor}") from None
+        return str(updated_at), str(id)
 
     async def create_chat_session(self, id: str, model: str, provider: str, canvas_id: str, title: Optional[str] = None):
         """Save a new chat session"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._pool.acquire() as db:
             await db.execute("""
                 INSERT INTO chat_sessions (id, model, provider, canvas_id, title)
                 VALUES (?, ?, ?, ?, ?)
             """, (id, model, provider, canvas_id, title))
             await db.commit()
 
+        document = self._canvas_documents.for_write(canvas_id, self._canvas_generations.get(canvas_id, 0))
+        if document is not None:
+            document.invalidate_sessions()
+
     async def create_message(self, session_id: str, role: str, message: str):
         """Save a chat message"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._pool.acquire() as db:
             await db.execute("""
                 INSERT INTO chat_messages (session_id, role, message)
                 VALUES (?, ?, ?)
             """, (session_id, role, message))
             await db.commit()
 
+    async def create_messages(self, messages: List[Tuple[str, str, str]]):
+        """Save a batch of (session_id, role, message) rows in one transaction"""
+        async with self._pool.acquire() as db:
+            await db.executemany("""
+                INSERT INTO chat_messages (session_id, role, message)
+                VALUES (?, ?, ?)
+            """, messages)
+            await db.commit()
+
     async def get_chat_history(self, session_id: str) -> List[Dict[str, Any]]:
         """Get chat history for a session"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = sqlite3.Row
+        async with self._pool.acquire() as db:
             cursor = await db.execute("""
                 SELECT role, message, id
                 FROM chat_messages
@@ -93,23 +155,86 @@ class DatabaseService:
                 ORDER BY id ASC
             """, (session_id,))
             rows = await cursor.fetchall()
-            
-            messages = []
-            for row in rows:
-                row_dict = dict(row)
-                if row_dict['message']:
-                    try:
-                        msg = json.loads(row_dict['message'])
-                        messages.append(msg)
-                    except:
-                        pass
-                
-            return messages
+            return self._parse_messages(rows)
+
+    async def get_chat_history_since(self, session_id: str, after_id: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Messages of a session with an id above `after_id`, and the id of the last one (after_id if none)"""
+        async with self._pool.acquire() as db:
+            cursor = await db.execute("""
+                SELECT role, message, id
+                FROM chat_messages
+                WHERE session_id = ? AND id > ?
+                ORDER BY id ASC
+            """, (session_id, after_id))
+            rows = await cursor.fetchall()
+        last_id = rows[-1]['id'] if rows else after_id
+        return self._parse_messages(rows), last_id
+
+    async def get_chat_history_page(self, session_id: str, limit: int, before: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Get the latest messages of a session older than the `before` message id
+
+        The page holds at least `limit` messages and is extended back to the
+        user message that started its first turn, so tool calls and their
+        results are never split across pages. Returns the messages in order
+        and the cursor of the previous page, None when there is nothing older.
+        """
+        before_clause, params = "", [session_id]
+        if before is not None:
+            before_clause = "AND id < ?"
+            params.append(before)
+
+        async with self._pool.acquire() as db:
+            cursor = await db.execute(f"""
+                SELECT id
+                FROM chat_messages
+                WHERE session_id = ? {before_clause}
+                ORDER BY id DESC
+                LIMIT 1 OFFSET ?
+            """, (*params, max(limit, 1) - 1))
+            row = await cursor.fetchone()
+            start = None
+            if row is not None:
+                cursor = await db.execute("""
+                    SELECT MAX(id) AS id
+                    FROM chat_messages
+                    WHERE session_id = ? AND role = 'user' AND id <= ?
+                """, (session_id, row['id']))
+                start = (await cursor.fetchone())['id']
+
+            start_clause = "AND id >= ?" if start is not None else ""
+            cursor = await db.execute(f"""
+                SELECT role, message, id
+                FROM chat_messages
+                WHERE session_id = ? {before_clause} {start_clause}
+                ORDER BY id ASC
+            """, (*params, *([start] if start is not None else [])))
+            messages = self._parse_messages(await cursor.fetchall())
+
+            next_cursor = None
+            if start is not None:
+                cursor = await db.execute(
+                    "SELECT 1 FROM chat_messages WHERE session_id = ? AND id < ? LIMIT 1",
+                    (session_id, start))
+                if await cursor.fetchone() is not None:
+                    next_cursor = start
+        return messages, next_cursor
+
+    @staticmethod
+    def _parse_messages(rows: List[Any]) -> List[Dict[str, Any]]:
+        messages = []
+        for row in rows:
+            row_dict = dict(row)
+            if row_dict['message']:
+                try:
+                    msg = json.loads(row_dict['message'])
+                    messages.append(msg)
+                except:
+                    pass
+        return messages
 
     async def list_sessions(self, canvas_id: str) -> List[Dict[str, Any]]:
         """List all chat sessions"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = sqlite3.Row
+        async with self._pool.acquire() as db:
             if canvas_id:
                 cursor = await db.execute("""
                     SELECT id, title, model, provider, created_at, updated_at
@@ -126,52 +251,290 @@ class DatabaseService:
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
-    async def save_canvas_data(self, id: str, data: str, thumbnail: str = None):
-        """Save canvas data"""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def save_canvas_data(self, id: str, data: Dict[str, Any], thumbnail: Optional[str] = None):
+        """Save a full Excalidraw canvas document
+
+        Only elements whose position, version or versionNonce changed are
+        rewritten, and only new files are inserted. Rows that are no longer
+        part of the document are deleted. `thumbnail` is a URL, see
+        thumbnail_service.store_thumbnail.
+        """
+        elements: List[Dict[str, Any]] = data.get('elements') or []
+        files: Dict[str, Any] = data.get('files') or {}
+        rest = {k: v for k, v in data.items() if k not in ('elements', 'files')}
+
+        async with self._pool.acquire() as db:
+            cursor = await db.execute("""
+                SELECT id, position, version, version_nonce
+                FROM canvas_elements
+                WHERE canvas_id = ?
+            """, (id,))
+            stale_elements = {
+                row['id']: (row['position'], row['version'], row['version_nonce'])
+                for row in await cursor.fetchall()
+            }
+            changed_elements = []
+            for position, element in enumerate(elements):
+                element_id = element.get('id')
+                if not element_id:
+                    continue
+                key = (position, element.get('version'), element.get('versionNonce'))
+                if stale_elements.pop(element_id, None) != key:
+                    changed_elements.append((id, element_id, *key, json.dumps(element)))
+
+            cursor = await db.execute("SELECT id FROM canvas_files WHERE canvas_id = ?", (id,))
+            stale_files = {row['id'] for row in await cursor.fetchall()}
+            new_files = []
+            for file_id, file_data in files.items():
+                if file_id in stale_files:
+                    stale_files.discard(file_id)
+                else:
+                    new_files.append((id, file_id, json.dumps(file_data)))
+
+            await db.executemany("""
+                INSERT INTO canvas_elements (canvas_id, id, position, version, version_nonce, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(canvas_id, id) DO UPDATE SET
+                    position = excluded.position,
+                    version = excluded.version,
+                    version_nonce = excluded.version_nonce,
+                    data = excluded.data
+            """, changed_elements)
+            await db.executemany(
+                "DELETE FROM canvas_elements WHERE canvas_id = ? AND id = ?",
+                [(id, element_id) for element_id in stale_elements])
+            await db.executemany(
+                "INSERT OR REPLACE INTO canvas_files (canvas_id, id, data) VALUES (?, ?, ?)",
+                new_files)
+            await db.executemany(
+                "DELETE FROM canvas_files WHERE canvas_id = ? AND id = ?",
+                [(id, file_id) for file_id in stale_files])
+            cursor = await db.execute("SELECT thumbnail FROM canvases WHERE id = ?", (id,))
+            row = await cursor.fetchone()
+            previous_thumbnail = row['thumbnail'] if row else None
             await db.execute("""
-                UPDATE canvases 
+                UPDATE canvases
                 SET data = ?, thumbnail = ?, updated_at = STRFTIME('%Y-%m-%dT%H:%M:%fZ', 'now')
                 WHERE id = ?
-            """, (data, thumbnail, id))
+            """, (json.dumps(rest), thumbnail, id))
             await db.commit()
 
+        if previous_thumbnail and previous_thumbnail != thumbnail:
+            await self._release_thumbnail(previous_thumbnail)
+
+        index, document = self._canvas_written(id)
+        if index is not None:
+            for element_id in stale_elements:
+                index.remove(element_id)
+            for position, element in enumerate(elements):
+                index.upsert(element, position)
+        if document is not None:
+            document.replace(rest, [e for e in elements if e.get('id')], files)
+
+    async def append_canvas_elements(self, canvas_id: str, elements: List[Dict[str, Any]], files: Optional[Dict[str, Any]] = None):
+        """Append elements (on top of the z-order) and files to a canvas"""
+        async with self._pool.acquire() as db:
+            cursor = await db.execute("""
+                SELECT COALESCE(MAX(position), -1) AS last_position
+                FROM canvas_elements
+                WHERE canvas_id = ?
+            """, (canvas_id,))
+            row = await cursor.fetchone()
+            next_position = row['last_position'] + 1
+
+            await db.executemany("""
+                INSERT OR REPLACE INTO canvas_elements (canvas_id, id, position, version, version_nonce, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (canvas_id, element['id'], next_position + i, element.get('version'), element.get('versionNonce'), json.dumps(element))
+                for i, element in enumerate(elements)
+            ])
+            await db.executemany(
+                "INSERT OR REPLACE INTO canvas_files (canvas_id, id, data) VALUES (?, ?, ?)",
+                [(canvas_id, file_id, json.dumps(file_data)) for file_id, file_data in (files or {}).items()])
+            await self._touch_canvas(db, canvas_id)
+            await db.commit()
+
+        index, document = self._canvas_written(canvas_id)
+        if index is not None:
+            for i, element in enumerate(elements):
+                index.upsert(element, next_position + i)
+        if document is not None:
+            document.append(elements, files or {})
+
+    async def patch_canvas_element(self, canvas_id: str, element_id: str, patch: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Merge `patch` into a stored element, returns the updated element"""
+        async with self._pool.acquire() as db:
+            cursor = await db.execute(
+                "SELECT data FROM canvas_elements WHERE canvas_id = ? AND id = ?",
+                (canvas_id, element_id))
+            row = await cursor.fetchone()
+            if row is None:
+                return None
+
+            element = {**json.loads(row['data']), **patch}
+            await db.execute("""
+                UPDATE canvas_elements
+                SET version = ?, version_nonce = ?, data = ?
+                WHERE canvas_id = ? AND id = ?
+            """, (element.get('version'), element.get('versionNonce'), json.dumps(element), canvas_id, element_id))
+            await self._touch_canvas(db, canvas_id)
+            await db.commit()
+
+        index, document = self._canvas_written(canvas_id)
+        if index is not None:
+            index.upsert(element)
+        if document is not None:
+            document.patch(element)
+        return element
+
+    async def delete_canvas_elements(self, canvas_id: str, element_ids: List[str]):
+        """Delete elements from a canvas"""
+        async with self._pool.acquire() as db:
+            await db.executemany(
+                "DELETE FROM canvas_elements WHERE canvas_id = ? AND id = ?",
+                [(canvas_id, element_id) for element_id in element_ids])
+            await self._touch_canvas(db, canvas_id)
+            await db.commit()
+
+        index, document = self._canvas_written(canvas_id)
+        if index is not None:
+            for element_id in element_ids:
+                index.remove(element_id)
+        if document is not None:
+            document.remove(element_ids)
+
+    async def get_canvas_elements(self, canvas_id: str) -> List[Dict[str, Any]]:
+        """Get the elements of a canvas in z-order, without files or appState"""
+        document = self._canvas_documents.get(canvas_id)
+        if document is not None:
+            return list(document.elements)
+        async with self._pool.acquire() as db:
+            cursor = await db.execute("""
+                SELECT data
+                FROM canvas_elements
+                WHERE canvas_id = ?
+                ORDER BY position ASC
+            """, (canvas_id,))
+            return [json.loads(row['data']) for row in await cursor.fetchall()]
+
+    async def get_canvas_index(self, canvas_id: str) -> CanvasSpatialIndex:
+        """Get the layout index of a canvas, loading it from its elements on first use"""
+        index = self._canvas_indexes.get(canvas_id)
+        if index is not None:
+            return index
+
+        generation = self._canvas_generations.get(canvas_id, 0)
+        index = CanvasSpatialIndex(await self.get_canvas_elements(canvas_id))
+        # Only cache it if no write happened while the elements were loading
+        if self._canvas_generations.get(canvas_id, 0) == generation:
+            self._canvas_indexes.put(canvas_id, index)
+        return index
+
+    def _canvas_written(self, canvas_id: str) -> Tuple[Optional[CanvasSpatialIndex], Optional[CanvasDocument]]:
+        """Record a canvas write, returns the cached index and document to update if any"""
+        generation = self._canvas_generations.get(canvas_id, 0) + 1
+        self._canvas_generations[canvas_id] = generation
+        return (
+            self._canvas_indexes.get(canvas_id),
+            self._canvas_documents.for_write(canvas_id, generation),
+        )
+
+    async def _touch_canvas(self, db: Any, canvas_id: str):
+        await db.execute("""
+            UPDATE canvases
+            SET updated_at = STRFTIME('%Y-%m-%dT%H:%M:%fZ', 'now')
+            WHERE id = ?
+        """, (canvas_id,))
+
     async def get_canvas_data(self, id: str) -> Optional[Dict[str, Any]]:
-        """Get canvas data"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = sqlite3.Row
+        """Get canvas data, assembled into the Excalidraw document shape"""
+        document = self._canvas_documents.get(id)
+        if document is None:
+            document = await self._load_canvas_document(id)
+            if document is None:
+                return None
+
+        if document.sessions is None:
+            # Query sessions after releasing the connection, so a single request
+            # never holds two pooled connections at once
+            sessions_version = document.sessions_version
+            sessions = await self.list_sessions(id)
+            if document.sessions_version == sessions_version:
+                document.sessions = sessions
+            return {**document.to_response(), 'sessions': sessions}
+        return document.to_response()
+
+    async def _load_canvas_document(self, id: str) -> Optional[CanvasDocument]:
+        generation = self._canvas_generations.get(id, 0)
+        async with self._pool.acquire() as db:
             cursor = await db.execute("""
                 SELECT data, name
                 FROM canvases
                 WHERE id = ?
             """, (id,))
             row = await cursor.fetchone()
+            if row is None:
+                return None
 
-            sessions = await self.list_sessions(id)
-            
-            if row:
-                return {
-                    'data': json.loads(row['data']) if row['data'] else {},
-                    'name': row['name'],
-                    'sessions': sessions
-                }
-            return None
+            cursor = await db.execute("""
+                SELECT data
+                FROM canvas_elements
+                WHERE canvas_id = ?
+                ORDER BY position ASC
+            """, (id,))
+            elements = [json.loads(r['data']) for r in await cursor.fetchall()]
+
+            cursor = await db.execute(
+                "SELECT id, data FROM canvas_files WHERE canvas_id = ?", (id,))
+            files = {r['id']: json.loads(r['data']) for r in await cursor.fetchall()}
+
+        data = json.loads(row['data']) if row['data'] else {}
+        document = CanvasDocument(row['name'], data, elements, files, generation)
+        # Only cache it if no write happened while the rows were loading
+        if self._canvas_generations.get(id, 0) == generation:
+            self._canvas_documents.put(id, document)
+        return document
+
+    def get_canvas_cache_stats(self) -> Dict[str, Any]:
+        return self._canvas_documents.get_stats()
 
     async def delete_canvas(self, id: str):
         """Delete canvas and related data"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._pool.acquire() as db:
+            cursor = await db.execute("SELECT thumbnail FROM canvases WHERE id = ?", (id,))
+            row = await cursor.fetchone()
+            await db.execute("DELETE FROM canvas_elements WHERE canvas_id = ?", (id,))
+            await db.execute("DELETE FROM canvas_files WHERE canvas_id = ?", (id,))
             await db.execute("DELETE FROM canvases WHERE id = ?", (id,))
             await db.commit()
+        if row and row['thumbnail']:
+            await self._release_thumbnail(row['thumbnail'])
+        self._canvas_indexes.drop(id)
+        self._canvas_documents.drop(id)
+        self._canvas_generations.pop(id, None)
+
+    async def _release_thumbnail(self, thumbnail: str):
+        """Remove a thumbnail file once no canvas uses it anymore"""
+        async with self._pool.acquire() as db:
+            cursor = await db.execute("SELECT 1 FROM canvases WHERE thumbnail = ? LIMIT 1", (thumbnail,))
+            if await cursor.fetchone() is not None:
+                return
+        remove_thumbnail(thumbnail)
 
     async def rename_canvas(self, id: str, name: str):
         """Rename canvas"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._pool.acquire() as db:
             await db.execute("UPDATE canvases SET name = ? WHERE id = ?", (name, id))
             await db.commit()
 
+        _, document = self._canvas_written(id)
+        if document is not None:
+            document.name = name
+
     async def create_comfy_workflow(self, name: str, api_json: str, description: str, inputs: str, outputs: str = None):
         """Create a new comfy workflow"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._pool.acquire() as db:
             await db.execute("""
                 INSERT INTO comfy_workflows (name, api_json, description, inputs, outputs)
                 VALUES (?, ?, ?, ?, ?)
@@ -180,22 +543,20 @@ class DatabaseService:
 
     async def list_comfy_workflows(self) -> List[Dict[str, Any]]:
         """List all comfy workflows"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = sqlite3.Row
+        async with self._pool.acquire() as db:
             cursor = await db.execute("SELECT id, name, description, api_json, inputs, outputs FROM comfy_workflows ORDER BY id DESC")
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
 
     async def delete_comfy_workflow(self, id: int):
         """Delete a comfy workflow"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._pool.acquire() as db:
             await db.execute("DELETE FROM comfy_workflows WHERE id = ?", (id,))
             await db.commit()
 
     async def get_comfy_workflow(self, id: int):
         """Get comfy workflow dict"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = sqlite3.Row
+        async with self._pool.acquire() as db:
             cursor = await db.execute(
                 "SELECT api_json FROM comfy_workflows WHERE id = ?", (id,)
             )
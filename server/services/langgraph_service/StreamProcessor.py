@@ -1,40 +1,73 @@
 # type: ignore[import]
 import traceback
-from typing import Optional, List, Dict, Any, Callable, Awaitable
+from typing import Optional, List, Dict, Any, Callable, Awaitable, Tuple
 from langchain_core.messages import AIMessageChunk, ToolCall, convert_to_openai_messages, ToolMessage
-from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
+import time
 import json
+from services.stream_coalescer import StreamCoalescer
+from services.stream_service import add_stream_processor, remove_stream_processor
 
 
 class StreamProcessor:
     """流式处理器 - 负责处理智能体的流式输出"""
 
-    def __init__(self, session_id: str, db_service: Any, websocket_service: Callable[[str, Dict[str, Any]], Awaitable[None]]):
+    def __init__(self, session_id: str, message_journal: Any, websocket_service: Callable[[str, Dict[str, Any]], Awaitable[None]]):
         self.session_id = session_id
-        self.db_service = db_service
-        self.websocket_service = websocket_service
+        self.message_journal = message_journal
+        # 合并连续的 delta / tool_call_arguments 片段，减少 websocket 帧数
+        self.websocket_service = StreamCoalescer(websocket_service)
         self.tool_calls: List[ToolCall] = []
         self.last_saved_message_index = 0
         self.last_streaming_tool_call_id: Optional[str] = None
-
-    async def process_stream(self, swarm: StateGraph, messages: List[Dict[str, Any]], context: Dict[str, Any]) -> None:
+        # message id -> (langchain message, 转换后的 openai message)，未变化的消息不再重复转换
+        self._converted_messages: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+        # 已发送给前端的消息列表，以及增量事件的序号
+        self._sent_messages: List[Dict[str, Any]] = []
+        self._seq = 0
+        self._visible_history: List[Dict[str, Any]] = []
+        self._input_count = 0
+        # 第一个 token / 工具调用到达的时间，用于统计 TTFT
+        self.first_token_at: Optional[float] = None
+
+    async def process_stream(
+        self,
+        compiled_swarm: CompiledStateGraph,
+        messages: List[Dict[str, Any]],
+        context: Dict[str, Any],
+        visible_history: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
         """处理整个流式响应
 
         Args:
-            swarm: 智能体群组
+            compiled_swarm: 编译好的智能体群组
             messages: 消息列表
             context: 上下文信息
+            visible_history: 前端当前的消息列表，智能体新生成的消息接在它后面，
+                默认就是 messages 本身
         """
-        self.last_saved_message_index = len(messages) - 1
-
-        compiled_swarm = swarm.compile()
-
-        async for chunk in compiled_swarm.astream(
-            {"messages": messages},
-            config=context,
-            stream_mode=["messages", "custom", 'values']
-        ):
-            await self._handle_chunk(chunk)
+        self._visible_history = messages if visible_history is None else visible_history
+        self._input_count = len(messages)
+        # 前端已经有这些消息，第一个 patch 从它们之后开始
+        self._sent_messages = list(self._visible_history)
+        # 下标统一使用前端消息列表的坐标：visible_history + 智能体新生成的消息
+        self.last_saved_message_index = len(self._visible_history) - 1
+
+        add_stream_processor(self.session_id, self)
+        try:
+            async for chunk in compiled_swarm.astream(
+                {"messages": messages},
+                config=context,
+                stream_mode=["messages", "custom", 'values']
+            ):
+                await self._handle_chunk(chunk)
+        finally:
+            remove_stream_processor(self.session_id, self)
+            # 出错或取消时也要把缓冲中的片段发出去
+            await self.websocket_service.flush(reason='stream_end')
+
+        # 流结束时写入缓冲中的消息
+        await self.message_journal.flush(self.session_id)
 
         # 发送完成事件
         await self.websocket_service(self.session_id, {
@@ -54,33 +87,82 @@ class StreamProcessor:
     async def _handle_values_chunk(self, chunk_data: Dict[str, Any]) -> None:
         """处理 values 类型的 chunk"""
         all_messages = chunk_data.get('messages', [])
-        oai_messages = convert_to_openai_messages(all_messages)
-        # 确保 oai_messages 是列表类型
-        if not isinstance(oai_messages, list):
-            oai_messages = [oai_messages] if oai_messages else []
+        oai_messages = self._visible_history + self._convert_messages(all_messages[self._input_count:])
 
-        # 发送所有消息到前端
-        await self.websocket_service(self.session_id, {
-            'type': 'all_messages',
-            'messages': oai_messages
-        })
+        # 只发送新增或变化的消息
+        await self._send_messages_patch(oai_messages)
 
-        # 保存新消息到数据库
+        # 保存新消息到数据库（写入缓冲，批量落库）
         for i in range(self.last_saved_message_index + 1, len(oai_messages)):
             new_message = oai_messages[i]
             if len(oai_messages) > 0:  # 确保有消息才保存
-                await self.db_service.create_message(
+                await self.message_journal.append(
                     self.session_id,
                     new_message.get('role', 'user'),
                     json.dumps(new_message)
                 )
             self.last_saved_message_index = i
 
+    def _convert_messages(self, messages: List[Any]) -> List[Dict[str, Any]]:
+        """转换为 openai 格式，已转换且未变化的消息直接使用缓存"""
+        oai_messages: List[Optional[Dict[str, Any]]] = [None] * len(messages)
+        missing: List[int] = []
+        for i, message in enumerate(messages):
+            message_id = getattr(message, 'id', None)
+            cached = self._converted_messages.get(message_id) if message_id else None
+            if cached and (cached[0] is message or cached[0] == message):
+                oai_messages[i] = cached[1]
+            else:
+                missing.append(i)
+
+        if missing:
+            converted = convert_to_openai_messages([messages[i] for i in missing])
+            # 确保 converted 是列表类型
+            if not isinstance(converted, list):
+                converted = [converted] if converted else []
+            for i, oai_message in zip(missing, converted):
+                oai_messages[i] = oai_message
+                message_id = getattr(messages[i], 'id', None)
+                if message_id:
+                    self._converted_messages[message_id] = (messages[i], oai_message)
+
+        return [m for m in oai_messages if m is not None]
+
+    async def _send_messages_patch(self, oai_messages: List[Dict[str, Any]]) -> None:
+        """发送从第一个变化位置开始的消息，前端据此替换 start 之后的部分"""
+        start = 0
+        sent = self._sent_messages
+        while start < len(oai_messages) and start < len(sent) and (
+                oai_messages[start] is sent[start] or oai_messages[start] == sent[start]):
+            start += 1
+        if start == len(oai_messages) == len(sent):
+            return
+
+        self._sent_messages = list(oai_messages)
+        await self._emit_patch(start)
+
+    async def _emit_patch(self, start: int) -> None:
+        self._seq += 1
+        await self.websocket_service(self.session_id, {
+            'type': 'messages_patch',
+            'seq': self._seq,
+            'start': start,
+            'total': len(self._sent_messages),
+            'messages': self._sent_messages[start:]
+        })
+
+    async def resync(self) -> None:
+        """前端发现序号不连续时，重新发送完整的消息列表"""
+        await self._emit_patch(0)
+
     async def _handle_message_chunk(self, ai_message_chunk: AIMessageChunk) -> None:
         """处理消息类型的 chunk"""
         # print('👇ai_message_chunk', ai_message_chunk)
         try:
             content = ai_message_chunk.content
+            if self.first_token_at is None and not isinstance(ai_message_chunk, ToolMessage) and (
+                    content or getattr(ai_message_chunk, 'tool_call_chunks', None)):
+                self.first_token_at = time.perf_counter()
 
             if isinstance(ai_message_chunk, ToolMessage):
                 # 工具调用结果之后会在 values 类型中发送到前端，这里会更快出现一些
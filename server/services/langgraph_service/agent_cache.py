@@ -0,0 +1,131 @@
+"""
+LRU cache of text model clients and compiled agent swarms
+
+Building a chat turn used to create a new ChatOpenAI (with two new httpx
+clients), new react agents, a new swarm and compile it. None of that depends
+on the conversation itself, so the results are cached:
+- model clients, keyed by provider, model and url
+- compiled swarms, keyed by the model key, the tool id set, the system
+  prompt and the default active agent
+
+Both depend on the app config (api keys, urls) and on the registered tools,
+so the cache is dropped whenever `config_service.version` or
+`tool_service.version` changes.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+DEFAULT_MAX_MODELS = 8
+DEFAULT_MAX_SWARMS = 16
+
+
+class _LRU:
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self._items: 'OrderedDict[Hashable, Any]' = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if key not in self._items:
+            return None
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class AgentCache:
+    """Caches model clients and compiled swarms between chat turns"""
+
+    def __init__(self, max_models: int = DEFAULT_MAX_MODELS, max_swarms: int = DEFAULT_MAX_SWARMS):
+        self._models = _LRU(max_models)
+        self._swarms = _LRU(max_swarms)
+        self._versions: Optional[Tuple[int, int]] = None
+        # instrumentation
+        self._hits = {'model': 0, 'swarm': 0}
+        self._misses = {'model': 0, 'swarm': 0}
+        self._invalidations = 0
+        self._build_time = {'model': 0.0, 'swarm': 0.0}
+        self._ttft: Dict[str, Dict[str, float]] = {
+            'cached': {'count': 0, 'total': 0.0, 'max': 0.0},
+            'uncached': {'count': 0, 'total': 0.0, 'max': 0.0},
+        }
+
+    def check_versions(self, config_version: int, tool_version: int) -> None:
+        """Drop every entry if the config or the registered tools changed"""
+        versions = (config_version, tool_version)
+        if self._versions is not None and self._versions != versions:
+            self.invalidate()
+        self._versions = versions
+
+    def invalidate(self) -> None:
+        if len(self._models) or len(self._swarms):
+            self._invalidations += 1
+        self._models.clear()
+        self._swarms.clear()
+
+    def get_model(self, key: Hashable, build: Callable[[], Any]) -> Tuple[Any, bool]:
+        return self._get_or_build('model', self._models, key, build)
+
+    def get_swarm(self, key: Hashable, build: Callable[[], Any]) -> Tuple[Any, bool]:
+        return self._get_or_build('swarm', self._swarms, key, build)
+
+    def _get_or_build(self, kind: str, lru: _LRU, key: Hashable, build: Callable[[], Any]) -> Tuple[Any, bool]:
+        value = lru.get(key)
+        if value is not None:
+            self._hits[kind] += 1
+            return value, True
+
+        start = time.perf_counter()
+        value = build()
+        self._build_time[kind] += time.perf_counter() - start
+        self._misses[kind] += 1
+        lru.put(key, value)
+        return value, False
+
+    def record_ttft(self, cached: bool, seconds: float) -> None:
+        """Record time-to-first-token of a chat turn"""
+        bucket = self._ttft['cached' if cached else 'uncached']
+        bucket['count'] += 1
+        bucket['total'] += seconds
+        bucket['max'] = max(bucket['max'], seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        def build_ms(kind: str) -> float:
+            misses = self._misses[kind]
+            return round(self._build_time[kind] * 1000 / misses, 3) if misses else 0.0
+
+        def ttft(bucket: Dict[str, float]) -> Dict[str, Any]:
+            count = int(bucket['count'])
+            return {
+                'count': count,
+                'avg_ms': round(bucket['total'] * 1000 / count, 3) if count else 0.0,
+                'max_ms': round(bucket['max'] * 1000, 3),
+            }
+
+        return {
+            'models': len(self._models),
+            'swarms': len(self._swarms),
+            'hits': dict(self._hits),
+            'misses': dict(self._misses),
+            'invalidations': self._invalidations,
+            'avg_model_build_ms': build_ms('model'),
+            'avg_swarm_build_ms': build_ms('swarm'),
+            'ttft_cached': ttft(self._ttft['cached']),
+            'ttft_uncached': ttft(self._ttft['uncached']),
+        }
+
+
+# Create a singleton instance
+agent_cache = AgentCache()
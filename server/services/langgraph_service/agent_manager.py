@@ -14,6 +14,9 @@ class AgentManager:
     此类负责协调智能体配置的获取和实际 LangGraph 智能体的创建。
     """
 
+    # create_agents 创建的智能体名称
+    AGENT_NAMES = ['planner', 'image_video_creator']
+
     @staticmethod
     def create_agents(
         model: Any,
@@ -1,7 +1,11 @@
 from models.tool_model import ToolInfoJson
-from services.db_service import db_service
+from services.message_journal import message_journal
 from .StreamProcessor import StreamProcessor
 from .agent_manager import AgentManager
+from .agent_cache import agent_cache
+from .chat_history import chat_history_cache
+from .context_budget import context_budgeter
+import time
 import traceback
 from utils.http_client import HttpClient
 from langgraph_swarm import create_swarm  # type: ignore
@@ -9,7 +13,8 @@ from langchain_openai import ChatOpenAI
 from langchain_ollama import ChatOllama
 from services.websocket_service import send_to_websocket  # type: ignore
 from services.config_service import config_service
-from typing import Optional, List, Dict, Any, cast, Set, TypedDict
+from services.tool_service import tool_service
+from typing import Optional, List, Dict, Any, cast, TypedDict
 from models.config_model import ModelInfo
 
 
@@ -20,61 +25,6 @@ class ContextInfo(TypedDict):
     model_info: Dict[str, List[ModelInfo]]
 
 
-def _fix_chat_history(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """修复聊天历史中不完整的工具调用
-
-    根据LangGraph文档建议，移除没有对应ToolMessage的tool_calls
-    参考: https://langchain-ai.github.io/langgraph/troubleshooting/errors/INVALID_CHAT_HISTORY/
-    """
-    if not messages:
-        return messages
-
-    fixed_messages: List[Dict[str, Any]] = []
-    tool_call_ids: Set[str] = set()
-
-    # 第一遍：收集所有ToolMessage的tool_call_id
-    for msg in messages:
-        if msg.get('role') == 'tool' and msg.get('tool_call_id'):
-            tool_call_id = msg.get('tool_call_id')
-            if tool_call_id:
-                tool_call_ids.add(tool_call_id)
-
-    # 第二遍：修复AIMessage中的tool_calls
-    for msg in messages:
-        if msg.get('role') == 'assistant' and msg.get('tool_calls'):
-            # 过滤掉没有对应ToolMessage的tool_calls
-            valid_tool_calls: List[Dict[str, Any]] = []
-            removed_calls: List[str] = []
-
-            for tool_call in msg.get('tool_calls', []):
-                tool_call_id = tool_call.get('id')
-                if tool_call_id in tool_call_ids:
-                    valid_tool_calls.append(tool_call)
-                elif tool_call_id:
-                    removed_calls.append(tool_call_id)
-
-            # 记录修复信息
-            if removed_calls:
-                print(
-                    f"🔧 修复消息历史：移除了 {len(removed_calls)} 个不完整的工具调用: {removed_calls}")
-
-            # 更新消息
-            if valid_tool_calls:
-                msg_copy = msg.copy()
-                msg_copy['tool_calls'] = valid_tool_calls
-                fixed_messages.append(msg_copy)
-            elif msg.get('content'):  # 如果没有有效的tool_calls但有content，保留消息
-                msg_copy = msg.copy()
-                msg_copy.pop('tool_calls', None)  # 移除空的tool_calls
-                fixed_messages.append(msg_copy)
-            # 如果既没有有效tool_calls也没有content，跳过这条消息
-        else:
-            # 非assistant消息或没有tool_calls的消息直接保留
-            fixed_messages.append(msg)
-
-    return fixed_messages
-
-
 async def langgraph_multi_agent(
     messages: List[Dict[str, Any]],
     canvas_id: str,
@@ -86,55 +36,91 @@ async def langgraph_multi_agent(
     """多智能体处理函数
 
     Args:
-        messages: 消息历史
+        messages: 前端发送的消息列表（已加载的历史和新的用户消息，新消息已由 handle_chat 落库）
         canvas_id: 画布ID
         session_id: 会话ID
         text_model: 文本模型配置
         tool_list: 工具模型配置列表（图像或视频模型）
         system_prompt: 系统提示词
     """
+    started_at = time.perf_counter()
     try:
-        # 0. 修复消息历史
-        fixed_messages = _fix_chat_history(messages)
-
-        # 2. 文本模型
-        text_model_instance = _create_text_model(text_model)
-
-        # 3. 创建智能体
-        agents = AgentManager.create_agents(
-            text_model_instance,
-            tool_list,  # 传入所有注册的工具
-            system_prompt or ""
-        )
-        agent_names = [agent.name for agent in agents]
-        print('👇agent_names', agent_names)
+        # 0. 从数据库中的会话历史构建智能体的消息（前端只加载了最近几页，不能作为历史来源），
+        #    修复消息历史，只保留最近的若干轮（更早的消息替换为摘要）
+        history = await chat_history_cache.prepare(session_id)
+        # 发给模型的消息控制在 token 预算内（旧图片、旧工具输出被替换）
+        budget = context_budgeter.budget_for(
+            config_service.app_config, text_model.get('provider'), text_model.get('model'))
+        fixed_messages = context_budgeter.apply(history.messages, budget, pinned=history.pinned)
+
+        # 1. 配置或工具变化时清空缓存
+        agent_cache.check_versions(config_service.version, tool_service.version)
+
+        # 2. 文本模型（缓存复用）
+        model_key = (text_model.get('provider'), text_model.get('model'), text_model.get('url'))
+        text_model_instance, model_cached = agent_cache.get_model(
+            model_key, lambda: _create_text_model(text_model))
+
+        # 3. 创建智能体群组并编译（缓存复用）
         last_agent = AgentManager.get_last_active_agent(
-            fixed_messages, agent_names)
-
+            fixed_messages, AgentManager.AGENT_NAMES)
         print('👇last_agent', last_agent)
 
-        # 4. 创建智能体群组
-        swarm = create_swarm(
-            agents=agents,  # type: ignore
-            default_active_agent=last_agent if last_agent else agent_names[0]
+        swarm_key = (
+            model_key,
+            tuple(sorted(tool.get('id', '') for tool in tool_list)),
+            system_prompt or "",
+            last_agent,
         )
+        compiled_swarm, swarm_cached = agent_cache.get_swarm(
+            swarm_key, lambda: _build_swarm(text_model_instance, tool_list, system_prompt, last_agent))
 
-        # 5. 创建上下文
+        # 4. 创建上下文
         context = {
             'canvas_id': canvas_id,
             'session_id': session_id,
             'tool_list': tool_list,
         }
 
-        # 6. 流处理
+        # 5. 流处理
         processor = StreamProcessor(
-            session_id, db_service, send_to_websocket)  # type: ignore
-        await processor.process_stream(swarm, fixed_messages, context)
+            session_id, message_journal, send_to_websocket)  # type: ignore
+        try:
+            # 前端的消息列表就是它发送的 messages，patch 和落库的下标都从它之后开始
+            await processor.process_stream(
+                compiled_swarm, fixed_messages, context,
+                visible_history=messages)
+        finally:
+            if processor.first_token_at is not None:
+                agent_cache.record_ttft(
+                    model_cached and swarm_cached, processor.first_token_at - started_at)
 
     except Exception as e:
         await _handle_error(e, session_id)
 
 
+def _build_swarm(
+    text_model_instance: Any,
+    tool_list: List[ToolInfoJson],
+    system_prompt: Optional[str],
+    last_agent: Optional[str]
+) -> Any:
+    """创建智能体并编译智能体群组"""
+    agents = AgentManager.create_agents(
+        text_model_instance,
+        tool_list,  # 传入所有注册的工具
+        system_prompt or ""
+    )
+    agent_names = [agent.name for agent in agents]
+    print('👇agent_names', agent_names)
+
+    swarm = create_swarm(
+        agents=agents,  # type: ignore
+        default_active_agent=last_agent if last_agent in agent_names else agent_names[0]
+    )
+    return swarm.compile()
+
+
 def _create_text_model(text_model: ModelInfo) -> Any:
     """创建语言模型实例"""
     model = text_model.get('model')
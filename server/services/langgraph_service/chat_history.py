@@ -0,0 +1,228 @@
+"""
+Chat history preparation for the agents
+
+The agent history is built from the persisted messages of the session, not
+from what the frontend posts: the chat panel only holds the pages of
+history it loaded, so older turns would be lost. The new user message is
+persisted by handle_chat before the agent runs, the messages of the
+agents by the message journal. Before the history reaches the swarm it is:
+- repaired: tool calls without a matching tool result are removed
+  (LangGraph rejects such histories)
+- windowed: only the last `max_turns` turns (a turn starts at a user
+  message) are sent as is, older messages are replaced by one pinned
+  summary message
+
+The history is loaded once per session and then only extended with the
+rows persisted since the last turn (chat_messages ids only grow), the
+repaired history and the summary are extended with it.
+"""
+
+import asyncio
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+from services.db_service import db_service
+
+DEFAULT_MAX_TURNS = int(os.environ.get('CHAT_HISTORY_MAX_TURNS', '20'))
+DEFAULT_MAX_SESSIONS = 64
+SUMMARY_MAX_LINES = 40
+SUMMARY_MAX_CHARS = 300
+
+
+def _answered_tool_call_ids(messages: List[Dict[str, Any]]) -> Set[str]:
+    return {
+        msg['tool_call_id'] for msg in messages
+        if msg.get('role') == 'tool' and msg.get('tool_call_id')
+    }
+
+
+def _repair(messages: List[Dict[str, Any]], tool_call_ids: Set[str]) -> Tuple[List[Dict[str, Any]], Set[str]]:
+    """Remove tool calls that have no result in `tool_call_ids`, returns the removed ids too"""
+    fixed_messages: List[Dict[str, Any]] = []
+    removed_ids: Set[str] = set()
+    for msg in messages:
+        if msg.get('role') == 'assistant' and msg.get('tool_calls'):
+            # 过滤掉没有对应ToolMessage的tool_calls
+            valid_tool_calls: List[Dict[str, Any]] = []
+            removed_calls: List[str] = []
+
+            for tool_call in msg.get('tool_calls', []):
+                tool_call_id = tool_call.get('id')
+                if tool_call_id in tool_call_ids:
+                    valid_tool_calls.append(tool_call)
+                elif tool_call_id:
+                    removed_calls.append(tool_call_id)
+
+            # 记录修复信息
+            if removed_calls:
+                removed_ids.update(removed_calls)
+                print(
+                    f"🔧 修复消息历史：移除了 {len(removed_calls)} 个不完整的工具调用: {removed_calls}")
+
+            # 更新消息
+            if valid_tool_calls:
+                msg_copy = msg.copy()
+                msg_copy['tool_calls'] = valid_tool_calls
+                fixed_messages.append(msg_copy)
+            elif msg.get('content'):  # 如果没有有效的tool_calls但有content，保留消息
+                msg_copy = msg.copy()
+                msg_copy.pop('tool_calls', None)  # 移除空的tool_calls
+                fixed_messages.append(msg_copy)
+            # 如果既没有有效tool_calls也没有content，跳过这条消息
+        else:
+            # 非assistant消息或没有tool_calls的消息直接保留
+            fixed_messages.append(msg)
+    return fixed_messages, removed_ids
+
+
+def fix_chat_history(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """修复聊天历史中不完整的工具调用
+
+    根据LangGraph文档建议，移除没有对应ToolMessage的tool_calls
+    参考: https://langchain-ai.github.io/langgraph/troubleshooting/errors/INVALID_CHAT_HISTORY/
+    """
+    if not messages:
+        return messages
+    return _repair(messages, _answered_tool_call_ids(messages))[0]
+
+
+def _text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for part in content:
+            if isinstance(part, dict) and part.get('type') == 'text':
+                parts.append(str(part.get('text', '')))
+            elif isinstance(part, dict) and part.get('type') == 'image_url':
+                parts.append('[image]')
+        return ' '.join(parts)
+    return ''
+
+
+def _summary_line(msg: Dict[str, Any]) -> Optional[str]:
+    role = msg.get('role')
+    text = ' '.join(_text(msg.get('content')).split())
+    if role == 'assistant' and msg.get('tool_calls'):
+        names = ', '.join(tool_call.get('function', {}).get('name', '') for tool_call in msg['tool_calls'])
+        text = f"{text} (called {names})".strip()
+    if not text or role not in ('user', 'assistant', 'tool'):
+        return None
+    if len(text) > SUMMARY_MAX_CHARS:
+        text = text[:SUMMARY_MAX_CHARS] + '…'
+    return f"- {role}: {text}"
+
+
+class PreparedHistory(NamedTuple):
+    # Messages to send to the swarm
+    messages: List[Dict[str, Any]]
+    # Number of leading agent-only messages in `messages` (the summary)
+    pinned: int
+
+
+class _SessionHistory:
+    __slots__ = ('lock', 'last_id', 'raw', 'fixed', 'removed_ids', 'summary_upto', 'summary_lines')
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        # id of the last chat_messages row read
+        self.last_id = 0
+        self.raw: List[Dict[str, Any]] = []
+        self.fixed: List[Dict[str, Any]] = []
+        self.removed_ids: Set[str] = set()
+        self.summary_upto = 0
+        self.summary_lines: List[str] = []
+
+
+class ChatHistoryCache:
+    """Per-session repaired and windowed chat history, read from the database"""
+
+    def __init__(self, db_service: Any, max_turns: int = DEFAULT_MAX_TURNS, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.db_service = db_service
+        # 0 disables the window
+        self.max_turns = max_turns
+        self.max_sessions = max(1, max_sessions)
+        self._sessions: 'OrderedDict[str, _SessionHistory]' = OrderedDict()
+        # instrumentation
+        self._loads = 0
+        self._incremental = 0
+        self._rebuilds = 0
+        self._trimmed_messages = 0
+
+    async def prepare(self, session_id: str) -> PreparedHistory:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            self._loads += 1
+            entry = _SessionHistory()
+            self._sessions[session_id] = entry
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._incremental += 1
+        self._sessions.move_to_end(session_id)
+
+        async with entry.lock:
+            new_messages, entry.last_id = await self.db_service.get_chat_history_since(session_id, entry.last_id)
+            if new_messages:
+                entry.raw.extend(new_messages)
+                answered = _answered_tool_call_ids(new_messages)
+                if answered & entry.removed_ids:
+                    # A tool call removed earlier got its result after all
+                    self._rebuilds += 1
+                    entry.fixed, entry.removed_ids = _repair(entry.raw, _answered_tool_call_ids(entry.raw))
+                else:
+                    fixed, removed = _repair(new_messages, answered)
+                    entry.fixed.extend(fixed)
+                    entry.removed_ids |= removed
+            return self._window(entry)
+
+    def _window(self, entry: _SessionHistory) -> PreparedHistory:
+        fixed = entry.fixed
+        cut = 0
+        if self.max_turns > 0:
+            turns = 0
+            for i in range(len(fixed) - 1, -1, -1):
+                if fixed[i].get('role') == 'user':
+                    turns += 1
+                    if turns == self.max_turns:
+                        cut = i
+                        break
+        if cut == 0:
+            return PreparedHistory(list(fixed), 0)
+
+        # The summary only grows, extend it with the newly trimmed messages
+        if cut < entry.summary_upto:
+            entry.summary_upto, entry.summary_lines = 0, []
+        for msg in fixed[entry.summary_upto:cut]:
+            line = _summary_line(msg)
+            if line:
+                entry.summary_lines.append(line)
+        entry.summary_lines = entry.summary_lines[-SUMMARY_MAX_LINES:]
+        entry.summary_upto = cut
+        self._trimmed_messages += cut
+
+        summary = {
+            'role': 'user',
+            'content': (
+                f"[Summary of the earlier conversation, {cut} older messages omitted]\n"
+                + '\n'.join(entry.summary_lines)
+            ),
+        }
+        return PreparedHistory([summary] + fixed[cut:], 1)
+
+    def drop(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'sessions': len(self._sessions),
+            'max_turns': self.max_turns,
+            'loads': self._loads,
+            'incremental': self._incremental,
+            'rebuilds': self._rebuilds,
+            'trimmed_messages': self._trimmed_messages,
+        }
+
+
+# Create a singleton instance
+chat_history_cache = ChatHistoryCache(db_service)
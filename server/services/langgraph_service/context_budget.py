@@ -0,0 +1,209 @@
+"""
+Token budget of the history sent to the text model
+
+The frontend posts the whole conversation every turn, with base64 image
+parts and full tool outputs, and all of it is sent to the model again.
+Before the swarm runs, ContextBudgeter:
+- replaces images older than the recent turns with a text reference to
+  their /api/file/... file (uploaded images are listed by file_id in the
+  <input_images> block of the same message)
+- truncates tool outputs older than the recent turns
+- if the estimate is still above the budget, drops the oldest turns
+
+The recent turns are never touched. The budget is CONTEXT_TOKEN_BUDGET, or
+`context_budget` of the model in config.toml. Tokens are estimated from the
+text length (no tokenizer is bundled) and a flat cost per image.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+DEFAULT_CONTEXT_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', '64000'))
+RECENT_TURNS = int(os.environ.get('CONTEXT_RECENT_TURNS', '2'))
+STALE_TOOL_OUTPUT_CHARS = 2000
+OVER_BUDGET_TOOL_OUTPUT_CHARS = 200
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = 765
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_INPUT_IMAGE_RE = re.compile(r'<image index="(\d+)" file_id="([^"]+)"')
+
+
+def estimate_tokens(message: Dict[str, Any]) -> int:
+    """Rough token count of an openai format message"""
+    chars = 0
+    images = 0
+    content = message.get('content')
+    if isinstance(content, str):
+        chars += len(content)
+    elif isinstance(content, list):
+        for part in content:
+            if not isinstance(part, dict):
+                continue
+            if part.get('type') == 'image_url':
+                images += 1
+            else:
+                chars += len(str(part.get('text', '')))
+    for tool_call in message.get('tool_calls') or []:
+        function = tool_call.get('function') or {}
+        chars += len(str(function.get('name', ''))) + len(str(function.get('arguments', '')))
+    return MESSAGE_OVERHEAD_TOKENS + chars // CHARS_PER_TOKEN + images * IMAGE_TOKENS
+
+
+def _replace_images(message: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """Copy of a message with image parts replaced by file references"""
+    content = message.get('content')
+    if not isinstance(content, list) or not any(
+            isinstance(part, dict) and part.get('type') == 'image_url' for part in content):
+        return message, 0
+
+    text = ' '.join(str(part.get('text', '')) for part in content
+                    if isinstance(part, dict) and part.get('type') == 'text')
+    file_ids = {int(index): file_id for index, file_id in _INPUT_IMAGE_RE.findall(text)}
+    parts: List[Any] = []
+    replaced = 0
+    for part in content:
+        if isinstance(part, dict) and part.get('type') == 'image_url':
+            replaced += 1
+            url = str((part.get('image_url') or {}).get('url', ''))
+            if replaced in file_ids:
+                reference = f'/api/file/{file_ids[replaced]}'
+            elif url.startswith('/api/file/') or url.startswith('http'):
+                reference = url
+            else:
+                reference = ''
+            parts.append({
+                'type': 'text',
+                'text': f'[image {replaced}: {reference}]' if reference else f'[image {replaced} omitted]',
+            })
+        else:
+            parts.append(part)
+    return {**message, 'content': parts}, replaced
+
+
+def _truncate_tool_output(message: Dict[str, Any], max_chars: int) -> Tuple[Dict[str, Any], bool]:
+    content = message.get('content')
+    if message.get('role') != 'tool' or not isinstance(content, str) or len(content) <= max_chars:
+        return message, False
+    omitted = len(content) - max_chars
+    return {**message, 'content': f'{content[:max_chars]}…[{omitted} characters truncated]'}, True
+
+
+class ContextBudgeter:
+    """Keeps the messages sent to the model under a token budget"""
+
+    def __init__(self, default_budget: int = DEFAULT_CONTEXT_BUDGET, recent_turns: int = RECENT_TURNS):
+        self.default_budget = default_budget
+        self.recent_turns = max(1, recent_turns)
+        # instrumentation
+        self._turns = 0
+        self._tokens_before = 0
+        self._tokens_after = 0
+        self._over_budget = 0
+        self._images_replaced = 0
+        self._tool_outputs_truncated = 0
+        self._messages_dropped = 0
+        self._last: Dict[str, Any] = {}
+
+    def budget_for(self, app_config: Dict[str, Any], provider: Optional[str], model: Optional[str]) -> int:
+        """Per model budget from config.toml (`context_budget`), or the default"""
+        model_config = (app_config.get(provider or '', {}).get('models') or {}).get(model or '') or {}
+        try:
+            return int(model_config.get('context_budget') or self.default_budget)
+        except (TypeError, ValueError):
+            return self.default_budget
+
+    def apply(self, messages: List[Dict[str, Any]], budget: int, pinned: int = 0) -> List[Dict[str, Any]]:
+        """Pruned copy of `messages`, the first `pinned` messages are always kept"""
+        tokens = [estimate_tokens(message) for message in messages]
+        before = sum(tokens)
+
+        # Start of the recent turns, which are sent untouched
+        recent_start = len(messages)
+        turns = 0
+        for i in range(len(messages) - 1, pinned - 1, -1):
+            if messages[i].get('role') == 'user':
+                turns += 1
+                recent_start = i
+                if turns == self.recent_turns:
+                    break
+        if turns < self.recent_turns:
+            recent_start = pinned
+
+        pruned = list(messages)
+        images_replaced = 0
+        truncated_indexes: Set[int] = set()
+        for i in range(pinned, recent_start):
+            message, replaced = _replace_images(pruned[i])
+            message, truncated = _truncate_tool_output(message, STALE_TOOL_OUTPUT_CHARS)
+            if replaced or truncated:
+                pruned[i] = message
+                tokens[i] = estimate_tokens(message)
+                images_replaced += replaced
+                if truncated:
+                    truncated_indexes.add(i)
+
+        total = sum(tokens)
+        over_budget = total > budget
+        if over_budget:
+            for i in range(pinned, recent_start):
+                message, truncated = _truncate_tool_output(pruned[i], OVER_BUDGET_TOOL_OUTPUT_CHARS)
+                if truncated:
+                    pruned[i] = message
+                    total -= tokens[i] - estimate_tokens(message)
+                    tokens[i] = estimate_tokens(message)
+                    truncated_indexes.add(i)
+        tool_outputs_truncated = len(truncated_indexes)
+
+        # Still too large: drop the oldest whole turns, a turn starts at a user message
+        drop_end = pinned
+        while total > budget and drop_end < recent_start:
+            total -= tokens[drop_end]
+            drop_end += 1
+            while drop_end < recent_start and pruned[drop_end].get('role') != 'user':
+                total -= tokens[drop_end]
+                drop_end += 1
+        dropped = drop_end - pinned
+        if dropped:
+            pruned = pruned[:pinned] + pruned[drop_end:]
+
+        self._record(before, total, budget, over_budget, images_replaced, tool_outputs_truncated, dropped)
+        if before > total:
+            print(f"✂️ Context budget: {before} -> {total} tokens (saved {before - total}, budget {budget}), "
+                  f"{images_replaced} images replaced, {tool_outputs_truncated} tool outputs truncated, "
+                  f"{dropped} messages dropped")
+        if total > budget:
+            print(f"⚠️ Context budget: recent turns alone need {total} tokens, budget is {budget}")
+        return pruned
+
+    def _record(self, before: int, after: int, budget: int, over_budget: bool,
+                images_replaced: int, tool_outputs_truncated: int, dropped: int) -> None:
+        self._turns += 1
+        self._tokens_before += before
+        self._tokens_after += after
+        self._over_budget += int(over_budget)
+        self._images_replaced += images_replaced
+        self._tool_outputs_truncated += tool_outputs_truncated
+        self._messages_dropped += dropped
+        self._last = {'tokens_before': before, 'tokens_after': after, 'tokens_saved': before - after, 'budget': budget}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'default_budget': self.default_budget,
+            'recent_turns': self.recent_turns,
+            'turns': self._turns,
+            'tokens_before': self._tokens_before,
+            'tokens_after': self._tokens_after,
+            'tokens_saved': self._tokens_before - self._tokens_after,
+            'avg_tokens_saved_per_turn': round((self._tokens_before - self._tokens_after) / self._turns, 1) if self._turns else 0.0,
+            'over_budget_turns': self._over_budget,
+            'images_replaced': self._images_replaced,
+            'tool_outputs_truncated': self._tool_outputs_truncated,
+            'messages_dropped': self._messages_dropped,
+            'last_turn': dict(self._last),
+        }
+
+
+# Create a singleton instance
+context_budgeter = ContextBudgeter()
@@ -9,6 +9,7 @@ from typing import Dict, Any, List
 from services.db_service import db_service
 from services.OpenAIAgents_service import create_jaaz_response
 from services.websocket_service import send_to_websocket  # type: ignore
+from services.websocket_state import bind_session_to_canvas
 from services.stream_service import add_stream_task, remove_stream_task
 
 
@@ -35,6 +36,9 @@ async def handle_magic(data: Dict[str, Any]) -> None:
     session_id: str = data.get('session_id', '')
     canvas_id: str = data.get('canvas_id', '')
 
+    # Route this session's events to clients that have the canvas open
+    bind_session_to_canvas(session_id, canvas_id)
+
     # print('✨ magic_service 接收到数据:', {
     #     'session_id': session_id,
     #     'canvas_id': canvas_id,
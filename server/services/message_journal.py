@@ -0,0 +1,138 @@
+"""
+Write-behind journal for streamed chat messages
+
+StreamProcessor appends every new message here instead of awaiting one
+INSERT + COMMIT per message. Messages are buffered per session and written
+in a single executemany transaction when:
+- the session buffer reaches `max_batch` messages
+- `flush_interval` seconds passed since the first buffered message
+- the stream ends or is cancelled (explicit `flush(session_id)`)
+- the server shuts down (`flush()` for all sessions)
+
+Flushes of the same session are serialized, so messages are always
+written in the order they were appended, and a flush that already started
+completes even if the streaming task is cancelled.
+"""
+
+import asyncio
+import time
+import traceback
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+from services.db_service import db_service
+
+DEFAULT_MAX_BATCH = 20
+DEFAULT_FLUSH_INTERVAL = 0.5  # seconds
+
+
+class MessageJournal:
+    """Per-session buffer of chat messages with batched persistence"""
+
+    def __init__(
+        self,
+        db_service: Any,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ):
+        self.db_service = db_service
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = flush_interval
+        self._buffers: Dict[str, List[Tuple[str, str, str]]] = {}
+        # A session's lock lives as long as a flush holds or waits for it
+        self._flush_locks: 'weakref.WeakValueDictionary[str, asyncio.Lock]' = weakref.WeakValueDictionary()
+        self._timers: Dict[str, asyncio.Task[None]] = {}
+        # instrumentation
+        self._flush_count = 0
+        self._flushed_messages = 0
+        self._failed_flushes = 0
+        self._flush_reasons: Dict[str, int] = {}
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._last_latency = 0.0
+
+    async def append(self, session_id: str, role: str, message: str) -> None:
+        """Buffer a message, flushing the session if the batch is full"""
+        buffer = self._buffers.setdefault(session_id, [])
+        buffer.append((session_id, role, message))
+
+        if len(buffer) >= self.max_batch:
+            await self.flush(session_id, reason='size')
+        elif session_id not in self._timers:
+            self._timers[session_id] = asyncio.create_task(
+                self._flush_later(session_id))
+
+    async def flush(self, session_id: Optional[str] = None, reason: str = 'explicit') -> None:
+        """Write buffered messages of one session, or of all sessions"""
+        session_ids = [session_id] if session_id is not None else list(self._buffers.keys())
+        for sid in session_ids:
+            timer = self._timers.pop(sid, None)
+            if timer and timer is not asyncio.current_task():
+                timer.cancel()
+            await self._flush_session(sid, reason)
+
+    async def _flush_later(self, session_id: str) -> None:
+        try:
+            await asyncio.sleep(self.flush_interval)
+        except asyncio.CancelledError:
+            return
+        if self._timers.get(session_id) is asyncio.current_task():
+            self._timers.pop(session_id, None)
+        try:
+            await self._flush_session(session_id, 'timer')
+        except Exception as e:
+            # Messages stay buffered and are retried by the next flush
+            print(f"🟠 Message journal timer flush failed for {session_id}: {e}")
+
+    async def _flush_session(self, session_id: str, reason: str) -> None:
+        # Shielded: if the streaming task is cancelled mid-flush, the batch is
+        # still written and the session lock is held until it is committed
+        await asyncio.shield(self._write_session(session_id, reason))
+
+    async def _write_session(self, session_id: str, reason: str) -> None:
+        lock = self._flush_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._flush_locks[session_id] = lock
+        async with lock:
+            batch = self._buffers.pop(session_id, None)
+            if not batch:
+                return
+
+            start = time.perf_counter()
+            try:
+                await self.db_service.create_messages(batch)
+            except Exception:
+                self._failed_flushes += 1
+                # Put the batch back in front of anything appended meanwhile
+                self._buffers[session_id] = batch + self._buffers.get(session_id, [])
+                traceback.print_exc()
+                raise
+            latency = time.perf_counter() - start
+
+            self._flush_count += 1
+            self._flushed_messages += len(batch)
+            self._flush_reasons[reason] = self._flush_reasons.get(reason, 0) + 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+            self._last_latency = latency
+
+    def pending_count(self, session_id: Optional[str] = None) -> int:
+        if session_id is not None:
+            return len(self._buffers.get(session_id, []))
+        return sum(len(buffer) for buffer in self._buffers.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'flushes': self._flush_count,
+            'flushed_messages': self._flushed_messages,
+            'failed_flushes': self._failed_flushes,
+            'flush_reasons': dict(self._flush_reasons),
+            'pending_messages': self.pending_count(),
+            'avg_flush_latency_ms': round(self._total_latency * 1000 / self._flush_count, 3) if self._flush_count else 0.0,
+            'max_flush_latency_ms': round(self._max_latency * 1000, 3),
+            'last_flush_latency_ms': round(self._last_latency * 1000, 3),
+        }
+
+
+# Create a singleton instance
+message_journal = MessageJournal(db_service)
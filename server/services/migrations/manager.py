@@ -3,10 +3,12 @@ import sqlite3
 from services.migrations.v1_initial_schema import V1InitialSchema
 from services.migrations.v2_add_canvases import V2AddCanvases
 from services.migrations.v3_add_comfy_workflow import V3AddComfyWorkflow
+from services.migrations.v4_add_canvas_elements import V4AddCanvasElements
+from services.migrations.v5_move_thumbnails_to_files import V5MoveThumbnailsToFiles
 from . import Migration
 
 # Database version
-CURRENT_VERSION = 3
+CURRENT_VERSION = 5
 
 ALL_MIGRATIONS = [
     {
@@ -21,6 +23,14 @@ ALL_MIGRATIONS = [
         'version': 3,
         'migration': V3AddComfyWorkflow,
     },
+    {
+        'version': 4,
+        'migration': V4AddCanvasElements,
+    },
+    {
+        'version': 5,
+        'migration': V5MoveThumbnailsToFiles,
+    },
 ]
 class MigrationManager:
     def get_migrations_to_apply(self, current_version: int, target_version: int) -> List[Type[Migration]]:
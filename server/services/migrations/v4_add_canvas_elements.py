@@ -0,0 +1,88 @@
+from . import Migration
+import json
+import sqlite3
+
+
+class V4AddCanvasElements(Migration):
+    version = 4
+    description = "Store canvas elements and files as separate rows"
+
+    def up(self, conn: sqlite3.Connection) -> None:
+        # One row per Excalidraw element, ordered by position (z-order)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS canvas_elements (
+                canvas_id TEXT NOT NULL,
+                id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                version INTEGER,
+                version_nonce INTEGER,
+                data TEXT NOT NULL,
+                PRIMARY KEY (canvas_id, id),
+                FOREIGN KEY (canvas_id) REFERENCES canvases(id)
+            )
+        """)
+
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_canvas_elements_canvas_id_position ON canvas_elements(canvas_id, position)
+        """)
+
+        # One row per Excalidraw binary file entry (`files` map)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS canvas_files (
+                canvas_id TEXT NOT NULL,
+                id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (canvas_id, id),
+                FOREIGN KEY (canvas_id) REFERENCES canvases(id)
+            )
+        """)
+
+        # Move elements and files out of the existing canvas blobs,
+        # canvases.data keeps the rest of the document (appState etc.)
+        cursor = conn.execute("SELECT id, data FROM canvases WHERE data IS NOT NULL AND data != ''")
+        for canvas_id, data in cursor.fetchall():
+            try:
+                doc = json.loads(data)
+            except json.JSONDecodeError:
+                print(f"⚠️ Skipping canvas {canvas_id}: data is not valid JSON")
+                continue
+            if not isinstance(doc, dict):
+                continue
+
+            elements = doc.pop('elements', None) or []
+            files = doc.pop('files', None) or {}
+
+            conn.executemany("""
+                INSERT OR REPLACE INTO canvas_elements (canvas_id, id, position, version, version_nonce, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (canvas_id, element['id'], position, element.get('version'), element.get('versionNonce'), json.dumps(element))
+                for position, element in enumerate(elements)
+                if isinstance(element, dict) and element.get('id')
+            ])
+            conn.executemany("""
+                INSERT OR REPLACE INTO canvas_files (canvas_id, id, data)
+                VALUES (?, ?, ?)
+            """, [
+                (canvas_id, file_id, json.dumps(file_data))
+                for file_id, file_data in files.items()
+            ])
+            conn.execute("UPDATE canvases SET data = ? WHERE id = ?", (json.dumps(doc), canvas_id))
+
+    def down(self, conn: sqlite3.Connection) -> None:
+        # Fold the rows back into the canvas blobs before dropping the tables
+        cursor = conn.execute("SELECT id, data FROM canvases")
+        for canvas_id, data in cursor.fetchall():
+            doc = json.loads(data) if data else {}
+            doc['elements'] = [
+                json.loads(row[0]) for row in conn.execute(
+                    "SELECT data FROM canvas_elements WHERE canvas_id = ? ORDER BY position ASC", (canvas_id,))
+            ]
+            doc['files'] = {
+                row[0]: json.loads(row[1]) for row in conn.execute(
+                    "SELECT id, data FROM canvas_files WHERE canvas_id = ?", (canvas_id,))
+            }
+            conn.execute("UPDATE canvases SET data = ? WHERE id = ?", (json.dumps(doc), canvas_id))
+
+        conn.execute("DROP TABLE IF EXISTS canvas_files")
+        conn.execute("DROP TABLE IF EXISTS canvas_elements")
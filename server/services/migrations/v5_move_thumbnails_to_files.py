@@ -0,0 +1,23 @@
+from . import Migration
+import sqlite3
+from services.thumbnail_service import store_thumbnail_sync
+
+
+class V5MoveThumbnailsToFiles(Migration):
+    version = 5
+    description = "Move inline canvas thumbnails to files"
+
+    def up(self, conn: sqlite3.Connection) -> None:
+        # Inline data: URLs become content-addressed files under FILES_DIR/thumbnails
+        cursor = conn.execute("SELECT id, thumbnail FROM canvases WHERE thumbnail LIKE 'data:%'")
+        for canvas_id, thumbnail in cursor.fetchall():
+            conn.execute("UPDATE canvases SET thumbnail = ? WHERE id = ?",
+                         (store_thumbnail_sync(thumbnail), canvas_id))
+
+        # Keyset pagination of the canvas list
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_canvases_updated_at_id ON canvases(updated_at DESC, id DESC)
+        """)
+
+    def down(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DROP INDEX IF EXISTS idx_canvases_updated_at_id")
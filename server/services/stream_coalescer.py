@@ -0,0 +1,152 @@
+"""
+Coalescing layer between StreamProcessor and the websocket
+
+Fast models produce one `delta` per token and one `tool_call_arguments` per
+args fragment. StreamCoalescer merges consecutive fragments of the same
+stream (same type, and same tool call id for arguments) into one frame, and
+sends it when:
+- `window_ms` milliseconds passed since the first buffered fragment
+- the buffered text reaches `max_bytes`
+- any other event is sent (type change, tool_call, tool_call_result, done...)
+- `flush()` is called explicitly
+
+Events are always delivered in the order they were sent. The window and size
+are configured with STREAM_COALESCE_WINDOW_MS and STREAM_COALESCE_MAX_BYTES;
+a window of 0 disables coalescing.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+DEFAULT_WINDOW_MS = float(os.environ.get('STREAM_COALESCE_WINDOW_MS', '30'))
+DEFAULT_MAX_BYTES = int(os.environ.get('STREAM_COALESCE_MAX_BYTES', '2048'))
+
+COALESCIBLE_TYPES = {'delta', 'tool_call_arguments'}
+
+SendFn = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class CoalescerStats:
+    """Process-wide counters shared by all coalescers"""
+
+    def __init__(self):
+        self.fragments_in = 0
+        self.frames_out = 0
+        self.flush_reasons: Dict[str, int] = {}
+        self.total_added_latency = 0.0
+        self.max_added_latency = 0.0
+
+    def record_flush(self, fragments: int, reason: str, added_latency: float):
+        self.fragments_in += fragments
+        self.frames_out += 1
+        self.flush_reasons[reason] = self.flush_reasons.get(reason, 0) + 1
+        self.total_added_latency += added_latency
+        self.max_added_latency = max(self.max_added_latency, added_latency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'window_ms': DEFAULT_WINDOW_MS,
+            'max_bytes': DEFAULT_MAX_BYTES,
+            'fragments_in': self.fragments_in,
+            'frames_out': self.frames_out,
+            'frames_saved': self.fragments_in - self.frames_out,
+            'flush_reasons': dict(self.flush_reasons),
+            # Time the first fragment of each frame waited in the buffer
+            'avg_added_latency_ms': round(self.total_added_latency * 1000 / self.frames_out, 3) if self.frames_out else 0.0,
+            'max_added_latency_ms': round(self.max_added_latency * 1000, 3),
+        }
+
+
+coalescer_stats = CoalescerStats()
+
+
+class StreamCoalescer:
+    """Per-stream buffer of text fragments, used as a drop-in `send_to_websocket`"""
+
+    def __init__(
+        self,
+        send: SendFn,
+        window_ms: float = DEFAULT_WINDOW_MS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        stats: CoalescerStats = coalescer_stats,
+    ):
+        self.send = send
+        self.window = max(0.0, window_ms) / 1000
+        self.max_bytes = max_bytes
+        self.stats = stats
+        self._session_id: Optional[str] = None
+        self._pending: Optional[Dict[str, Any]] = None
+        self._parts: List[str] = []
+        self._pending_bytes = 0
+        self._first_at = 0.0
+        self._timer: Optional[asyncio.Task[None]] = None
+        # Serializes sends so a timer flush can't overtake a later event
+        self._send_lock = asyncio.Lock()
+
+    async def __call__(self, session_id: str, event: Dict[str, Any]) -> None:
+        text = event.get('text')
+        if self.window <= 0 or event.get('type') not in COALESCIBLE_TYPES or not isinstance(text, str):
+            await self.flush(reason=event.get('type', 'event'))
+            async with self._send_lock:
+                await self.send(session_id, event)
+            return
+
+        if self._pending is not None and not self._same_stream(session_id, event):
+            await self.flush(reason='type_change')
+
+        if self._pending is None:
+            self._session_id = session_id
+            self._pending = {key: value for key, value in event.items() if key != 'text'}
+            self._first_at = time.perf_counter()
+            self._timer = asyncio.create_task(self._flush_later())
+        self._parts.append(text)
+        self._pending_bytes += len(text.encode('utf-8'))
+
+        if self._pending_bytes >= self.max_bytes:
+            await self.flush(reason='size')
+
+    def _same_stream(self, session_id: str, event: Dict[str, Any]) -> bool:
+        pending = self._pending or {}
+        return (
+            session_id == self._session_id
+            and event.get('type') == pending.get('type')
+            and event.get('id') == pending.get('id')
+        )
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.sleep(self.window)
+        except asyncio.CancelledError:
+            return
+        self._timer = None
+        try:
+            await self.flush(reason='timer')
+        except Exception as e:
+            print(f"🟠 Stream coalescer timer flush failed: {e}")
+
+    async def flush(self, reason: str = 'explicit') -> None:
+        """Send the buffered frame, if any"""
+        if self._pending is None:
+            return
+        timer = self._timer
+        self._timer = None
+        if timer and timer is not asyncio.current_task():
+            timer.cancel()
+
+        session_id = self._session_id or ''
+        event = {**self._pending, 'text': ''.join(self._parts)}
+        fragments = len(self._parts)
+        added_latency = time.perf_counter() - self._first_at
+        self._pending = None
+        self._parts = []
+        self._pending_bytes = 0
+
+        self.stats.record_flush(fragments, reason, added_latency)
+        async with self._send_lock:
+            await self.send(session_id, event)
+
+
+def get_coalescer_stats() -> Dict[str, Any]:
+    return coalescer_stats.to_dict()
@@ -36,4 +36,40 @@ def get_stream_task(session_id: str) -> Optional[asyncio.Task[Any]]:
     """
     return stream_tasks.get(session_id)
 
+# Active StreamProcessors, keyed by session_id, used to answer resync requests
+stream_processors: Dict[str, Any] = {}
+
+def add_stream_processor(session_id: str, processor: Any) -> None:
+    """
+    Register the StreamProcessor currently streaming the given session_id.
+
+    Args:
+        session_id (str): Unique identifier for the session.
+        processor: The StreamProcessor instance.
+    """
+    stream_processors[session_id] = processor
+
+def remove_stream_processor(session_id: str, processor: Any) -> None:
+    """
+    Unregister the StreamProcessor of the given session_id, if it is still the current one.
+
+    Args:
+        session_id (str): Unique identifier for the session.
+        processor: The StreamProcessor instance.
+    """
+    if stream_processors.get(session_id) is processor:
+        stream_processors.pop(session_id, None)
+
+def get_stream_processor(session_id: str) -> Optional[Any]:
+    """
+    Retrieve the StreamProcessor currently streaming the given session_id.
+
+    Args:
+        session_id (str): Unique identifier for the session.
+
+    Returns:
+        The StreamProcessor if the session is streaming, otherwise None.
+    """
+    return stream_processors.get(session_id)
+
 # 你也可以加一个 list_stream_tasks() 返回所有 session_id
@@ -0,0 +1,108 @@
+"""
+Canvas thumbnails stored as content-addressed files
+
+The frontend sends the dataURL of the latest image as the canvas thumbnail
+on every save. Inline `data:` URLs are decoded and written once to
+FILES_DIR/thumbnails/<sha256>.<ext>; the canvases table only keeps the
+thumbnail URL, which is immutable and can be cached forever by the browser.
+Thumbnails that are already URLs (e.g. /api/file/...) are kept as they are.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from typing import Optional, Tuple
+
+from services.config_service import FILES_DIR
+
+THUMBNAILS_DIR = os.path.join(FILES_DIR, "thumbnails")
+THUMBNAIL_URL_PREFIX = "/api/canvas/thumbnail/"
+# Decoding and hashing happens in a thread above this size
+INLINE_HASH_MAX_BYTES = 64 * 1024
+
+_DATA_URL_RE = re.compile(r"^data:([\w.+-]+/[\w.+-]+)?(;[^,]*)?,", re.IGNORECASE)
+_THUMBNAIL_NAME_RE = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]+)$")
+
+
+def parse_data_url(url: str) -> Optional[Tuple[str, bytes]]:
+    """(mime_type, content) of a base64 data URL, None for anything else"""
+    match = _DATA_URL_RE.match(url)
+    if match is None or "base64" not in (match.group(2) or "").lower():
+        return None
+    try:
+        content = base64.b64decode(url[match.end():], validate=False)
+    except (binascii.Error, ValueError):
+        return None
+    return (match.group(1) or "application/octet-stream").lower(), content
+
+
+def _extension(mime_type: str) -> str:
+    if mime_type == "image/jpeg":
+        return "jpg"
+    extension = mimetypes.guess_extension(mime_type) or ".bin"
+    return extension.lstrip(".").lower()
+
+
+def store_thumbnail_sync(thumbnail: Optional[str]) -> str:
+    """Write an inline thumbnail to its content-addressed file, returns the URL to store"""
+    if not thumbnail or not thumbnail.startswith("data:"):
+        return thumbnail or ""
+    parsed = parse_data_url(thumbnail)
+    if parsed is None:
+        return ""
+    mime_type, content = parsed
+    name = f"{hashlib.sha256(content).hexdigest()}.{_extension(mime_type)}"
+    path = os.path.join(THUMBNAILS_DIR, name)
+    # Same hash, same content: only new thumbnails are written
+    if not os.path.exists(path):
+        os.makedirs(THUMBNAILS_DIR, exist_ok=True)
+        # Unique temp file per call, concurrent saves of the same thumbnail
+        # each publish a complete file
+        fd, tmp_path = tempfile.mkstemp(dir=THUMBNAILS_DIR, prefix=f".{name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+    return THUMBNAIL_URL_PREFIX + name
+
+
+async def store_thumbnail(thumbnail: Optional[str]) -> str:
+    """Async version of store_thumbnail_sync, large thumbnails are handled off the loop"""
+    if thumbnail and thumbnail.startswith("data:") and len(thumbnail) > INLINE_HASH_MAX_BYTES:
+        return await asyncio.to_thread(store_thumbnail_sync, thumbnail)
+    return store_thumbnail_sync(thumbnail)
+
+
+def get_thumbnail_file(name: str) -> Optional[Tuple[str, str]]:
+    """(path, content hash) of a stored thumbnail, None if the name is invalid or missing"""
+    match = _THUMBNAIL_NAME_RE.match(name)
+    if match is None:
+        return None
+    path = os.path.join(THUMBNAILS_DIR, name)
+    if not os.path.isfile(path):
+        return None
+    return path, match.group(1)
+
+
+def remove_thumbnail(url: Optional[str]) -> None:
+    """Delete the file of a thumbnail URL that is no longer referenced"""
+    if not url or not url.startswith(THUMBNAIL_URL_PREFIX):
+        return
+    stored = get_thumbnail_file(url[len(THUMBNAIL_URL_PREFIX):])
+    if stored is None:
+        return
+    try:
+        os.remove(stored[0])
+    except OSError as e:
+        print(f"⚠️ Failed to remove thumbnail {stored[0]}: {e}")
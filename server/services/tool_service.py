@@ -1,167 +1,125 @@
+import asyncio
 import traceback
 from typing import Dict
 from langchain_core.tools import BaseTool
 from models.tool_model import ToolInfo
-from tools.comfy_dynamic import build_tool
+from tools.utils.comfyui_template import comfy_workflow_templates
 from tools.write_plan import write_plan_tool
-from tools.generate_image_by_gpt_image_1_jaaz import generate_image_by_gpt_image_1_jaaz
-from tools.generate_image_by_imagen_4_jaaz import generate_image_by_imagen_4_jaaz
-from tools.generate_image_by_imagen_4_replicate import (
-    generate_image_by_imagen_4_replicate,
-)
-from tools.generate_image_by_ideogram3_bal_jaaz import (
-    generate_image_by_ideogram3_bal_jaaz,
-)
-
-# from tools.generate_image_by_flux_1_1_pro import generate_image_by_flux_1_1_pro
-from tools.generate_image_by_flux_kontext_pro_jaaz import (
-    generate_image_by_flux_kontext_pro_jaaz,
-)
-from tools.generate_image_by_flux_kontext_pro_replicate import (
-    generate_image_by_flux_kontext_pro_replicate,
-)
-from tools.generate_image_by_flux_kontext_max_jaaz import (
-    generate_image_by_flux_kontext_max,
-)
-from tools.generate_image_by_flux_kontext_max_replicate import (
-    generate_image_by_flux_kontext_max_replicate,
-)
-from tools.generate_image_by_doubao_seedream_3_jaaz import (
-    generate_image_by_doubao_seedream_3_jaaz,
-)
-from tools.generate_image_by_doubao_seedream_3_volces import (
-    generate_image_by_doubao_seedream_3_volces,
-)
-from tools.generate_image_by_doubao_seededit_3_volces import (
-    edit_image_by_doubao_seededit_3_volces,
-)
-from tools.generate_video_by_seedance_v1_jaaz import generate_video_by_seedance_v1_jaaz
-from tools.generate_video_by_seedance_v1_pro_volces import (
-    generate_video_by_seedance_v1_pro_volces,
-)
-from tools.generate_video_by_seedance_v1_lite_volces import (
-    generate_video_by_seedance_v1_lite_t2v,
-    generate_video_by_seedance_v1_lite_i2v,
-)
-from tools.generate_video_by_kling_v2_jaaz import generate_video_by_kling_v2_jaaz
-from tools.generate_image_by_recraft_v3_jaaz import generate_image_by_recraft_v3_jaaz
-from tools.generate_image_by_recraft_v3_replicate import (
-    generate_image_by_recraft_v3_replicate,
-)
-from tools.generate_video_by_hailuo_02_jaaz import generate_video_by_hailuo_02_jaaz
-from tools.generate_video_by_veo3_fast_jaaz import generate_video_by_veo3_fast_jaaz
-from tools.generate_image_by_midjourney_jaaz import generate_image_by_midjourney_jaaz
 from services.config_service import config_service
 from services.db_service import db_service
+from utils.lazy_import import import_object
 
+# Declarative tool registry: tool modules (and the providers they use) are
+# imported from `import_path` when an agent first uses the tool, not when
+# the server starts.
 TOOL_MAPPING: Dict[str, ToolInfo] = {
     "generate_image_by_gpt_image_1_jaaz": {
         "display_name": "GPT Image 1",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_gpt_image_1_jaaz,
+        "import_path": "tools.generate_image_by_gpt_image_1_jaaz.generate_image_by_gpt_image_1_jaaz",
     },
     "generate_image_by_imagen_4_jaaz": {
         "display_name": "Imagen 4",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_imagen_4_jaaz,
+        "import_path": "tools.generate_image_by_imagen_4_jaaz.generate_image_by_imagen_4_jaaz",
     },
     "generate_image_by_recraft_v3_jaaz": {
         "display_name": "Recraft v3",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_recraft_v3_jaaz,
+        "import_path": "tools.generate_image_by_recraft_v3_jaaz.generate_image_by_recraft_v3_jaaz",
     },
     "generate_image_by_ideogram3_bal_jaaz": {
         "display_name": "Ideogram 3 Balanced",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_ideogram3_bal_jaaz,
+        "import_path": "tools.generate_image_by_ideogram3_bal_jaaz.generate_image_by_ideogram3_bal_jaaz",
     },
     # "generate_image_by_flux_1_1_pro_jaaz": {
     #     "display_name": "Flux 1.1 Pro",
     #     "type": "image",
     #     "provider": "jaaz",
-    #     "tool_function": generate_image_by_flux_1_1_pro,
+    #     "import_path": "tools.generate_image_by_flux_1_1_pro_jaaz.generate_image_by_flux_1_1_pro",
     # },
     "generate_image_by_flux_kontext_pro_jaaz": {
         "display_name": "Flux Kontext Pro",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_flux_kontext_pro_jaaz,
+        "import_path": "tools.generate_image_by_flux_kontext_pro_jaaz.generate_image_by_flux_kontext_pro_jaaz",
     },
     "generate_image_by_flux_kontext_max_jaaz": {
         "display_name": "Flux Kontext Max",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_flux_kontext_max,
+        "import_path": "tools.generate_image_by_flux_kontext_max_jaaz.generate_image_by_flux_kontext_max",
     },
     "generate_image_by_midjourney_jaaz": {
         "display_name": "Midjourney",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_midjourney_jaaz,
+        "import_path": "tools.generate_image_by_midjourney_jaaz.generate_image_by_midjourney_jaaz",
     },
     "generate_image_by_doubao_seedream_3_jaaz": {
         "display_name": "Doubao Seedream 3",
         "type": "image",
         "provider": "jaaz",
-        "tool_function": generate_image_by_doubao_seedream_3_jaaz,
+        "import_path": "tools.generate_image_by_doubao_seedream_3_jaaz.generate_image_by_doubao_seedream_3_jaaz",
     },
     "generate_image_by_doubao_seedream_3_volces": {
         "display_name": "Doubao Seedream 3 by volces",
         "type": "image",
         "provider": "volces",
-        "tool_function": generate_image_by_doubao_seedream_3_volces,
+        "import_path": "tools.generate_image_by_doubao_seedream_3_volces.generate_image_by_doubao_seedream_3_volces",
     },
     "edit_image_by_doubao_seededit_3_volces": {
         "display_name": "Doubao Seededit 3 by volces",
         "type": "image",
         "provider": "volces",
-        "tool_function": edit_image_by_doubao_seededit_3_volces,
+        "import_path": "tools.generate_image_by_doubao_seededit_3_volces.edit_image_by_doubao_seededit_3_volces",
     },
     "generate_video_by_seedance_v1_jaaz": {
         "display_name": "Doubao Seedance v1",
         "type": "video",
         "provider": "jaaz",
-        "tool_function": generate_video_by_seedance_v1_jaaz,
+        "import_path": "tools.generate_video_by_seedance_v1_jaaz.generate_video_by_seedance_v1_jaaz",
     },
     "generate_video_by_hailuo_02_jaaz": {
         "display_name": "Hailuo 02",
         "type": "video",
         "provider": "jaaz",
-        "tool_function": generate_video_by_hailuo_02_jaaz,
+        "import_path": "tools.generate_video_by_hailuo_02_jaaz.generate_video_by_hailuo_02_jaaz",
     },
     "generate_video_by_kling_v2_jaaz": {
         "display_name": "Kling v2.1 Standard",
         "type": "video",
         "provider": "jaaz",
-        "tool_function": generate_video_by_kling_v2_jaaz,
+        "import_path": "tools.generate_video_by_kling_v2_jaaz.generate_video_by_kling_v2_jaaz",
     },
     "generate_video_by_seedance_v1_pro_volces": {
         "display_name": "Doubao Seedance v1 by volces",
         "type": "video",
         "provider": "volces",
-        "tool_function": generate_video_by_seedance_v1_pro_volces,
+        "import_path": "tools.generate_video_by_seedance_v1_pro_volces.generate_video_by_seedance_v1_pro_volces",
     },
     "generate_video_by_seedance_v1_lite_volces_t2v": {
         "display_name": "Doubao Seedance v1 lite(text-to-video)",
         "type": "video",
         "provider": "volces",
-        "tool_function": generate_video_by_seedance_v1_lite_t2v,
+        "import_path": "tools.generate_video_by_seedance_v1_lite_volces.generate_video_by_seedance_v1_lite_t2v",
     },
     "generate_video_by_seedance_v1_lite_i2v_volces": {
         "display_name": "Doubao Seedance v1 lite(images-to-video)",
         "type": "video",
         "provider": "volces",
-        "tool_function": generate_video_by_seedance_v1_lite_i2v,
+        "import_path": "tools.generate_video_by_seedance_v1_lite_volces.generate_video_by_seedance_v1_lite_i2v",
     },
     "generate_video_by_veo3_fast_jaaz": {
         "display_name": "Veo3 Fast",
         "type": "video",
         "provider": "jaaz",
-        "tool_function": generate_video_by_veo3_fast_jaaz,
+        "import_path": "tools.generate_video_by_veo3_fast_jaaz.generate_video_by_veo3_fast_jaaz",
     },
     # ---------------
     # Replicate Tools
@@ -170,25 +128,25 @@ TOOL_MAPPING: Dict[str, ToolInfo] = {
         "display_name": "Imagen 4",
         "type": "image",
         "provider": "replicate",
-        "tool_function": generate_image_by_imagen_4_replicate,
+        "import_path": "tools.generate_image_by_imagen_4_replicate.generate_image_by_imagen_4_replicate",
     },
     "generate_image_by_recraft_v3_replicate": {
         "display_name": "Recraft v3",
         "type": "image",
         "provider": "replicate",
-        "tool_function": generate_image_by_recraft_v3_replicate,
+        "import_path": "tools.generate_image_by_recraft_v3_replicate.generate_image_by_recraft_v3_replicate",
     },
     "generate_image_by_flux_kontext_pro_replicate": {
         "display_name": "Flux Kontext Pro",
         "type": "image",
         "provider": "replicate",
-        "tool_function": generate_image_by_flux_kontext_pro_replicate,
+        "import_path": "tools.generate_image_by_flux_kontext_pro_replicate.generate_image_by_flux_kontext_pro_replicate",
     },
     "generate_image_by_flux_kontext_max_replicate": {
         "display_name": "Flux Kontext Max",
         "type": "image",
         "provider": "replicate",
-        "tool_function": generate_image_by_flux_kontext_max_replicate,
+        "import_path": "tools.generate_image_by_flux_kontext_max_replicate.generate_image_by_flux_kontext_max_replicate",
     },
 }
 
@@ -196,6 +154,10 @@ TOOL_MAPPING: Dict[str, ToolInfo] = {
 class ToolService:
     def __init__(self):
         self.tools: Dict[str, ToolInfo] = {}
+        # Bumped whenever the registered tools change, so caches built from them can be dropped
+        self.version = 0
+        # import_path -> tool, tools of the registry that were loaded
+        self._loaded: Dict[str, BaseTool] = {}
         self._register_required_tools()
 
     def _register_required_tools(self):
@@ -215,6 +177,7 @@ class ToolService:
             return
 
         self.tools[tool_id] = tool_info
+        self.version += 1
 
     # TODO: Check if there will be racing conditions when server just starting up but tools are not ready yet.
     async def initialize(self):
@@ -235,16 +198,44 @@ class ToolService:
 
     def get_tool(self, tool_name: str) -> BaseTool | None:
         tool_info = self.tools.get(tool_name)
-        return tool_info.get("tool_function") if tool_info else None
+        if not tool_info:
+            return None
+        tool_function = tool_info.get("tool_function")
+        if tool_function is not None:
+            return tool_function
+        return self._load_tool(tool_name, tool_info.get("import_path", ""))
+
+    def _load_tool(self, tool_name: str, import_path: str) -> BaseTool | None:
+        """Import a registry tool on first use"""
+        tool_function = self._loaded.get(import_path)
+        if tool_function is None:
+            try:
+                tool_function = import_object(import_path)
+            except Exception as e:
+                print(f"❌ Failed to load tool {tool_name} from {import_path}: {e}")
+                traceback.print_exc()
+                return None
+            self._loaded[import_path] = tool_function
+            print(f"🛠️ Loaded tool {tool_name}")
+        return tool_function
+
+    async def preload(self):
+        """Import the registered tools in a thread, so the first chat doesn't wait for them"""
+        for tool_id, tool_info in list(self.tools.items()):
+            import_path = tool_info.get("import_path")
+            if import_path and import_path not in self._loaded:
+                await asyncio.to_thread(self._load_tool, tool_id, import_path)
 
     def remove_tool(self, tool_id: str):
         self.tools.pop(tool_id)
+        self.version += 1
 
     def get_all_tools(self) -> Dict[str, ToolInfo]:
         return self.tools.copy()
 
     def clear_tools(self):
         self.tools.clear()
+        self.version += 1
         # 重新注册必须的工具
         self._register_required_tools()
 
@@ -257,6 +248,9 @@ async def register_comfy_tools() -> Dict[str, BaseTool]:
     Fetch all workflows from DB and build tool callables.
     Run inside the current event loop.
     """
+    # Imported here: the comfy workflow tools pull in the ComfyUI client
+    from tools.comfy_dynamic import build_tool
+
     dynamic_comfy_tools: Dict[str, BaseTool] = {}
     try:
         workflows = await db_service.list_comfy_workflows()
@@ -265,6 +259,8 @@ async def register_comfy_tools() -> Dict[str, BaseTool]:
         traceback.print_stack()
         return {}
 
+    # Compiled templates of deleted workflows are dropped, build_tool compiles the rest
+    comfy_workflow_templates.retain(wf["id"] for wf in workflows)
     for wf in workflows:
         try:
             tool_fn = build_tool(wf)
@@ -1,22 +1,68 @@
 # services/websocket_service.py
-from services.websocket_state import sio, get_all_socket_ids
+from services.websocket_state import (
+    sio, get_all_socket_ids, get_session_canvas, session_room, canvas_room, BROADCAST_MODE
+)
+import time
 import traceback
-from typing import Any, Dict
+from typing import Any, Dict, List
+
+_emit_stats: Dict[str, float] = {
+    'emits': 0,
+    'total_emit_ms': 0.0,
+    'max_emit_ms': 0.0,
+}
+
+
+def _record_emit(elapsed: float):
+    elapsed_ms = elapsed * 1000
+    _emit_stats['emits'] += 1
+    _emit_stats['total_emit_ms'] += elapsed_ms
+    _emit_stats['max_emit_ms'] = max(_emit_stats['max_emit_ms'], elapsed_ms)
+
+
+def get_emit_stats() -> Dict[str, Any]:
+    emits = _emit_stats['emits']
+    return {
+        'mode': BROADCAST_MODE,
+        'emits': emits,
+        'avg_emit_ms': round(_emit_stats['total_emit_ms'] / emits, 3) if emits else 0.0,
+        'max_emit_ms': round(_emit_stats['max_emit_ms'], 3),
+        'connections': len(get_all_socket_ids()),
+    }
+
+
+def get_target_rooms(session_id: str, canvas_id: str | None) -> List[str]:
+    rooms = [session_room(session_id)]
+    canvas_id = canvas_id or get_session_canvas(session_id)
+    if canvas_id:
+        rooms.append(canvas_room(canvas_id))
+    return rooms
+
+
+async def _legacy_broadcast(payload: Dict[str, Any]):
+    # Opt-in fallback (WEBSOCKET_BROADCAST_MODE=legacy): one emit per connected socket
+    for socket_id in get_all_socket_ids():
+        await sio.emit('session_update', payload, room=socket_id)
 
 
 async def broadcast_session_update(session_id: str, canvas_id: str | None, event: Dict[str, Any]):
-    socket_ids = get_all_socket_ids()
-    if socket_ids:
-        try:
-            for socket_id in socket_ids:
-                await sio.emit('session_update', {
-                    'canvas_id': canvas_id,
-                    'session_id': session_id,
-                    **event
-                }, room=socket_id)
-        except Exception as e:
-            print(f"Error broadcasting session update for {session_id}: {e}")
-            traceback.print_exc()
+    payload = {
+        'canvas_id': canvas_id,
+        'session_id': session_id,
+        **event
+    }
+    start = time.perf_counter()
+    try:
+        if BROADCAST_MODE == 'legacy':
+            await _legacy_broadcast(payload)
+        else:
+            # A socket in both rooms only receives the event once
+            await sio.emit('session_update', payload, to=get_target_rooms(session_id, canvas_id))
+    except Exception as e:
+        print(f"Error broadcasting session update for {session_id}: {e}")
+        traceback.print_exc()
+    finally:
+        _record_emit(time.perf_counter() - start)
 
 # compatible with legacy codes
 # TODO: All Broadcast should have a canvas_id
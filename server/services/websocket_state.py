@@ -1,13 +1,31 @@
 # services/websocket_state.py
+import os
 import socketio
-from typing import Dict
+from collections import OrderedDict
+from typing import Dict, List, Optional
 
 sio = socketio.AsyncServer(
     cors_allowed_origins="*",
     async_mode='asgi'
 )
 
+# 'rooms' (default): session_update is emitted once to the session/canvas rooms
+# 'legacy': session_update is emitted to every connected socket one by one
+BROADCAST_MODE = os.environ.get('WEBSOCKET_BROADCAST_MODE', 'rooms').lower()
+
+# Upper bound of remembered session -> canvas bindings
+MAX_SESSION_BINDINGS = 4096
+
 active_connections: Dict[str, dict] = {}
+# session_id -> canvas_id, so events sent with only a session_id also reach
+# clients that have the canvas open but did not subscribe to the session yet
+session_canvases: 'OrderedDict[str, str]' = OrderedDict()
+
+def session_room(session_id: str) -> str:
+    return f'session:{session_id}'
+
+def canvas_room(canvas_id: str) -> str:
+    return f'canvas:{canvas_id}'
 
 def add_connection(socket_id: str, user_info: dict = None):
     active_connections[socket_id] = user_info or {}
@@ -23,3 +41,34 @@ def get_all_socket_ids():
 
 def get_connection_count():
     return len(active_connections)
+
+async def subscribe(socket_id: str, canvas_id: Optional[str] = None, session_id: Optional[str] = None) -> List[str]:
+    """Move a socket into the rooms of the given canvas and session, leaving previous ones"""
+    info = active_connections.setdefault(socket_id, {})
+    rooms = []
+    if canvas_id:
+        rooms.append(canvas_room(canvas_id))
+    if session_id:
+        rooms.append(session_room(session_id))
+
+    for room in info.get('rooms', []):
+        if room not in rooms:
+            await sio.leave_room(socket_id, room)
+    for room in rooms:
+        await sio.enter_room(socket_id, room)
+
+    info['canvas_id'] = canvas_id
+    info['session_id'] = session_id
+    info['rooms'] = rooms
+    return rooms
+
+def bind_session_to_canvas(session_id: str, canvas_id: Optional[str]):
+    if not session_id or not canvas_id:
+        return
+    session_canvases[session_id] = canvas_id
+    session_canvases.move_to_end(session_id)
+    while len(session_canvases) > MAX_SESSION_BINDINGS:
+        session_canvases.popitem(last=False)
+
+def get_session_canvas(session_id: str) -> Optional[str]:
+    return session_canvases.get(session_id)
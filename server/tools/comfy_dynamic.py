@@ -19,28 +19,23 @@ If `run_comfy_workflow` is not yet implemented it will still work
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
-import random
-import time
 import traceback
-from io import BytesIO
 from typing import Annotated, Any, Dict, List, Optional
 from common import DEFAULT_PORT
-from .utils.image_canvas_utils import (
-    generate_file_id,
-    generate_new_image_element,
-)
+from .utils.image_canvas_utils import save_media_batch_to_canvas
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import InjectedToolCallId, tool, BaseTool
 from pydantic import BaseModel, Field, create_model
-from routers.comfyui_execution import upload_image
+from services.comfyui_scheduler import get_comfyui_urls
+from services.comfyui_upload_cache import comfy_uploads
 from services.config_service import FILES_DIR, config_service, IMAGE_FORMATS
-from services.db_service import db_service
-from services.websocket_service import broadcast_session_update, send_to_websocket
+from services.websocket_service import send_to_websocket
 
 from .utils.comfyui import ComfyUIWorkflowRunner
-from tools.video_generation.video_canvas_utils import generate_new_video_element
+from .utils.comfyui_template import comfy_workflow_templates
 
 
 def _python_type(param_type: str, default: Any):
@@ -101,6 +96,8 @@ def _build_input_schema(wf: Dict[str, Any]) -> type[BaseModel]:
 def build_tool(wf: Dict[str, Any]) -> BaseTool:
     """Return an @tool function for the given workflow record."""
     input_schema = _build_input_schema(wf)
+    # Parse the workflow and its bindings once, not on every call
+    comfy_workflow_templates.compile(wf)
 
     @tool(
         wf["name"],
@@ -122,75 +119,52 @@ def build_tool(wf: Dict[str, Any]) -> BaseTool:
         print("🛠️canvas_id", canvas_id, "session_id", session_id)
         # Inject the tool call id into the context
         ctx["tool_call_id"] = tool_call_id
-        api_url = str(
-            config_service.app_config.get("comfyui", {}).get("url", "")
-        ).rstrip("/")
-
-        # if there's image, upload it!
-        # First, let's filter all values endswith .jpg .png etc
-
-        required_data = dict(kwargs)
-        for key, value in required_data.items():
-            if isinstance(value, str) and value.lower().endswith(IMAGE_FORMATS):
-                # Image!
-                # Extract filename from potential API path like "/api/file/filename.png"
-                if "/" in value:
-                    filename = value.split("/")[
-                        -1
-                    ]  # Get the last part after the last "/"
-                else:
-                    filename = value
-                image_path = os.path.join(FILES_DIR, filename)
-                if not os.path.exists(image_path):
+        # Every configured ComfyUI backend, comfy_scheduler picks one per run
+        api_urls = get_comfyui_urls(config_service.app_config.get("comfyui", {}))
+
+        # Compiled when the tool was registered, None once the workflow is deleted
+        template = comfy_workflow_templates.get(wf["id"])
+        if template is None:
+            return f"workflow {wf['name']} no longer exists"
+        bound_params = {param for param, _, _ in template.bindings}
+
+        async def prepare(api_url: str) -> Dict[str, Any]:
+            """Upload the input images to the chosen backend and fill in the workflow"""
+            # if there's image, upload it!
+            # First, let's filter all values endswith .jpg .png etc
+            # Images are uploaded concurrently, ones the backend already has are skipped
+            required_data = dict(kwargs)
+            image_keys = []
+            uploads = []
+            for key, value in required_data.items():
+                if key not in bound_params:
                     continue
-                with open(image_path, "rb") as image_file:
-                    image_bytes = image_file.read()
-                image_stream = BytesIO(image_bytes)
-                image_name = await upload_image(image_stream, api_url, filename)
+                if isinstance(value, str) and value.lower().endswith(IMAGE_FORMATS):
+                    # Image!
+                    # Extract filename from potential API path like "/api/file/filename.png"
+                    if "/" in value:
+                        filename = value.split("/")[
+                            -1
+                        ]  # Get the last part after the last "/"
+                    else:
+                        filename = value
+                    image_path = os.path.join(FILES_DIR, filename)
+                    if not os.path.exists(image_path):
+                        continue
+                    image_keys.append(key)
+                    uploads.append(comfy_uploads.upload(api_url, image_path, filename))
+            for key, image_name in zip(image_keys, await asyncio.gather(*uploads)):
                 required_data[key] = image_name
 
-        workflow_dict = await db_service.get_comfy_workflow(wf["id"])
+            # Bound inputs are written, then every seed node gets a random seed
+            return template.instantiate(required_data)
 
         try:
-            input_defs: List[Dict[str, Any]] = (
-                wf["inputs"]
-                if isinstance(wf["inputs"], list)
-                else json.loads(wf["inputs"])
+            # Backends are scored by the models of the workflow bound with this
+            # call's arguments, prepare() then uploads its images per backend
+            generator = ComfyUIWorkflowRunner(
+                template.instantiate(kwargs, randomize_seeds=False), api_urls, prepare=prepare
             )
-        except Exception:
-            input_defs = []
-
-        for param in input_defs:
-            param_name = param.get("name")
-            node_id = param.get("node_id")
-            node_input_name = param.get("node_input_name")
-
-            if not (param_name and node_id and node_input_name):
-                continue
-
-            if param_name in required_data:
-                value = required_data[param_name]
-                if node_id in workflow_dict:
-                    node_inputs = workflow_dict[node_id].get("inputs", {})
-                    if node_input_name in node_inputs:
-                        node_inputs[node_input_name] = value
-
-        # Process seed if has seed
-        # 改为直接遍历节点输入检测seed字段，替代字符串匹配
-        seed_nodes = []
-        for node_id, node in workflow_dict.items():
-            if "seed" in node.get("inputs", {}):  # 直接检查节点输入是否有seed字段
-                seed_nodes.append(node_id)  # 收集所有含seed的节点，不移除break
-
-        if len(seed_nodes) > 0:  # 仅在存在种子节点时执行
-            for node_id in seed_nodes:
-                # 使用更大的随机范围（0到2^32-1更符合常见种子范围）
-                workflow_dict[node_id]["inputs"]["seed"] = random.randint(
-                    1, (1 << 32) - 1
-                )
-
-        try:
-            generator = ComfyUIWorkflowRunner(workflow_dict, api_url)
             extra_kwargs = {}
             extra_kwargs["ctx"] = ctx
 
@@ -201,95 +175,14 @@ def build_tool(wf: Dict[str, Any]) -> BaseTool:
             ):
                 outputs = [outputs]
 
-            # update the canvas data, add the new image element
-            canvas_data = await db_service.get_canvas_data(canvas_id)
-            if "data" not in canvas_data:
-                canvas_data["data"] = {}
-            if "elements" not in canvas_data["data"]:
-                canvas_data["data"]["elements"] = []
-            if "files" not in canvas_data["data"]:
-                canvas_data["data"]["files"] = {}
-
-            generated_files_info = []
-
-            for output in outputs:
-                mime_type, width, height, filename = output
-                file_id = generate_file_id()
-
-                url = f"/api/file/{filename}"
-
-                file_data = {
-                    "mimeType": mime_type,
-                    "id": file_id,
-                    "dataURL": url,
-                    "created": int(time.time() * 1000),
-                }
-
-                # Pass the current canvas_data to the element generation function
-                if mime_type.startswith("image"):
-                    new_element = await generate_new_image_element(
-                        canvas_id,
-                        file_id,
-                        {
-                            "width": width,
-                            "height": height,
-                        },
-                        canvas_data=canvas_data.get("data", {}),
-                    )
-                else:
-                    new_element = await generate_new_video_element(
-                        canvas_id,
-                        file_id,
-                        {
-                            "width": width,
-                            "height": height,
-                        },
-                        canvas_data=canvas_data.get("data", {}),
-                    )
-
-                canvas_data["data"]["elements"].append(new_element)
-                canvas_data["data"]["files"][file_id] = file_data
-
-                image_url = f"http://localhost:{DEFAULT_PORT}/api/file/{filename}"
-
-                generated_files_info.append(
-                    {
-                        "element": new_element,
-                        "file": file_data,
-                        "url": image_url,
-                        "mime_type": mime_type,
-                        "filename": filename,
-                    }
-                )
-
-            await db_service.save_canvas_data(
-                canvas_id, json.dumps(canvas_data["data"])
+            # Lay out, save and announce all outputs at once
+            generated_files_info = await save_media_batch_to_canvas(
+                session_id,
+                canvas_id,
+                outputs,
+                base_url=f"http://localhost:{DEFAULT_PORT}",
             )
 
-            for file_info in generated_files_info:
-                if file_info["mime_type"].startswith("image"):
-                    await broadcast_session_update(
-                        session_id,
-                        canvas_id,
-                        {
-                            "type": "image_generated",
-                            "element": file_info["element"],
-                            "file": file_info["file"],
-                            "image_url": file_info["url"],
-                        },
-                    )
-                else:
-                    await broadcast_session_update(
-                        session_id,
-                        canvas_id,
-                        {
-                            "type": "video_generated",
-                            "element": file_info["element"],
-                            "file": file_info["file"],
-                            "video_url": file_info["url"],
-                        },
-                    )
-
             # Create a markdown string for all the generated files
             markdown_images = []
             for file_info in generated_files_info:
@@ -12,6 +12,16 @@ class EditImageByDoubaoSeedream3InputSchema(BaseModel):
     image: list[str] = Field(
         description="Required. The image for image generation. Pass a list of image_id here (Only 1 image supported. If you want to generate multiple images. Call another), e.g. ['im_hfuiut78.png']. Best for image editing cases like: Editing specific parts of the image, Removing specific objects, Maintaining visual elements across scenes (character/object consistency), Generating new content in the style of the reference (style transfer), etc."
     )
+    num_images: int = Field(
+        default=1,
+        ge=1,
+        le=4,
+        description="Optional. Number of variants to generate from the same prompt (1-4), generated in parallel. Use it when the user asks for several options instead of calling the tool several times."
+    )
+    regenerate: bool = Field(
+        default=False,
+        description="Optional. Set to true when the user asks to regenerate or try again with the same prompt and parameters, to get a new result instead of reusing an identical earlier generation."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -25,6 +35,8 @@ async def edit_image_by_doubao_seededit_3_volces(
     image: list[str],
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
+    num_images: int = 1,
+    regenerate: bool = False,
 ) -> str:
     """
     Generate an image using Doubao Seedream 3 model via the provider framework
@@ -40,6 +52,8 @@ async def edit_image_by_doubao_seededit_3_volces(
         model="doubao-seededit-3-0-i2i-250628",
         prompt=prompt,
         input_images=image,
+        num_images=num_images,
+        use_cache=not regenerate,
     )
 
 
@@ -12,6 +12,16 @@ class GenerateImageByDoubaoSeedream3InputSchema(BaseModel):
     aspect_ratio: str = Field(
         description="Required. Aspect ratio of the image, only these values are allowed: 1:1, 16:9, 4:3, 3:4, 9:16. Choose the best fitting aspect ratio according to the prompt. Best ratio for posters is 3:4"
     )
+    num_images: int = Field(
+        default=1,
+        ge=1,
+        le=4,
+        description="Optional. Number of variants to generate from the same prompt (1-4), generated in parallel. Use it when the user asks for several options instead of calling the tool several times."
+    )
+    regenerate: bool = Field(
+        default=False,
+        description="Optional. Set to true when the user asks to regenerate or try again with the same prompt and parameters, to get a new result instead of reusing an identical earlier generation."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -23,6 +33,8 @@ async def generate_image_by_doubao_seedream_3_jaaz(
     aspect_ratio: str,
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
+    num_images: int = 1,
+    regenerate: bool = False,
 ) -> str:
     """
     Generate an image using Doubao Seedream 3 model via the provider framework
@@ -39,6 +51,8 @@ async def generate_image_by_doubao_seedream_3_jaaz(
         prompt=prompt,
         aspect_ratio=aspect_ratio,
         input_images=None,
+        num_images=num_images,
+        use_cache=not regenerate,
     )
 
 
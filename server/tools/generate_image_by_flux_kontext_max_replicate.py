@@ -14,6 +14,8 @@ async def generate_image_by_flux_kontext_max_replicate(
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
     input_image: str | None = None,
+    num_images: int = 1,
+    regenerate: bool = False,
 ) -> str:
     """
     Generate an image using Flux Kontext Max model via the Replicate provider framework
@@ -30,6 +32,8 @@ async def generate_image_by_flux_kontext_max_replicate(
         prompt=prompt,
         aspect_ratio=aspect_ratio,
         input_images=[input_image] if input_image else None,
+        num_images=num_images,
+        use_cache=not regenerate,
     )
 
 # Export the tool for easy import
@@ -14,6 +14,8 @@ async def generate_image_by_flux_kontext_pro_replicate(
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
     input_image: str | None = None,
+    num_images: int = 1,
+    regenerate: bool = False,
 ) -> str:
     ctx = config.get('configurable', {})
     canvas_id = ctx.get('canvas_id', '')
@@ -26,6 +28,8 @@ async def generate_image_by_flux_kontext_pro_replicate(
         prompt=prompt,
         aspect_ratio=aspect_ratio,
         input_images=[input_image] if input_image else None,
+        num_images=num_images,
+        use_cache=not regenerate,
     )
 
 # Export the tool for easy import
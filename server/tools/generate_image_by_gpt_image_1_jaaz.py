@@ -16,6 +16,16 @@ class GenerateImageByGptImage1InputSchema(BaseModel):
         default=None,
         description="Optional; One or multiple images to use as reference. Pass a list of image_id here, e.g. ['im_jurheut7.png', 'im_hfuiut78.png']. Best for image editing cases like: Editing specific parts of the image, Removing specific objects, Maintaining visual elements across scenes (character/object consistency), Generating new content in the style of the reference (style transfer), etc."
     )
+    num_images: int = Field(
+        default=1,
+        ge=1,
+        le=4,
+        description="Optional. Number of variants to generate from the same prompt (1-4), generated in parallel. Use it when the user asks for several options instead of calling the tool several times."
+    )
+    regenerate: bool = Field(
+        default=False,
+        description="Optional. Set to true when the user asks to regenerate or try again with the same prompt and parameters, to get a new result instead of reusing an identical earlier generation."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -28,6 +38,8 @@ async def generate_image_by_gpt_image_1_jaaz(
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
     input_images: list[str] | None = None,
+    num_images: int = 1,
+    regenerate: bool = False,
 ) -> str:
     ctx = config.get('configurable', {})
     canvas_id = ctx.get('canvas_id', '')
@@ -40,6 +52,8 @@ async def generate_image_by_gpt_image_1_jaaz(
         prompt=prompt,
         aspect_ratio=aspect_ratio,
         input_images=input_images,
+        num_images=num_images,
+        use_cache=not regenerate,
     )
 
 
@@ -13,6 +13,8 @@ async def generate_image_by_imagen_4_replicate(
     aspect_ratio: str,
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
+    num_images: int = 1,
+    regenerate: bool = False,
 ) -> str:
     ctx = config.get('configurable', {})
     canvas_id = ctx.get('canvas_id', '')
@@ -25,6 +27,8 @@ async def generate_image_by_imagen_4_replicate(
         model='google/imagen-4',
         prompt=prompt,
         aspect_ratio=aspect_ratio,
+        num_images=num_images,
+        use_cache=not regenerate,
     )
 
 
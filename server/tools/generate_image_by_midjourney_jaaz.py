@@ -1,9 +1,10 @@
-from typing import Annotated, List, Dict, Any
+import asyncio
+from typing import Annotated, List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId  # type: ignore
 from langchain_core.runnables import RunnableConfig
 from services.jaaz_service import JaazService
-from tools.utils.image_canvas_utils import save_image_to_canvas, send_image_start_notification, send_image_error_notification
+from tools.utils.image_canvas_utils import save_media_batch_to_canvas, send_image_start_notification, send_image_error_notification
 from common import DEFAULT_PORT
 import os
 from tools.utils.image_utils import get_image_info_and_save, generate_image_id, process_input_image
@@ -80,14 +81,13 @@ async def generate_image_by_midjourney_jaaz(
 
         print(f"🎨 Midjourney generated {len(images)} images")
 
-        # Save all images to canvas and collect results
-        saved_images: List[Dict[str, Any]] = []
-        for i, image_data in enumerate(images):
+        # Download all images concurrently, then save them to canvas with one update
+        async def download_image(i: int, image_data: Dict[str, Any]) -> Optional[Tuple[str, int, int, str]]:
             try:
                 image_url = image_data.get('url')
                 if not image_url:
                     print(f"Warning: No URL found for image {i}")
-                    continue
+                    return None
 
                 # Download and save the image
                 image_id = generate_image_id()
@@ -104,28 +104,31 @@ async def generate_image_by_midjourney_jaaz(
                         "content_type": image_data.get('content_type'),
                     }
                 )
-
-                filename = f'{image_id}.{extension}'
-
-                # Save to canvas
-                canvas_image_url = await save_image_to_canvas(
-                    session_id, canvas_id, filename, mime_type, width, height
-                )
-
-                # Add to saved images list
-                saved_images.append({
-                    "image_id": filename,
-                    "url": canvas_image_url,
-                    "index": i,
-                    "original_data": image_data
-                })
-
-                print(f"🎨 Saved image {i+1}/{len(images)}: {filename}")
+                print(f"🎨 Saved image {i+1}/{len(images)}: {image_id}.{extension}")
+                return mime_type, width, height, f'{image_id}.{extension}'
 
             except Exception as e:
                 print(f"Error saving image {i}: {e}")
                 # Continue with other images even if one fails
-                continue
+                return None
+
+        downloaded = await asyncio.gather(*[
+            download_image(i, image_data) for i, image_data in enumerate(images)
+        ])
+        indexes = [i for i, output in enumerate(downloaded) if output]
+        outputs = [output for output in downloaded if output]
+        saved_images: List[Dict[str, Any]] = []
+        if outputs:
+            saved = await save_media_batch_to_canvas(session_id, canvas_id, outputs)
+            saved_images = [
+                {
+                    "image_id": item['filename'],
+                    "url": item['url'],
+                    "index": i,
+                    "original_data": images[i]
+                }
+                for i, item in zip(indexes, saved)
+            ]
 
         if not saved_images:
             raise Exception("Failed to save any images from Midjourney generation")
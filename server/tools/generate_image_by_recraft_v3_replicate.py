@@ -13,6 +13,8 @@ async def generate_image_by_recraft_v3_replicate(
     aspect_ratio: str,
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
+    num_images: int = 1,
+    regenerate: bool = False,
 ) -> str:
     """
     Generate an image using Recraft V3 model via the Replicate provider framework
@@ -28,6 +30,8 @@ async def generate_image_by_recraft_v3_replicate(
         prompt=prompt,
         aspect_ratio=aspect_ratio,
         input_images=None,
+        num_images=num_images,
+        use_cache=not regenerate,
     )
 
 
@@ -3,7 +3,8 @@ from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId  # type: ignore
 from langchain_core.runnables import RunnableConfig
 from services.jaaz_service import JaazService
-from tools.video_generation.video_canvas_utils import send_video_start_notification, process_video_result
+from tools.utils.generation_cache import generation_cache
+from tools.video_generation.video_canvas_utils import send_video_start_notification, process_video_result, reuse_cached_video
 from .utils.image_utils import process_input_image
 
 
@@ -27,6 +28,10 @@ class GenerateVideoByHailuoInputSchema(BaseModel):
         default=None,
         description="Optional. Images to use as reference or starting frame. Pass a list of image_id here, e.g. ['im_jurheut7.png']. Only the first image will be used as start_image."
     )
+    regenerate: bool = Field(
+        default=False,
+        description="Optional. Set to true when the user asks to regenerate or try again with the same prompt and parameters, to get a new result instead of reusing an identical earlier generation."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -41,6 +46,7 @@ async def generate_video_by_hailuo_02_jaaz(
     resolution: str = "768p",
     duration: int = 6,
     input_images: list[str] | None = None,
+    regenerate: bool = False,
 ) -> str:
     """
     Generate a video using Hailuo 02 model via Jaaz service
@@ -54,6 +60,15 @@ async def generate_video_by_hailuo_02_jaaz(
     # Inject the tool call id into the context
     ctx['tool_call_id'] = tool_call_id
 
+    # The same request was generated before: place its video again
+    cache_key = await generation_cache.make_key(
+        "video", "jaaz", "hailuo-02", prompt, input_images,
+        resolution=resolution, duration=duration, prompt_enhancer=prompt_enhancer) if generation_cache.enabled else None
+    if cache_key is not None and not regenerate:
+        cached = await reuse_cached_video(session_id, canvas_id, cache_key, "jaaz/hailuo-02")
+        if cached is not None:
+            return cached
+
     try:
         # Send start notification
         await send_video_start_notification(
@@ -95,6 +110,8 @@ async def generate_video_by_hailuo_02_jaaz(
             session_id=session_id,
             canvas_id=canvas_id,
             provider_name="jaaz_hailuo",
+            tool_call_id=tool_call_id,
+            cache_key=cache_key,
         )
 
     except Exception as e:
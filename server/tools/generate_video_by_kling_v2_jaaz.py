@@ -3,7 +3,8 @@ from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId  # type: ignore
 from langchain_core.runnables import RunnableConfig
 from services.jaaz_service import JaazService
-from tools.video_generation.video_canvas_utils import send_video_start_notification, process_video_result
+from tools.utils.generation_cache import generation_cache
+from tools.video_generation.video_canvas_utils import send_video_start_notification, process_video_result, reuse_cached_video
 from .utils.image_utils import process_input_image
 
 
@@ -30,6 +31,10 @@ class GenerateVideoByKlingV2InputSchema(BaseModel):
     input_images: list[str] = Field(
         description="Required. Images to use as reference or starting frame. Pass a list of image_id here, e.g. ['im_jurheut7.png']. Only the first image will be used as start_image."
     )
+    regenerate: bool = Field(
+        default=False,
+        description="Optional. Set to true when the user asks to regenerate or try again with the same prompt and parameters, to get a new result instead of reusing an identical earlier generation."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -45,6 +50,7 @@ async def generate_video_by_kling_v2_jaaz(
     guidance_scale: float = 0.5,
     aspect_ratio: str = "16:9",
     duration: int = 5,
+    regenerate: bool = False,
 ) -> str:
     """
     Generate a video using Kling V2.1 model via Jaaz service
@@ -58,6 +64,16 @@ async def generate_video_by_kling_v2_jaaz(
     # Inject the tool call id into the context
     ctx['tool_call_id'] = tool_call_id
 
+    # The same request was generated before: place its video again
+    cache_key = await generation_cache.make_key(
+        "video", "jaaz", "kling-v2.1-standard", prompt, input_images,
+        negative_prompt=negative_prompt, guidance_scale=guidance_scale,
+        aspect_ratio=aspect_ratio, duration=duration) if generation_cache.enabled else None
+    if cache_key is not None and not regenerate:
+        cached = await reuse_cached_video(session_id, canvas_id, cache_key, "jaaz/kling-v2.1-standard")
+        if cached is not None:
+            return cached
+
     try:
         # Validate input_images is provided and not empty
         if not input_images or len(input_images) == 0:
@@ -102,6 +118,8 @@ async def generate_video_by_kling_v2_jaaz(
             session_id=session_id,
             canvas_id=canvas_id,
             provider_name="jaaz_kling",
+            tool_call_id=tool_call_id,
+            cache_key=cache_key,
         )
 
     except Exception as e:
@@ -3,7 +3,8 @@ from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId  # type: ignore
 from langchain_core.runnables import RunnableConfig
 from services.jaaz_service import JaazService
-from tools.video_generation.video_canvas_utils import send_video_start_notification, process_video_result
+from tools.utils.generation_cache import generation_cache
+from tools.video_generation.video_canvas_utils import send_video_start_notification, process_video_result, reuse_cached_video
 from .utils.image_utils import process_input_image
 
 
@@ -31,6 +32,10 @@ class GenerateVideoBySeedanceV1InputSchema(BaseModel):
         default=True,
         description="Optional. Whether to keep the camera fixed (no camera movement)."
     )
+    regenerate: bool = Field(
+        default=False,
+        description="Optional. Set to true when the user asks to regenerate or try again with the same prompt and parameters, to get a new result instead of reusing an identical earlier generation."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -46,6 +51,7 @@ async def generate_video_by_seedance_v1_jaaz(
     aspect_ratio: str = "16:9",
     input_images: list[str] | None = None,
     camera_fixed: bool = True,
+    regenerate: bool = False,
 ) -> str:
     """
     Generate a video using Seedance V1 model via Jaaz service
@@ -59,6 +65,16 @@ async def generate_video_by_seedance_v1_jaaz(
     # Inject the tool call id into the context
     ctx['tool_call_id'] = tool_call_id
 
+    # The same request was generated before: place its video again
+    cache_key = await generation_cache.make_key(
+        "video", "jaaz", "seedance-1.0-pro", prompt, input_images,
+        resolution=resolution, duration=duration, aspect_ratio=aspect_ratio,
+        camera_fixed=camera_fixed) if generation_cache.enabled else None
+    if cache_key is not None and not regenerate:
+        cached = await reuse_cached_video(session_id, canvas_id, cache_key, "jaaz/seedance-1.0-pro")
+        if cached is not None:
+            return cached
+
     try:
         # Send start notification
         await send_video_start_notification(
@@ -101,6 +117,8 @@ async def generate_video_by_seedance_v1_jaaz(
             session_id=session_id,
             canvas_id=canvas_id,
             provider_name="jaaz_seedance",
+            tool_call_id=tool_call_id,
+            cache_key=cache_key,
         )
 
     except Exception as e:
@@ -30,6 +30,10 @@ class GenerateVideoBySeedanceV1LiteInputI2VSchema(BaseModel):
         default=True,
         description="Optional. Whether to keep the camera fixed (no camera movement)."
     )
+    regenerate: bool = Field(
+        default=False,
+        description="Optional. Set to true when the user asks to regenerate or try again with the same prompt and parameters, to get a new result instead of reusing an identical earlier generation."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -53,6 +57,10 @@ class GenerateVideoBySeedanceV1LiteInputT2VSchema(BaseModel):
         default=True,
         description="Optional. Whether to keep the camera fixed (no camera movement)."
     )
+    regenerate: bool = Field(
+        default=False,
+        description="Optional. Set to true when the user asks to regenerate or try again with the same prompt and parameters, to get a new result instead of reusing an identical earlier generation."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -68,6 +76,7 @@ async def generate_video_by_seedance_v1_lite_i2v(
     aspect_ratio: str = "16:9",
     input_images: list[str] | None = None,
     camera_fixed: bool = True,
+    regenerate: bool = False,
 ) -> str:
     """
     Generate a video using Seedance V1 model via configured provider
@@ -112,6 +121,7 @@ async def generate_video_by_seedance_v1_lite_i2v(
         config=config,
         input_images=processed_input_images,
         camera_fixed=camera_fixed,
+        use_cache=not regenerate,
     )
 
 
@@ -126,6 +136,7 @@ async def generate_video_by_seedance_v1_lite_t2v(
     duration: int = 5,
     aspect_ratio: str = "16:9",
     camera_fixed: bool = True,
+    regenerate: bool = False,
 ) -> str:
     """
     Generate a video using Seedance V1 model via configured provider
@@ -140,6 +151,7 @@ async def generate_video_by_seedance_v1_lite_t2v(
         tool_call_id=tool_call_id,
         config=config,
         camera_fixed=camera_fixed,
+        use_cache=not regenerate,
     )
 
 
@@ -30,6 +30,10 @@ class GenerateVideoBySeedanceV1InputSchema(BaseModel):
         default=True,
         description="Optional. Whether to keep the camera fixed (no camera movement)."
     )
+    regenerate: bool = Field(
+        default=False,
+        description="Optional. Set to true when the user asks to regenerate or try again with the same prompt and parameters, to get a new result instead of reusing an identical earlier generation."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -45,6 +49,7 @@ async def generate_video_by_seedance_v1_pro_volces(
     aspect_ratio: str = "16:9",
     input_images: list[str] | None = None,
     camera_fixed: bool = True,
+    regenerate: bool = False,
 ) -> str:
     """
     Generate a video using Seedance V1 model via configured provider
@@ -73,6 +78,7 @@ async def generate_video_by_seedance_v1_pro_volces(
         config=config,
         input_images=processed_input_images,
         camera_fixed=camera_fixed,
+        use_cache=not regenerate,
     )
 
 
@@ -3,7 +3,8 @@ from pydantic import BaseModel, Field
 from langchain_core.tools import tool, InjectedToolCallId  # type: ignore
 from langchain_core.runnables import RunnableConfig
 from services.jaaz_service import JaazService
-from tools.video_generation.video_canvas_utils import send_video_start_notification, process_video_result
+from tools.utils.generation_cache import generation_cache
+from tools.video_generation.video_canvas_utils import send_video_start_notification, process_video_result, reuse_cached_video
 from services.tool_confirmation_manager import tool_confirmation_manager
 from services.websocket_service import send_to_websocket
 import json
@@ -12,6 +13,10 @@ class GenerateVideoByVeo3FastInputSchema(BaseModel):
     prompt: str = Field(
         description="Required. The prompt for video generation. Describe what you want to see in the video."
     )
+    regenerate: bool = Field(
+        default=False,
+        description="Optional. Set to true when the user asks to regenerate or try again with the same prompt and parameters, to get a new result instead of reusing an identical earlier generation."
+    )
     tool_call_id: Annotated[str, InjectedToolCallId]
 
 
@@ -22,6 +27,7 @@ async def generate_video_by_veo3_fast_jaaz(
     prompt: str,
     config: RunnableConfig,
     tool_call_id: Annotated[str, InjectedToolCallId],
+    regenerate: bool = False,
 ) -> str:
     """
     Generate a video using Veo3 Fast model via Jaaz service
@@ -32,6 +38,15 @@ async def generate_video_by_veo3_fast_jaaz(
     session_id = ctx.get('session_id', '')
     print(f'🛠️ canvas_id {canvas_id} session_id {session_id}')
 
+    # The same request was generated before: place its video again, nothing
+    # is charged so it needs no confirmation
+    cache_key = await generation_cache.make_key(
+        "video", "jaaz", "veo3-fast", prompt) if generation_cache.enabled else None
+    if cache_key is not None and not regenerate:
+        cached = await reuse_cached_video(session_id, canvas_id, cache_key, "jaaz/veo3-fast")
+        if cached is not None:
+            return cached
+
         # 检查是否需要确认
     arguments = {
         'prompt': prompt,
@@ -80,6 +95,8 @@ async def generate_video_by_veo3_fast_jaaz(
             session_id=session_id,
             canvas_id=canvas_id,
             provider_name="jaaz_veo3_fast",
+            tool_call_id=tool_call_id,
+            cache_key=cache_key,
         )
 
     except Exception as e:
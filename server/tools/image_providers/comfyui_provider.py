@@ -1,8 +1,6 @@
 import os
-import random
 import json
 import sys
-import copy
 import traceback
 from typing import Optional, Any
 from pydantic import BaseModel
@@ -10,6 +8,8 @@ from .image_base_provider import ImageProviderBase
 from ..utils.image_utils import get_image_info_and_save, generate_image_id
 from services.config_service import FILES_DIR, config_service
 from routers.comfyui_execution import execute
+from ..utils.comfyui_template import WorkflowTemplate, FLUX_T2I_BINDINGS, BASIC_T2I_BINDINGS
+from services.comfyui_scheduler import get_comfyui_urls
 
 
 class ComfyUIResponse(BaseModel):
@@ -43,13 +43,15 @@ class ComfyUIProvider(ImageProviderBase, provider_name="comfyui"):
         basic_comfy_t2i_workflow = get_asset_path(
             "default_comfy_t2i_workflow.json")
 
-        self.flux_comfy_workflow = None
-        self.basic_comfy_t2i_workflow = None
+        self.flux_comfy_workflow: Optional[WorkflowTemplate] = None
+        self.basic_comfy_t2i_workflow: Optional[WorkflowTemplate] = None
 
         try:
-            self.flux_comfy_workflow = json.load(open(asset_dir, "r"))
-            self.basic_comfy_t2i_workflow = json.load(
-                open(basic_comfy_t2i_workflow, "r")
+            # Compiled once, each generation only copies the nodes it writes
+            self.flux_comfy_workflow = WorkflowTemplate(
+                json.load(open(asset_dir, "r")), FLUX_T2I_BINDINGS)
+            self.basic_comfy_t2i_workflow = WorkflowTemplate(
+                json.load(open(basic_comfy_t2i_workflow, "r")), BASIC_T2I_BINDINGS
             )
         except Exception:
             traceback.print_exc()
@@ -76,26 +78,16 @@ class ComfyUIProvider(ImageProviderBase, provider_name="comfyui"):
         if "flux" in model:
             if not self.flux_comfy_workflow:
                 raise FileNotFoundError("Flux workflow json not found")
-
-            workflow = copy.deepcopy(self.flux_comfy_workflow)
-            workflow["6"]["inputs"]["text"] = prompt
-            workflow["30"]["inputs"]["ckpt_name"] = model
-            workflow["27"]["inputs"]["width"] = width
-            workflow["27"]["inputs"]["height"] = height
-            workflow["31"]["inputs"]["seed"] = random.randint(1, 2**32)
+            template = self.flux_comfy_workflow
         else:
             if not self.basic_comfy_t2i_workflow:
                 raise FileNotFoundError(
                     "Basic ComfyUI workflow json not found")
+            template = self.basic_comfy_t2i_workflow
 
-            workflow = copy.deepcopy(self.basic_comfy_t2i_workflow)
-            workflow["6"]["inputs"]["text"] = prompt
-            workflow["4"]["inputs"]["ckpt_name"] = model
-            workflow["5"]["inputs"]["width"] = width
-            workflow["5"]["inputs"]["height"] = height
-            workflow["3"]["inputs"]["seed"] = random.randint(1, 2**32)
-
-        return workflow
+        # The seed of the KSampler is randomized
+        return template.instantiate(
+            {"prompt": prompt, "model": model, "width": width, "height": height})
 
     async def generate(
         self,
@@ -122,9 +114,7 @@ class ComfyUIProvider(ImageProviderBase, provider_name="comfyui"):
             # Get context from kwargs
             ctx = kwargs.get("ctx", {})
 
-            api_url = str(
-                config_service.app_config.get("comfyui", {}).get("url", "")
-            ).rstrip("/")
+            api_urls = get_comfyui_urls(config_service.app_config.get("comfyui", {}))
 
             # Calculate dimensions
             width, height = self._calculate_dimensions(aspect_ratio, model)
@@ -133,7 +123,7 @@ class ComfyUIProvider(ImageProviderBase, provider_name="comfyui"):
             workflow = self._build_workflow(prompt, model, width, height)
 
             # Execute workflow
-            execution = await execute(workflow, api_url, ctx=ctx)
+            execution = await execute(workflow, api_urls, ctx=ctx)
             print("🦄image execution outputs", execution.outputs)
             url = execution.outputs[0]
 
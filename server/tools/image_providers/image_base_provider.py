@@ -1,8 +1,17 @@
+import asyncio
 from abc import ABC, abstractmethod
 from typing import Optional, Any, Tuple
 
 
 class ImageProviderBase(ABC):
+    # Largest width/height of input images the provider accepts, larger ones
+    # are downscaled before encoding (None: sent as they are)
+    max_input_image_size: Optional[int] = None
+    # Requests in flight at once per provider, shared by all tool calls
+    max_concurrency: int = 4
+
+    _semaphore: Optional[asyncio.Semaphore] = None
+
     @abstractmethod
     async def generate(
         self,
@@ -27,4 +36,53 @@ class ImageProviderBase(ABC):
         Returns:
             Tuple[str, int, int, str]: (mime_type, width, height, filename)
         """
-        pass
\ No newline at end of file
+        pass
+
+    async def generate_many(
+        self,
+        prompt: str,
+        model: str,
+        aspect_ratio: str = "1:1",
+        input_images: Optional[list[str]] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        num_images: int = 1,
+        **kwargs: Any
+    ) -> list[Tuple[str, int, int, str]]:
+        """
+        Generate `num_images` variants of the same request concurrently
+
+        Every variant is one `generate` call, at most `max_concurrency` of them
+        run at once for this provider. Failed variants are skipped, the first
+        error is raised only if all of them failed.
+
+        Returns:
+            list[Tuple[str, int, int, str]]: (mime_type, width, height, filename) of each variant
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        semaphore = self._semaphore
+
+        async def generate_variant(index: int) -> Tuple[str, int, int, str]:
+            variant_metadata = dict(metadata or {})
+            if num_images > 1:
+                variant_metadata["variant_index"] = index
+                variant_metadata["num_images"] = num_images
+            async with semaphore:
+                return await self.generate(
+                    prompt=prompt,
+                    model=model,
+                    aspect_ratio=aspect_ratio,
+                    input_images=input_images,
+                    metadata=variant_metadata,
+                    **kwargs
+                )
+
+        results = await asyncio.gather(
+            *[generate_variant(i) for i in range(max(1, num_images))], return_exceptions=True)
+        outputs = [result for result in results if not isinstance(result, BaseException)]
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if not outputs:
+            raise errors[0]
+        for error in errors:
+            print(f"⚠️ Image variant failed, keeping {len(outputs)}/{len(results)} results: {error}")
+        return outputs
@@ -29,6 +29,8 @@ class TaskSearchResponse(BaseModel):
 class JaazImageProvider(ImageProviderBase):
     """Jaaz Cloud image generation provider implementation"""
 
+    max_input_image_size = 2048
+
     def _build_url(self) -> str:
         """Build request URL"""
         config = config_service.app_config.get('jaaz', {})
@@ -11,6 +11,8 @@ from services.config_service import config_service
 class ReplicateImageProvider(ImageProviderBase):
     """Replicate image generation provider implementation"""
 
+    max_input_image_size = 2048
+
     def _build_url(self, model: str) -> str:
         """Build request URL for Replicate API"""
         return f"https://api.replicate.com/v1/models/{model}/predictions"
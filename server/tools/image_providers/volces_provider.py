@@ -26,6 +26,8 @@ class VolcesImagesResponse(BaseModel):
 class VolcesProvider(ImageProviderBase):
     """Volces image generation provider implementation"""
 
+    max_input_image_size = 4096
+
     def _create_client(self) -> OpenAI:
         """Create OpenAI client for Volces API"""
         config = config_service.app_config.get("volces", {})
@@ -19,6 +19,8 @@ class WavespeedResponse(BaseModel):
 class WavespeedProvider(ImageProviderBase):
     """WaveSpeed image generation provider implementation"""
 
+    max_input_image_size = 2048
+
     def _build_headers(self) -> dict[str, str]:
         """Build request headers"""
         config = config_service.app_config.get('wavespeed', {})
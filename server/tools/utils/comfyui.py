@@ -1,9 +1,7 @@
 from typing import Optional
 import os
-import random
 import json
 import sys
-import copy
 import traceback
 from utils.http_client import HttpClient
 from .image_utils import get_image_info_and_save, generate_image_id
@@ -14,6 +12,8 @@ from services.config_service import (
     VIDEO_FORMATS,
 )
 from routers.comfyui_execution import execute
+from .comfyui_template import WorkflowTemplate, FLUX_T2I_BINDINGS, BASIC_T2I_BINDINGS
+from services.comfyui_scheduler import get_comfyui_urls
 from tools.video_generation.video_canvas_utils import get_video_info_and_save
 
 
@@ -73,9 +73,11 @@ class ComfyUIGenerator():
         self.comfy_websocket_client = None
 
         try:
-            self.flux_comfy_workflow = json.load(open(asset_dir, "r"))
-            self.basic_comfy_t2i_workflow = json.load(
-                open(basic_comfy_t2i_workflow, "r")
+            # Compiled once, each generation only copies the nodes it writes
+            self.flux_comfy_workflow = WorkflowTemplate(
+                json.load(open(asset_dir, "r")), FLUX_T2I_BINDINGS)
+            self.basic_comfy_t2i_workflow = WorkflowTemplate(
+                json.load(open(basic_comfy_t2i_workflow, "r")), BASIC_T2I_BINDINGS
             )
         except Exception:
             traceback.print_exc()
@@ -97,9 +99,7 @@ class ComfyUIGenerator():
         # Get context from kwargs
         ctx = kwargs.get("ctx", {})
 
-        api_url = str(
-            config_service.app_config.get("comfyui", {}).get("url", "")
-        ).rstrip("/")
+        api_urls = get_comfyui_urls(config_service.app_config.get("comfyui", {}))
 
         # Process ratio
         if "flux" in model:
@@ -116,21 +116,14 @@ class ComfyUIGenerator():
         height = int((factor * h_ratio) / 64) * 64
 
         if "flux" in model:
-            workflow = copy.deepcopy(self.flux_comfy_workflow)
-            workflow["6"]["inputs"]["text"] = prompt
-            workflow["30"]["inputs"]["ckpt_name"] = model
-            workflow["27"]["inputs"]["width"] = width
-            workflow["27"]["inputs"]["height"] = height
-            workflow["31"]["inputs"]["seed"] = random.randint(1, 2**32)
+            template = self.flux_comfy_workflow
         else:
-            workflow = copy.deepcopy(self.basic_comfy_t2i_workflow)
-            workflow["6"]["inputs"]["text"] = prompt
-            workflow["4"]["inputs"]["ckpt_name"] = model
-            workflow["5"]["inputs"]["width"] = width
-            workflow["5"]["inputs"]["height"] = height
-            workflow["3"]["inputs"]["seed"] = random.randint(1, 2**32)
-
-        execution = await execute(workflow, api_url, ctx=ctx)
+            template = self.basic_comfy_t2i_workflow
+        # The seed of the KSampler is randomized
+        workflow = template.instantiate(
+            {"prompt": prompt, "model": model, "width": width, "height": height})
+
+        execution = await execute(workflow, api_urls, ctx=ctx)
         print("🦄image execution outputs", execution.outputs)
         url = execution.outputs[0]
 
@@ -146,10 +139,13 @@ class ComfyUIGenerator():
 class ComfyUIWorkflowRunner():
     """ComfyUI image generator implementation"""
 
-    def __init__(self, workflow_dict, base_url):
+    def __init__(self, workflow_dict, base_url, prepare=None):
         # Load workflows
         self.workflow = workflow_dict
+        # One base URL or a list of them for the scheduler
         self.base_url = base_url
+        # Optional async prepare(base_url) -> workflow for the chosen backend
+        self.prepare = prepare
 
     async def generate(
         self,
@@ -162,7 +158,8 @@ class ComfyUIWorkflowRunner():
         ctx = kwargs.get("ctx", {})
 
         execution = await execute(
-            self.workflow, self.base_url, local_paths=True, ctx=ctx
+            self.workflow, self.base_url, local_paths=True, ctx=ctx,
+            prepare=self.prepare
         )
         print("🦄workflow execution outputs", execution.outputs)
 
@@ -173,15 +170,16 @@ class ComfyUIWorkflowRunner():
 
             # check is video or image.
             file_type = await detect_file_type_comprehensive(url)
-            get_info_func = (
-                get_video_info_and_save
-                if file_type == "video"
-                else get_image_info_and_save
-            )
-
-            mime_type, width, height, extension = await get_info_func(
-                url, os.path.join(FILES_DIR, f"{image_id}")
-            )
+            if file_type == "video":
+                # Report download progress on the calling tool call
+                mime_type, width, height, extension = await get_video_info_and_save(
+                    url, os.path.join(FILES_DIR, f"{image_id}"),
+                    ctx.get("session_id"), ctx.get("tool_call_id")
+                )
+            else:
+                mime_type, width, height, extension = await get_image_info_and_save(
+                    url, os.path.join(FILES_DIR, f"{image_id}")
+                )
 
             filename = f"{image_id}.{extension}"
             results.append((mime_type, width, height, filename))
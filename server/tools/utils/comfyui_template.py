@@ -0,0 +1,154 @@
+"""
+Compiled ComfyUI workflow templates
+
+A workflow is parsed once into a WorkflowTemplate with its binding plan:
+which tool parameter is written to which node input, and which nodes have
+a `seed`. Running it builds the API workflow with a structural-sharing
+copy: only the nodes that get a value are copied, all other nodes are the
+template's own dicts. Queued workflows are only serialized, never mutated
+past instantiate(), so the sharing is safe.
+
+comfy_workflow_templates keeps the compiled workflows of the dynamic
+workflow tools by id. They are compiled when the tools are registered and
+dropped when the workflow is deleted or no longer listed.
+"""
+
+import copy
+import json
+import random
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# (param name, node id, node input name)
+Binding = Tuple[str, str, str]
+
+SEED_MAX = (1 << 32) - 1
+
+# Bindings of the bundled text to image workflows in asset/
+FLUX_T2I_BINDINGS: Tuple[Binding, ...] = (
+    ('prompt', '6', 'text'),
+    ('model', '30', 'ckpt_name'),
+    ('width', '27', 'width'),
+    ('height', '27', 'height'),
+)
+BASIC_T2I_BINDINGS: Tuple[Binding, ...] = (
+    ('prompt', '6', 'text'),
+    ('model', '4', 'ckpt_name'),
+    ('width', '5', 'width'),
+    ('height', '5', 'height'),
+)
+
+
+def parse_input_defs(inputs: Any) -> List[Dict[str, Any]]:
+    """The `inputs` column of comfy_workflows, stored as JSON text"""
+    try:
+        return inputs if isinstance(inputs, list) else json.loads(inputs)
+    except Exception:
+        return []
+
+
+class WorkflowTemplate:
+    """Immutable ComfyUI API workflow with a precomputed binding plan"""
+
+    __slots__ = ('_nodes', 'bindings', 'seed_nodes')
+
+    def __init__(self, workflow: Dict[str, Any], bindings: Iterable[Binding] = ()):
+        # Private copy, the caller's dict may change later
+        self._nodes: Dict[str, Any] = copy.deepcopy(workflow)
+        # Bindings to nodes or inputs the workflow doesn't have are dropped once here
+        self.bindings: Tuple[Binding, ...] = tuple(
+            (param, node_id, input_name) for param, node_id, input_name in bindings
+            if isinstance(self._nodes.get(node_id), dict)
+            and input_name in (self._nodes[node_id].get('inputs') or {})
+        )
+        self.seed_nodes: Tuple[str, ...] = tuple(
+            node_id for node_id, node in self._nodes.items()
+            if isinstance(node, dict) and 'seed' in (node.get('inputs') or {})
+        )
+
+    @classmethod
+    def from_input_defs(cls, workflow: Dict[str, Any], input_defs: List[Dict[str, Any]]) -> 'WorkflowTemplate':
+        """Template of a stored workflow, bound by its `inputs` definitions"""
+        bindings: List[Binding] = []
+        for param in input_defs:
+            param_name = param.get('name')
+            node_id = param.get('node_id')
+            node_input_name = param.get('node_input_name')
+            if param_name and node_id and node_input_name:
+                bindings.append((param_name, str(node_id), node_input_name))
+        return cls(workflow, bindings)
+
+    def _writable_inputs(self, workflow: Dict[str, Any], node_id: str) -> Dict[str, Any]:
+        node = workflow[node_id]
+        if node is self._nodes[node_id]:
+            node = {**node, 'inputs': dict(node.get('inputs') or {})}
+            workflow[node_id] = node
+        return node['inputs']
+
+    def instantiate(self, values: Dict[str, Any], randomize_seeds: bool = True) -> Dict[str, Any]:
+        """
+        API workflow with `values` written to the bound inputs, then random
+        seeds if randomize_seeds. Nodes without writes are shared with the
+        template and must not be modified.
+        """
+        workflow = dict(self._nodes)
+        for param, node_id, input_name in self.bindings:
+            if param in values:
+                self._writable_inputs(workflow, node_id)[input_name] = values[param]
+        if randomize_seeds:
+            for node_id in self.seed_nodes:
+                self._writable_inputs(workflow, node_id)['seed'] = random.randint(1, SEED_MAX)
+        return workflow
+
+
+class ComfyWorkflowTemplates:
+    """Compiled templates of the stored workflows, by workflow id"""
+
+    def __init__(self) -> None:
+        # id -> (api_json, inputs) it was compiled from, template
+        self._templates: Dict[int, Tuple[Tuple[str, str], WorkflowTemplate]] = {}
+        # instrumentation
+        self._compiles = 0
+        self._reuses = 0
+        self._invalidations = 0
+
+    def compile(self, wf: Dict[str, Any]) -> WorkflowTemplate:
+        """Template of a comfy_workflows row, compiled again only if the row changed"""
+        source = (
+            wf['api_json'] if isinstance(wf['api_json'], str) else json.dumps(wf['api_json'], sort_keys=True),
+            wf['inputs'] if isinstance(wf['inputs'], str) else json.dumps(wf['inputs'], sort_keys=True),
+        )
+        cached = self._templates.get(wf['id'])
+        if cached is not None and cached[0] == source:
+            self._reuses += 1
+            return cached[1]
+        api_json = wf['api_json'] if isinstance(wf['api_json'], dict) else json.loads(wf['api_json'])
+        template = WorkflowTemplate.from_input_defs(api_json, parse_input_defs(wf['inputs']))
+        self._templates[wf['id']] = (source, template)
+        self._compiles += 1
+        return template
+
+    def get(self, workflow_id: int) -> Optional[WorkflowTemplate]:
+        cached = self._templates.get(workflow_id)
+        return cached[1] if cached is not None else None
+
+    def invalidate(self, workflow_id: int) -> None:
+        if self._templates.pop(workflow_id, None) is not None:
+            self._invalidations += 1
+
+    def retain(self, workflow_ids: Iterable[int]) -> None:
+        """Drop the templates of workflows that no longer exist"""
+        keep = set(workflow_ids)
+        for workflow_id in [i for i in self._templates if i not in keep]:
+            self.invalidate(workflow_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'templates': len(self._templates),
+            'compiles': self._compiles,
+            'reuses': self._reuses,
+            'invalidations': self._invalidations,
+        }
+
+
+# Create a singleton instance
+comfy_workflow_templates = ComfyWorkflowTemplates()
@@ -0,0 +1,147 @@
+"""
+Result cache of image and video generation requests
+
+Agents often repeat the same generation after an error or a handoff. When
+enabled (GENERATION_CACHE_TTL > 0, in seconds), a successful generation is
+remembered by a hash of its request: kind, provider, model, prompt, the
+content hashes of the input images and the remaining parameters (aspect
+ratio, seed, ...). A repeated request reuses the files already saved under
+FILES_DIR and skips the provider call. Entries expire after the TTL and the
+least recently used ones are evicted above GENERATION_CACHE_SIZE. The
+image and video tools take a `regenerate` argument, passed on as
+use_cache=False: the cached result is skipped and the new one replaces it.
+
+Most providers are not deterministic, which is why the cache is opt-in.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.config_service import FILES_DIR
+
+GENERATION_CACHE_TTL = int(os.environ.get('GENERATION_CACHE_TTL', '0'))
+GENERATION_CACHE_SIZE = int(os.environ.get('GENERATION_CACHE_SIZE', '256'))
+# Above this size input strings (e.g. data URLs) are hashed in a thread
+INLINE_HASH_MAX_BYTES = 64 * 1024
+
+# (mime_type, width, height, filename) of a saved file
+GeneratedFile = Tuple[str, int, int, str]
+
+
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class GenerationCache:
+    """TTL + LRU map of request hashes to generated files"""
+
+    def __init__(self, ttl: int = GENERATION_CACHE_TTL, max_entries: int = GENERATION_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._entries: 'OrderedDict[str, Tuple[float, List[GeneratedFile]]]' = OrderedDict()
+        # (path, mtime, size) -> content hash of input image files
+        self._file_hashes: Dict[Tuple[str, int, int], str] = {}
+        # instrumentation
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evicted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    async def _input_hash(self, input_image: str) -> str:
+        """Content hash of an input image: a file under FILES_DIR or an inline string"""
+        path = os.path.join(FILES_DIR, input_image)
+        stat = None
+        if not input_image.startswith('data:'):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                pass
+        if stat is not None:
+            key = (path, stat.st_mtime_ns, stat.st_size)
+            digest = self._file_hashes.get(key)
+            if digest is None:
+                digest = await asyncio.to_thread(hash_file, path)
+                if len(self._file_hashes) >= self.max_entries:
+                    self._file_hashes.clear()
+                self._file_hashes[key] = digest
+            return digest
+        data = input_image.encode('utf-8')
+        if len(data) > INLINE_HASH_MAX_BYTES:
+            return await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+        return hashlib.sha256(data).hexdigest()
+
+    async def make_key(
+        self,
+        kind: str,
+        provider: str,
+        model: str,
+        prompt: str,
+        input_images: Optional[List[str]] = None,
+        **params: Any
+    ) -> str:
+        input_hashes = [await self._input_hash(image) for image in input_images or []]
+        request = json.dumps(
+            [kind, provider, model, prompt, input_hashes, params], sort_keys=True, default=str)
+        return hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[List[GeneratedFile]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._misses += 1
+            return None
+        stored_at, outputs = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self._expired += 1
+            self._misses += 1
+            return None
+        if not all(os.path.exists(os.path.join(FILES_DIR, output[3])) for output in outputs):
+            # A generated file was deleted since
+            del self._entries[key]
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return list(outputs)
+
+    def put(self, key: str, outputs: List[GeneratedFile]) -> None:
+        if not outputs:
+            return
+        self._entries[key] = (time.monotonic(), list(outputs))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evicted += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._file_hashes.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'ttl': self.ttl,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self._hits,
+            'misses': self._misses,
+            'expired': self._expired,
+            'evicted': self._evicted,
+        }
+
+
+# Create a singleton instance
+generation_cache = GenerationCache()
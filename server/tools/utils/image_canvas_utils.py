@@ -3,13 +3,11 @@ Canvas-related utilities for image generation
 Handles canvas operations, locking, and notifications
 """
 
-import asyncio
 import random
 import time
-import json
-from contextlib import asynccontextmanager
-from typing import Dict, List, Any, Optional, Union, cast
+from typing import Dict, List, Any, Optional, Tuple, Union, cast
 from nanoid import generate
+from services.canvas_write_service import canvas_write_coordinator
 from services.db_service import db_service
 from services.websocket_service import broadcast_session_update
 from services.websocket_service import send_to_websocket
@@ -20,42 +18,22 @@ def generate_file_id() -> str:
     return 'im_' + generate(size=8)
 
 
-class CanvasLockManager:
-    """Canvas lock manager to prevent concurrent operations causing position overlap"""
-
-    def __init__(self) -> None:
-        self._locks: Dict[str, asyncio.Lock] = {}
-
-    @asynccontextmanager
-    async def lock_canvas(self, canvas_id: str):
-        if canvas_id not in self._locks:
-            self._locks[canvas_id] = asyncio.Lock()
-
-        async with self._locks[canvas_id]:
-            yield
-
-
-# Global lock manager instance
-canvas_lock_manager = CanvasLockManager()
-
-
-
 async def generate_new_image_element(
     canvas_id: str,
     fileid: str,
     image_data: Dict[str, Any],
     canvas_data: Optional[Dict[str, Any]] = None,
+    position: Optional[Tuple[float, float]] = None,
 ) -> Dict[str, Any]:
-    """Generate new image element for canvas"""
-    if canvas_data is None:
-        canvas = await db_service.get_canvas_data(canvas_id)
-        if canvas is None:
-            canvas = {"data": {}}
-        canvas_data = canvas.get("data", {})
-
-
-
-    new_x, new_y = await find_next_best_element_position(canvas_data)
+    """Generate new image element for canvas, at `position` if already laid out"""
+    if position is not None:
+        new_x, new_y = position
+    elif canvas_data is None:
+        # Incrementally maintained layout index of the stored canvas
+        canvas_index = await db_service.get_canvas_index(canvas_id)
+        new_x, new_y = canvas_index.next_position()
+    else:
+        new_x, new_y = await find_next_best_element_position(canvas_data)
 
     return {
         "type": "image",
@@ -93,59 +71,99 @@ async def generate_new_image_element(
 
 async def save_image_to_canvas(session_id: str, canvas_id: str, filename: str, mime_type: str, width: int, height: int) -> str:
     """Save image to canvas with proper locking and positioning"""
-    # Use lock to ensure atomicity of the save process
-    async with canvas_lock_manager.lock_canvas(canvas_id):
-        # Fetch canvas data once inside the lock
-        canvas: Optional[Dict[str, Any]] = await db_service.get_canvas_data(canvas_id)
-        if canvas is None:
-            canvas = {'data': {}}
-        canvas_data: Dict[str, Any] = canvas.get('data', {})
-
-        # Ensure 'elements' and 'files' keys exist
-        if 'elements' not in canvas_data:
-            canvas_data['elements'] = []
-        if 'files' not in canvas_data:
-            canvas_data['files'] = {}
-
-        file_id = generate_file_id()
-        url = f'/api/file/{filename}'
-
-        file_data: Dict[str, Any] = {
-            'mimeType': mime_type,
-            'id': file_id,
-            'dataURL': url,
-            'created': int(time.time() * 1000),
-        }
-
-        new_image_element: Dict[str, Any] = await generate_new_image_element(
-            canvas_id,
-            file_id,
-            {
-                'width': width,
-                'height': height,
-            },
-            canvas_data
-        )
-
-        # Update the canvas data with the new element and file info
-        elements_list = cast(List[Dict[str, Any]], canvas_data['elements'])
-        elements_list.append(new_image_element)
-        canvas_data['files'][file_id] = file_data
+    saved = await save_media_batch_to_canvas(
+        session_id, canvas_id, [(mime_type, width, height, filename)])
+    return saved[0]['url']
 
-        image_url = f"/api/file/{filename}"
 
-        # Save the updated canvas data back to the database
-        await db_service.save_canvas_data(canvas_id, json.dumps(canvas_data))
-
-        # Broadcast image generation message to frontend
+async def save_media_batch_to_canvas(
+    session_id: str,
+    canvas_id: str,
+    outputs: List[Tuple[str, int, int, str]],
+    base_url: str = '',
+) -> List[Dict[str, Any]]:
+    """
+    Save several generated files to canvas at once
+
+    All outputs are laid out in one pass, written with a single canvas update
+    and announced with a single websocket event.
+
+    Args:
+        outputs: (mime_type, width, height, filename) of each saved file
+        base_url: Prefix of the urls sent to the frontend, relative by default
+
+    Returns:
+        One dict per output with element, file, url, mime_type and filename
+    """
+    if not outputs:
+        return []
+    # Imported here: the video package loads its providers and pymediainfo,
+    # image_canvas_utils is imported at startup by the image router
+    from tools.video_generation.video_canvas_utils import generate_new_video_element
+
+    saved: List[Dict[str, Any]] = []
+
+    async def build(positions: List[Tuple[float, float]]):
+        new_files: Dict[str, Any] = {}
+        for (mime_type, width, height, filename), position in zip(outputs, positions):
+            file_id = generate_file_id()
+            file_data: Dict[str, Any] = {
+                'mimeType': mime_type,
+                'id': file_id,
+                'dataURL': f'/api/file/{filename}',
+                'created': int(time.time() * 1000),
+            }
+            generate_element = generate_new_image_element if mime_type.startswith('image') else generate_new_video_element
+            new_element = await generate_element(
+                canvas_id,
+                file_id,
+                {
+                    'width': width,
+                    'height': height,
+                },
+                position=position,
+            )
+            new_files[file_id] = file_data
+            saved.append({
+                'element': new_element,
+                'file': file_data,
+                'url': f'{base_url}/api/file/{filename}',
+                'mime_type': mime_type,
+                'filename': filename,
+            })
+        return [item['element'] for item in saved], new_files
+
+    # Placement and write are serialized per canvas, and coalesced with
+    # other generations that finish while a write is in flight
+    await canvas_write_coordinator.place_and_append(
+        canvas_id, [(width, height) for _, width, height, _ in outputs], build)
+
+    events = [_media_generated_event(item) for item in saved]
+    # Broadcast generation message to frontend, one event for the whole batch
+    if len(events) == 1:
+        await broadcast_session_update(session_id, canvas_id, events[0])
+    else:
         await broadcast_session_update(session_id, canvas_id, {
-            'type': 'image_generated',
-            'element': new_image_element,
-            'file': file_data,
-            'image_url': image_url,
+            'type': 'media_batch_generated',
+            'items': events,
         })
+    return saved
 
-        return image_url
+
+def _media_generated_event(item: Dict[str, Any]) -> Dict[str, Any]:
+    if item['mime_type'].startswith('image'):
+        return {
+            'type': 'image_generated',
+            'element': item['element'],
+            'file': item['file'],
+            'image_url': item['url'],
+        }
+    return {
+        'type': 'video_generated',
+        'element': item['element'],
+        'file': item['file'],
+        'video_url': item['url'],
+    }
 
 
 async def send_image_start_notification(session_id: str, message: str) -> None:
@@ -3,31 +3,43 @@ Image generation core module
 Contains the main orchestration logic for image generation across different providers
 """
 
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from common import DEFAULT_PORT
-from tools.utils.image_utils import process_input_image
+from tools.utils.image_utils import process_input_images
+from tools.utils.generation_cache import generation_cache
 from ..image_providers.image_base_provider import ImageProviderBase
-
-# 导入所有提供商以确保自动注册 (不要删除这些导入)
-from ..image_providers.jaaz_provider import JaazImageProvider
-from ..image_providers.openai_provider import OpenAIImageProvider
-from ..image_providers.replicate_provider import ReplicateImageProvider
-from ..image_providers.volces_provider import VolcesProvider
-from ..image_providers.wavespeed_provider import WavespeedProvider
+from utils.lazy_import import import_object
 
 # from ..image_providers.comfyui_provider import ComfyUIProvider
 from .image_canvas_utils import (
-    save_image_to_canvas,
+    save_media_batch_to_canvas,
 )
 import time
 
-IMAGE_PROVIDERS: dict[str, ImageProviderBase] = {
-    "jaaz": JaazImageProvider(),
-    "openai": OpenAIImageProvider(),
-    "replicate": ReplicateImageProvider(),
-    "volces": VolcesProvider(),
-    "wavespeed": WavespeedProvider(),
+# Upper bound of num_images for one tool call
+MAX_NUM_IMAGES = 4
+
+# Provider classes are imported and instantiated on first use, each pulls in its own SDKs
+IMAGE_PROVIDERS: dict[str, str] = {
+    "jaaz": "tools.image_providers.jaaz_provider.JaazImageProvider",
+    "openai": "tools.image_providers.openai_provider.OpenAIImageProvider",
+    "replicate": "tools.image_providers.replicate_provider.ReplicateImageProvider",
+    "volces": "tools.image_providers.volces_provider.VolcesProvider",
+    "wavespeed": "tools.image_providers.wavespeed_provider.WavespeedProvider",
 }
+_provider_instances: dict[str, ImageProviderBase] = {}
+
+
+def get_image_provider(provider: str) -> Optional[ImageProviderBase]:
+    """Shared instance of an image provider, None if the provider is unknown"""
+    instance = _provider_instances.get(provider)
+    if instance is None:
+        class_path = IMAGE_PROVIDERS.get(provider)
+        if class_path is None:
+            return None
+        instance = import_object(class_path)()
+        _provider_instances[provider] = instance
+    return instance
 
 
 async def generate_image_with_provider(
@@ -39,6 +51,8 @@ async def generate_image_with_provider(
     prompt: str,
     aspect_ratio: str = "1:1",
     input_images: Optional[list[str]] = None,
+    num_images: int = 1,
+    use_cache: bool = True,
 ) -> str:
     """
     通用图像生成函数，支持不同的模型和提供商
@@ -51,47 +65,70 @@ async def generate_image_with_provider(
         tool_call_id: 工具调用ID
         config: 上下文运行配置，包含canvas_id，session_id，model_info，由langgraph注入
         input_images: 可选的输入参考图像列表
+        num_images: 生成的变体数量，并发请求，一次性保存到画布
+        use_cache: 为 False 时不复用缓存的生成结果，新结果会替换缓存（GENERATION_CACHE_TTL 开启时才生效）
 
     Returns:
         str: 生成结果消息
     """
 
-    provider_instance = IMAGE_PROVIDERS.get(provider)
+    provider_instance = get_image_provider(provider)
     if not provider_instance:
         raise ValueError(f"Unknown provider: {provider}")
 
-    # Process input images for the provider
-    processed_input_images: list[str] | None = None
-    if input_images:
-        processed_input_images = []
-        for image_path in input_images:
-            processed_image = await process_input_image(image_path)
-            if processed_image:
-                processed_input_images.append(processed_image)
-
-        print(f"Using {len(processed_input_images)} input images for generation")
-
-    # Prepare metadata with all generation parameters
-    metadata: Dict[str, Any] = {
-        "prompt": prompt,
-        "model": model,
-        "provider": provider,
-        "aspect_ratio": aspect_ratio,
-        "input_images": input_images or [],
-    }
-
-    # Generate image using the selected provider
-    mime_type, width, height, filename = await provider_instance.generate(
-        prompt=prompt,
-        model=model,
-        aspect_ratio=aspect_ratio,
-        input_images=processed_input_images,
-        metadata=metadata,
-    )
-
-    # Save image to canvas
-    image_url = await save_image_to_canvas(
-        session_id, canvas_id, filename, mime_type, width, height
-    )
-
-    return f"image generated successfully ![image_id: {filename}](http://localhost:{DEFAULT_PORT}{image_url})"
+    num_images = max(1, min(num_images, MAX_NUM_IMAGES))
+
+    # The same request was generated before: reuse its files
+    cache_key: Optional[str] = None
+    outputs: Optional[List[Tuple[str, int, int, str]]] = None
+    if generation_cache.enabled:
+        cache_key = await generation_cache.make_key(
+            "image", provider, model, prompt, input_images,
+            aspect_ratio=aspect_ratio, num_images=num_images)
+        # Regenerating skips the cached result, the new one replaces it
+        outputs = generation_cache.get(cache_key) if use_cache else None
+        if outputs is not None:
+            print(f"♻️ Reusing {len(outputs)} cached images for {provider}/{model}")
+
+    if outputs is None:
+        # Process input images for the provider
+        processed_input_images: list[str] | None = None
+        if input_images:
+            # Encoded concurrently in the image thread pool, reused images come from the cache
+            processed_input_images = await process_input_images(
+                input_images, max_size=provider_instance.max_input_image_size)
+
+            print(f"Using {len(processed_input_images)} input images for generation")
+
+        # Prepare metadata with all generation parameters
+        metadata: Dict[str, Any] = {
+            "prompt": prompt,
+            "model": model,
+            "provider": provider,
+            "aspect_ratio": aspect_ratio,
+            "input_images": input_images or [],
+        }
+
+        # Generate the variants concurrently using the selected provider
+        outputs = await provider_instance.generate_many(
+            prompt=prompt,
+            model=model,
+            aspect_ratio=aspect_ratio,
+            input_images=processed_input_images,
+            metadata=metadata,
+            num_images=num_images,
+        )
+
+        if cache_key is not None and len(outputs) == num_images:
+            generation_cache.put(cache_key, outputs)
+
+    # Save all images to canvas with one update
+    saved = await save_media_batch_to_canvas(session_id, canvas_id, outputs)
+
+    if len(saved) == 1:
+        return f"image generated successfully ![image_id: {saved[0]['filename']}](http://localhost:{DEFAULT_PORT}{saved[0]['url']})"
+    image_links = [
+        f"![image_{i + 1}: {item['filename']}](http://localhost:{DEFAULT_PORT}{item['url']})"
+        for i, item in enumerate(saved)
+    ]
+    return f"{len(saved)} images generated successfully:\n\n" + "\n\n".join(image_links)
@@ -1,10 +1,15 @@
+import asyncio
 import os
+import tempfile
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+import aiofiles
 from PIL import Image, PngImagePlugin
 from io import BytesIO
 import base64
 import json
-from typing import Any, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
 from nanoid import generate
 from utils.http_client import HttpClient
 from services.config_service import FILES_DIR
@@ -15,6 +20,18 @@ def generate_image_id() -> str:
     return generate(size=10)
 
 
+# Downloads larger than this are aborted instead of being buffered
+MAX_IMAGE_DOWNLOAD_BYTES = int(os.environ.get('MAX_IMAGE_DOWNLOAD_MB', '100')) * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# Color modes that PNG stores as-is
+PNG_NATIVE_MODES = ('RGB', 'RGBA', 'L')
+
+# Decoding, color conversion and PNG encoding run here, off the event loop
+_image_executor = ThreadPoolExecutor(
+    max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='image-io')
+
+
 async def get_image_info_and_save(
     url: str,
     file_path_without_extension: str,
@@ -24,6 +41,11 @@ async def get_image_info_and_save(
     """
     Download image from URL or decode base64, convert to PNG and save with metadata
 
+    The download is streamed to a temp file next to the target (capped at
+    MAX_IMAGE_DOWNLOAD_BYTES), and all PIL work runs in a worker thread.
+    PNGs that need no color conversion or metadata are moved into place
+    without re-encoding.
+
     Args:
         url: Image URL or base64 string
         file_path_without_extension: File path without extension
@@ -33,92 +55,154 @@ async def get_image_info_and_save(
     Returns:
         tuple[str, int, int, str]: (mime_type, width, height, extension) - always PNG
     """
+    loop = asyncio.get_running_loop()
+    temp_path: Optional[str] = None
     try:
         if is_b64:
-            image_data = base64.b64decode(url)
+            source: str | BytesIO = await loop.run_in_executor(
+                _image_executor, lambda: BytesIO(base64.b64decode(url)))
         else:
-            # Fetch the image asynchronously
-            async with HttpClient.create_aiohttp() as session:
-                async with session.get(url) as response:
-                    # Read the image content as bytes
-                    image_data = await response.read()
-
-        # Open image to get info
-        image = Image.open(BytesIO(image_data))
+            temp_path = await _download_to_temp_file(url, os.path.dirname(file_path_without_extension))
+            source = temp_path
+
+        return await loop.run_in_executor(
+            _image_executor, _convert_and_save_png, source, file_path_without_extension, metadata)
+
+    except Exception as e:
+        print(f"Error processing image: {e}")
+        raise e
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+async def _download_to_temp_file(url: str, directory: str) -> str:
+    """Stream the response body to a temp file, enforcing MAX_IMAGE_DOWNLOAD_BYTES"""
+    fd, temp_path = tempfile.mkstemp(suffix='.download', dir=directory or None)
+    os.close(fd)
+    try:
+        async with HttpClient.create_aiohttp() as session:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                if response.content_length and response.content_length > MAX_IMAGE_DOWNLOAD_BYTES:
+                    raise ValueError(
+                        f"Image too large: {response.content_length} bytes (max {MAX_IMAGE_DOWNLOAD_BYTES})")
+
+                size = 0
+                async with aiofiles.open(temp_path, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > MAX_IMAGE_DOWNLOAD_BYTES:
+                            raise ValueError(
+                                f"Image too large: more than {MAX_IMAGE_DOWNLOAD_BYTES} bytes")
+                        await f.write(chunk)
+        return temp_path
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def _convert_and_save_png(
+    source: str | BytesIO,
+    file_path_without_extension: str,
+    metadata: Optional[dict[str, Any]] = None
+) -> Tuple[str, int, int, str]:
+    """Blocking part of get_image_info_and_save, runs in _image_executor"""
+    # Unified format: always PNG
+    extension = 'png'
+    mime_type = 'image/png'
+    file_path = f"{file_path_without_extension}.{extension}"
+
+    with Image.open(source) as image:
         width, height = image.size
-        
+
         # Store original format for debugging
         original_format = image.format or 'Unknown'
-        print(f"Converting {original_format} image to PNG: {width}x{height}")
-
-        # Handle different color modes properly for PNG conversion
-        if image.mode == 'P':
-            # Palette mode - convert to RGBA to preserve potential transparency
-            if 'transparency' in image.info:
-                image = image.convert('RGBA')
-            else:
-                image = image.convert('RGB')
-        elif image.mode == 'LA':
-            # Grayscale with alpha - convert to RGBA
-            image = image.convert('RGBA')
-        elif image.mode == 'L':
-            # Grayscale - can stay as L or convert to RGB
-            # PNG supports grayscale, so we can keep it
-            pass
-        elif image.mode == 'CMYK':
-            # CMYK mode - convert to RGB
-            image = image.convert('RGB')
-        elif image.mode in ('RGB', 'RGBA'):
-            # Already compatible with PNG
-            pass
-        else:
-            # For any other modes, convert to RGB as a safe fallback
-            print(f"Warning: Unusual color mode {image.mode}, converting to RGB")
-            image = image.convert('RGB')
 
-        # Unified format: always PNG
-        extension = 'png'
-        mime_type = 'image/png'
-
-        # Prepare PNG info for metadata
-        pnginfo = PngImagePlugin.PngInfo()
-        
-        # Add original format info
-        pnginfo.add_text("original_format", original_format)
-        
-        if metadata:
-            for key, value in metadata.items():
-                try:
-                    # Handle different value types
-                    if isinstance(value, (dict, list)):
-                        # Serialize complex types as JSON
-                        text_value = json.dumps(value, ensure_ascii=False)
-                    elif value is None:
-                        text_value = "null"
-                    else:
-                        # Convert to string
-                        text_value = str(value)
-                    
-                    pnginfo.add_text(str(key), text_value)
-                except Exception as e:
-                    print(f"Warning: Failed to add metadata key '{key}': {e}")
-                    traceback.print_stack()
-
-        # Save as PNG with metadata
-        file_path = f"{file_path_without_extension}.{extension}"
-        
-        # Save with optimizations and metadata
-        if metadata or original_format != 'PNG':
-            image.save(file_path, format='PNG', optimize=True, pnginfo=pnginfo)
+        passthrough = original_format == 'PNG' and image.mode in PNG_NATIVE_MODES and not metadata
+        if passthrough:
+            image.verify()
         else:
-            image.save(file_path, format='PNG', optimize=True)
-        
+            _encode_png(image, file_path, original_format, metadata)
+
+    if passthrough:
+        # Already a PNG we would write unchanged: keep the original bytes
+        # (moved after the file is closed, which Windows requires)
+        _move_or_write(source, file_path)
+        print(f"Saved PNG without re-encoding: {file_path} ({width}x{height})")
+    else:
         print(f"Successfully saved as PNG: {file_path}")
-        return mime_type, width, height, extension
+    return mime_type, width, height, extension
 
-    except Exception as e:
-        print(f"Error processing image: {e}")
-        raise e
+
+def _encode_png(
+    image: Image.Image,
+    file_path: str,
+    original_format: str,
+    metadata: Optional[dict[str, Any]] = None
+) -> None:
+    """Convert to a PNG-compatible mode and encode with metadata"""
+    print(f"Converting {original_format} image to PNG: {image.width}x{image.height}")
+    image = _to_png_mode(image)
+
+    # Prepare PNG info for metadata
+    pnginfo = PngImagePlugin.PngInfo()
+
+    # Add original format info
+    pnginfo.add_text("original_format", original_format)
+
+    if metadata:
+        for key, value in metadata.items():
+            try:
+                # Handle different value types
+                if isinstance(value, (dict, list)):
+                    # Serialize complex types as JSON
+                    text_value = json.dumps(value, ensure_ascii=False)
+                elif value is None:
+                    text_value = "null"
+                else:
+                    # Convert to string
+                    text_value = str(value)
+
+                pnginfo.add_text(str(key), text_value)
+            except Exception as e:
+                print(f"Warning: Failed to add metadata key '{key}': {e}")
+                traceback.print_stack()
+
+    # Save with optimizations and metadata
+    if metadata or original_format != 'PNG':
+        image.save(file_path, format='PNG', optimize=True, pnginfo=pnginfo)
+    else:
+        image.save(file_path, format='PNG', optimize=True)
+
+
+def _to_png_mode(image: Image.Image) -> Image.Image:
+    """Handle different color modes properly for PNG conversion"""
+    if image.mode == 'P':
+        # Palette mode - convert to RGBA to preserve potential transparency
+        if 'transparency' in image.info:
+            return image.convert('RGBA')
+        return image.convert('RGB')
+    if image.mode == 'LA':
+        # Grayscale with alpha - convert to RGBA
+        return image.convert('RGBA')
+    if image.mode == 'CMYK':
+        # CMYK mode - convert to RGB
+        return image.convert('RGB')
+    if image.mode in PNG_NATIVE_MODES:
+        # Already compatible with PNG (PNG supports grayscale too)
+        return image
+    # For any other modes, convert to RGB as a safe fallback
+    print(f"Warning: Unusual color mode {image.mode}, converting to RGB")
+    return image.convert('RGB')
+
+
+def _move_or_write(source: str | BytesIO, file_path: str) -> None:
+    if isinstance(source, str):
+        os.replace(source, file_path)
+    else:
+        with open(file_path, 'wb') as f:
+            f.write(source.getbuffer())
 
 
 # Canvas-related utilities have been moved to tools/image_generation/image_canvas_utils.py
@@ -134,12 +218,118 @@ async def get_image_info_and_save(
 # Notification functions moved to tools/image_generation/image_canvas_utils.py
 
 
-async def process_input_image(input_image: str | None) -> str | None:
+# Preprocessed input images, keyed by (path, mtime, size, format, max dimension)
+INPUT_IMAGE_CACHE_SIZE = int(os.environ.get('INPUT_IMAGE_CACHE_SIZE', '32'))
+
+_INPUT_MIME_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp'
+}
+
+InputImageKey = Tuple[str, int, int, str, int]
+
+
+class _InputImageCache:
+    """LRU of data URLs, concurrent misses of the same key share one encode"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: 'OrderedDict[InputImageKey, str]' = OrderedDict()
+        self._pending: Dict[InputImageKey, 'asyncio.Future[str]'] = {}
+        self.hits = 0
+        self.misses = 0
+        self.resized = 0
+        self.passthrough = 0
+
+    async def get(self, key: InputImageKey, encode: Callable[[], str]) -> str:
+        data_url = self._entries.get(key)
+        if data_url is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data_url
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        future: 'asyncio.Future[str]' = loop.run_in_executor(_image_executor, encode)
+        self._pending[key] = future
+        try:
+            data_url = await asyncio.shield(future)
+        finally:
+            self._pending.pop(key, None)
+        self._entries[key] = data_url
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return data_url
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'bytes': sum(len(data_url) for data_url in self._entries.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'resized': self.resized,
+            'passthrough': self.passthrough,
+        }
+
+
+_input_image_cache = _InputImageCache(INPUT_IMAGE_CACHE_SIZE)
+
+
+def get_input_image_cache_stats() -> Dict[str, Any]:
+    return _input_image_cache.get_stats()
+
+
+def _encode_input_image(full_path: str, mime_type: str, max_size: int) -> str:
+    """Blocking part of process_input_image, runs in _image_executor"""
+    image_format = mime_type.split('/')[1].upper()
+    with Image.open(full_path) as image:
+        too_large = max_size > 0 and max(image.size) > max_size
+        if not too_large and image.format == image_format:
+            # Already in the target format and size: send the file bytes as they are
+            _input_image_cache.passthrough += 1
+            with open(full_path, 'rb') as f:
+                b64_data = base64.b64encode(f.read()).decode('utf-8')
+            return f"data:{mime_type};base64,{b64_data}"
+
+        image.load()
+        if too_large:
+            original_size = image.size
+            image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+            _input_image_cache.resized += 1
+            print(f"Downscaled input image {full_path}: {original_size} -> {image.size}")
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image_format == 'PNG':
+            image = _to_png_mode(image)
+
+        with BytesIO() as output:
+            image.save(output, format=image_format)
+            b64_data = base64.b64encode(output.getvalue()).decode('utf-8')
+    return f"data:{mime_type};base64,{b64_data}"
+
+
+async def process_input_image(
+    input_image: str | None,
+    max_size: Optional[int] = None,
+    target_format: Optional[str] = None,
+) -> str | None:
     """
     Process input image and convert to base64 format
 
+    Encoding runs in the image thread pool and the result is cached, so a
+    reference image reused across generations is only encoded once.
+
     Args:
         input_image: Image file path
+        max_size: Optional maximum width/height, larger images are downscaled
+        target_format: Optional mime type to encode to, defaults to the file's own
 
     Returns:
         Base64 encoded image with data URL, or None if no image
@@ -149,28 +339,30 @@ async def process_input_image(input_image: str | None) -> str | None:
 
     try:
         full_path = os.path.join(FILES_DIR, input_image)
-        if not os.path.exists(full_path):
+        try:
+            stat = os.stat(full_path)
+        except FileNotFoundError:
             print(f"Warning: Image file not found: {full_path}")
             return None
 
-        image = Image.open(full_path)
         ext = os.path.splitext(input_image)[1].lower()
-        mime_type_map = {
-            '.png': 'image/png',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.webp': 'image/webp'
-        }
-        mime_type = mime_type_map.get(ext, 'image/jpeg')
-
-        with BytesIO() as output:
-            image.save(output, format=str(mime_type.split('/')[1]).upper())
-            compressed_data = output.getvalue()
-            b64_data = base64.b64encode(compressed_data).decode('utf-8')
-
-        data_url = f"data:{mime_type};base64,{b64_data}"
-        return data_url
+        mime_type = target_format or _INPUT_MIME_TYPES.get(ext, 'image/jpeg')
+        key = (full_path, stat.st_mtime_ns, stat.st_size, mime_type, max_size or 0)
+        return await _input_image_cache.get(
+            key, lambda: _encode_input_image(full_path, mime_type, max_size or 0))
 
     except Exception as e:
         print(f"Error processing image {input_image}: {e}")
         return None
+
+
+async def process_input_images(
+    input_images: list[str],
+    max_size: Optional[int] = None,
+    target_format: Optional[str] = None,
+) -> list[str]:
+    """Process several input images concurrently, keeping their order and skipping failures"""
+    processed = await asyncio.gather(*[
+        process_input_image(image, max_size, target_format) for image in input_images
+    ])
+    return [image for image in processed if image]
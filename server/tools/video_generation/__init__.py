@@ -5,6 +5,7 @@ from .video_canvas_utils import (
     send_video_start_notification,
     send_video_error_notification,
     process_video_result,
+    reuse_cached_video,
 )
 
 __all__ = [
@@ -14,4 +15,5 @@ __all__ = [
     "send_video_start_notification",
     "send_video_error_notification",
     "process_video_result",
+    "reuse_cached_video",
 ]
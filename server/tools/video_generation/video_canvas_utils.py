@@ -3,17 +3,19 @@ Video canvas utilities module
 Contains functions for video processing, canvas operations, and notifications
 """
 
-import json
 import time
 import os
 import asyncio
-from contextlib import asynccontextmanager
+import struct
+import tempfile
 from typing import Dict, List, Any, Tuple, Optional, Union
 from services.config_service import FILES_DIR
+from services.canvas_write_service import canvas_write_coordinator
 from services.db_service import db_service
 from services.websocket_service import send_to_websocket, broadcast_session_update  # type: ignore
 from common import DEFAULT_PORT
 from utils.http_client import HttpClient
+from tools.utils.generation_cache import generation_cache
 import aiofiles
 import mimetypes
 from pymediainfo import MediaInfo
@@ -22,29 +24,11 @@ import random
 from utils.canvas import find_next_best_element_position
 
 
-class CanvasLockManager:
-    """Canvas lock manager to prevent concurrent operations causing position overlap"""
-
-    def __init__(self) -> None:
-        self._locks: Dict[str, asyncio.Lock] = {}
-
-    @asynccontextmanager
-    async def lock_canvas(self, canvas_id: str):
-        if canvas_id not in self._locks:
-            self._locks[canvas_id] = asyncio.Lock()
-
-        async with self._locks[canvas_id]:
-            yield
-
-
-# Global lock manager instance
-canvas_lock_manager = CanvasLockManager()
-
-
 async def save_video_to_canvas(
     session_id: str,
     canvas_id: str,
-    video_url: str
+    video_url: str,
+    tool_call_id: Optional[str] = None
 ) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
     """
     Download video, save to files, create canvas element and return data
@@ -53,35 +37,49 @@ async def save_video_to_canvas(
         session_id: Session ID for notifications
         canvas_id: Canvas ID to add video element
         video_url: URL to download video from
+        tool_call_id: Optional tool call ID for download progress notifications
 
     Returns:
         Tuple of (filename, file_data, new_video_element)
     """
-    # Use lock to ensure atomicity of the save process
-    async with canvas_lock_manager.lock_canvas(canvas_id):
-        # Generate unique video ID
-        video_id = generate_video_file_id()
-
-        # Download and save video
-        print(f"🎥 Downloading video from: {video_url}")
-        mime_type, width, height, extension = await get_video_info_and_save(
-            video_url, os.path.join(FILES_DIR, f"{video_id}")
-        )
-        filename = f"{video_id}.{extension}"
+    # Generate unique video ID
+    video_id = generate_video_file_id()
+
+    # Download and save video outside the canvas lock, it may take a while
+    print(f"🎥 Downloading video from: {video_url}")
+    mime_type, width, height, extension = await get_video_info_and_save(
+        video_url, os.path.join(FILES_DIR, f"{video_id}"), session_id, tool_call_id
+    )
 
-        print(f"🎥 Video saved as: {filename}, dimensions: {width}x{height}")
+    filename = f"{video_id}.{extension}"
 
-        # Create file data
-        file_id = generate_video_file_id()
-        file_url = f"/api/file/{filename}"
+    print(f"🎥 Video saved as: {filename}, dimensions: {width}x{height}")
 
-        file_data: Dict[str, Any] = {
-            "mimeType": mime_type,
-            "id": file_id,
-            "dataURL": file_url,
-            "created": int(time.time() * 1000),
-        }
+    file_data, new_video_element = await place_video_on_canvas(
+        canvas_id, mime_type, width, height, filename)
+    return filename, file_data, new_video_element
 
+
+async def place_video_on_canvas(
+    canvas_id: str,
+    mime_type: str,
+    width: int,
+    height: int,
+    filename: str
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Add a video element for a file already saved under FILES_DIR, returns (file_data, element)"""
+    # Create file data
+    file_id = generate_video_file_id()
+    file_url = f"/api/file/{filename}"
+
+    file_data: Dict[str, Any] = {
+        "mimeType": mime_type,
+        "id": file_id,
+        "dataURL": file_url,
+        "created": int(time.time() * 1000),
+    }
+
+    async def build(positions: List[Tuple[float, float]]):
         # Create new video element for canvas
         new_video_element: Dict[str, Any] = await generate_new_video_element(
             canvas_id,
@@ -90,27 +88,15 @@ async def save_video_to_canvas(
                 "width": width,
                 "height": height,
             },
+            position=positions[0],
         )
+        return [new_video_element], {file_id: file_data}
 
-        # Update canvas data
-        canvas_data: Optional[Dict[str, Any]] = await db_service.get_canvas_data(canvas_id)
-        if canvas_data is None:
-            canvas_data = {}
-        if "data" not in canvas_data:
-            canvas_data["data"] = {}
-        if "elements" not in canvas_data["data"]:
-            canvas_data["data"]["elements"] = []
-        if "files" not in canvas_data["data"]:
-            canvas_data["data"]["files"] = {}
-
-        canvas_data["data"]["elements"].append(
-            new_video_element)  # type: ignore
-        canvas_data["data"]["files"][file_id] = file_data
-
-        # Save updated canvas data
-        await db_service.save_canvas_data(canvas_id, json.dumps(canvas_data["data"]))
+    # Placement and write are serialized per canvas with every other canvas writer
+    elements, _ = await canvas_write_coordinator.place_and_append(
+        canvas_id, [(width, height)], build)
 
-        return filename, file_data, new_video_element
+    return file_data, elements[0]
 
 
 async def send_video_start_notification(session_id: str, message: str) -> None:
@@ -141,6 +127,16 @@ async def send_video_completion_notification(
     )
 
 
+async def send_video_progress_notification(session_id: str, tool_call_id: str, update: str) -> None:
+    """Send WebSocket notification about video download progress"""
+    await send_to_websocket(session_id, {
+        "type": "tool_call_progress",
+        "tool_call_id": tool_call_id,
+        "session_id": session_id,
+        "update": update
+    })
+
+
 async def send_video_error_notification(session_id: str, error_message: str) -> None:
     """Send WebSocket notification about video generation error"""
     print(f"🎥 Video generation error: {error_message}")
@@ -155,11 +151,37 @@ def format_video_success_message(filename: str) -> str:
     return f"video generated successfully ![video_id: {filename}](http://localhost:{DEFAULT_PORT}/api/file/{filename})"
 
 
+async def reuse_cached_video(
+    session_id: str,
+    canvas_id: str,
+    cache_key: str,
+    label: str = "",
+) -> Optional[str]:
+    """Place the video cached under cache_key on the canvas again, returns the tool result or None on a miss"""
+    outputs = generation_cache.get(cache_key)
+    if outputs is None:
+        return None
+    mime_type, width, height, filename = outputs[0]
+    print(f"♻️ Reusing cached video {filename} for {label}")
+    file_data, new_video_element = await place_video_on_canvas(
+        canvas_id, mime_type, width, height, filename)
+    await send_video_completion_notification(
+        session_id=session_id,
+        canvas_id=canvas_id,
+        new_video_element=new_video_element,
+        file_data=file_data,
+        video_url=file_data["dataURL"]
+    )
+    return format_video_success_message(filename)
+
+
 async def process_video_result(
     video_url: str,
     session_id: str,
     canvas_id: str,
-    provider_name: str = ""
+    provider_name: str = "",
+    tool_call_id: Optional[str] = None,
+    cache_key: Optional[str] = None
 ) -> str:
     """
     Complete video processing pipeline: save, update canvas, notify
@@ -169,6 +191,8 @@ async def process_video_result(
         session_id: Session ID for notifications
         canvas_id: Canvas ID to add video element
         provider_name: Name of the provider (for logging)
+        tool_call_id: Optional tool call ID for download progress notifications
+        cache_key: Optional generation cache key to remember the saved file under
 
     Returns:
         Success message with video link
@@ -178,7 +202,8 @@ async def process_video_result(
         filename, file_data, new_video_element = await save_video_to_canvas(
             session_id=session_id,
             canvas_id=canvas_id,
-            video_url=video_url
+            video_url=video_url,
+            tool_call_id=tool_call_id
         )
 
         # Send completion notification
@@ -190,6 +215,10 @@ async def process_video_result(
             video_url=file_data["dataURL"]
         )
 
+        if cache_key is not None:
+            generation_cache.put(cache_key, [(
+                file_data["mimeType"], new_video_element["width"], new_video_element["height"], filename)])
+
         provider_info = f" using {provider_name}" if provider_name else ""
         print(f"🎥 Video generation completed{provider_info}: {filename}")
         return format_video_success_message(filename)
@@ -204,45 +233,169 @@ def generate_video_file_id() -> str:
     return "vi_" + generate(size=8)
 
 
-async def get_video_info_and_save(
-    url: str, file_path_without_extension: str
-) -> Tuple[str, int, int, str]:
-    # Fetch the video asynchronously
-    async with HttpClient.create_aiohttp() as session:
-        async with session.get(url) as response:
-            video_content = await response.read()
+VIDEO_DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# Minimum seconds between two download progress events of one video
+VIDEO_PROGRESS_INTERVAL = 0.5
 
-    # Save to temporary mp4 file first
-    temp_path = f"{file_path_without_extension}.mp4"
-    async with aiofiles.open(temp_path, "wb") as out_file:
-        await out_file.write(video_content)
-    print("🎥 Video saved to", temp_path)
 
+async def get_video_info_and_save(
+    url: str,
+    file_path_without_extension: str,
+    session_id: Optional[str] = None,
+    tool_call_id: Optional[str] = None,
+) -> Tuple[str, int, int, str]:
+    # Stream the video to a temp file in the same directory instead of
+    # buffering it in memory; it only replaces file_path once it is complete
+    # and probed, a failed or cancelled download leaves no partial .mp4
+    file_path = f"{file_path_without_extension}.mp4"
+    fd, temp_path = tempfile.mkstemp(suffix='.download', dir=os.path.dirname(file_path) or None)
+    os.close(fd)
     try:
-        media_info = MediaInfo.parse(temp_path)  # type: ignore
-        width: int = 0
-        height: int = 0
-
-        for track in media_info.tracks:  # type: ignore
-            if track.track_type == "Video":  # type: ignore
-                width = int(track.width or 0)  # type: ignore
-                height = int(track.height or 0)  # type: ignore
-                print(f"Width: {width}, Height: {height}")
-                break
-
-        extension = "mp4"  # Default to mp4, can be flexible based on codec_name
+        await _download_video(url, temp_path, session_id, tool_call_id)
+
+        try:
+            # Probing reads the file, keep it off the event loop
+            width, height = await asyncio.get_running_loop().run_in_executor(
+                None, probe_video_dimensions, temp_path)
+        except Exception as e:
+            print(f"Error probing video file {temp_path}: {str(e)}")
+            raise e
+        print(f"Width: {width}, Height: {height}")
+
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    print("🎥 Video saved to", file_path)
+
+    extension = "mp4"  # Default to mp4, can be flexible based on codec_name
+
+    # Get mime type
+    mime_type = mimetypes.types_map.get(".mp4", "video/mp4")
+
+    print(
+        f"🎥 Video info - width: {width}, height: {height}, mime_type: {mime_type}, extension: {extension}"
+    )
 
-        # Get mime type
-        mime_type = mimetypes.types_map.get(".mp4", "video/mp4")
+    return mime_type, width, height, extension
 
-        print(
-            f"🎥 Video info - width: {width}, height: {height}, mime_type: {mime_type}, extension: {extension}"
-        )
 
-        return mime_type, width, height, extension
+async def _download_video(
+    url: str,
+    file_path: str,
+    session_id: Optional[str] = None,
+    tool_call_id: Optional[str] = None,
+) -> None:
+    """Download in chunks, sending tool_call_progress events when a tool call is known"""
+    async with HttpClient.create_aiohttp() as session:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            total = response.content_length or 0
+            received = 0
+            last_progress_at = 0.0
+            async with aiofiles.open(file_path, "wb") as out_file:
+                async for chunk in response.content.iter_chunked(VIDEO_DOWNLOAD_CHUNK_SIZE):
+                    await out_file.write(chunk)
+                    received += len(chunk)
+                    now = time.monotonic()
+                    if session_id and tool_call_id and now - last_progress_at >= VIDEO_PROGRESS_INTERVAL:
+                        last_progress_at = now
+                        await send_video_progress_notification(
+                            session_id, tool_call_id, _format_download_progress(received, total))
+
+    if session_id and tool_call_id:
+        await send_video_progress_notification(
+            session_id, tool_call_id, _format_download_progress(received, total or received))
+
+
+def _format_download_progress(received: int, total: int) -> str:
+    received_mb = received / (1024 * 1024)
+    if total:
+        return f"Downloading video... {received * 100 // total}% ({received_mb:.1f}/{total / (1024 * 1024):.1f} MB)"
+    return f"Downloading video... {received_mb:.1f} MB"
+
+
+def probe_video_dimensions(file_path: str) -> Tuple[int, int]:
+    """Read width/height from the MP4 track header, falling back to MediaInfo"""
+    try:
+        dimensions = read_mp4_dimensions(file_path)
+        if dimensions:
+            return dimensions
     except Exception as e:
-        print(f"Error probing video file {temp_path}: {str(e)}")
-        raise e
+        print(f"🎥 MP4 header probe failed, falling back to MediaInfo: {e}")
+
+    media_info = MediaInfo.parse(file_path)  # type: ignore
+    for track in media_info.tracks:  # type: ignore
+        if track.track_type == "Video":  # type: ignore
+            return int(track.width or 0), int(track.height or 0)  # type: ignore
+    return 0, 0
+
+
+def _iter_boxes(data: bytes, start: int, end: int):
+    """Yield (type, payload_start, box_end) of the ISO BMFF boxes in data[start:end]"""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack(">I4s", data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, min(offset + size, end)
+        offset += size
+
+
+def read_mp4_dimensions(file_path: str) -> Optional[Tuple[int, int]]:
+    """Find the moov box without reading mdat, and return the first visual track's tkhd size"""
+    with open(file_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        offset = 0
+        moov: Optional[bytes] = None
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            header = f.read(16)
+            size, box_type = struct.unpack(">I4s", header[:8])
+            header_size = 8
+            if size == 1:
+                size = struct.unpack(">Q", header[8:16])[0]
+                header_size = 16
+            elif size == 0:
+                size = file_size - offset
+            if size < header_size:
+                return None
+            if box_type == b"moov":
+                f.seek(offset)
+                moov = f.read(size)
+                break
+            offset += size
+
+    if not moov:
+        return None
+
+    # moov holds the whole box, header included
+    _, moov_start, moov_end = next(_iter_boxes(moov, 0, len(moov)))
+    for moov_child, trak_start, trak_end in _iter_boxes(moov, moov_start, moov_end):
+        if moov_child != b"trak":
+            continue
+        for trak_child, tkhd_start, tkhd_end in _iter_boxes(moov, trak_start, trak_end):
+            if trak_child != b"tkhd":
+                continue
+            version = moov[tkhd_start]
+            # full box header (4) + times/track id/duration (20 or 32) + reserved, layer,
+            # alternate group, volume, reserved, matrix (52)
+            dims_offset = tkhd_start + 4 + (32 if version == 1 else 20) + 52
+            if dims_offset + 8 > tkhd_end:
+                break
+            width, height = struct.unpack(">II", moov[dims_offset:dims_offset + 8])
+            # 16.16 fixed point; audio tracks have 0x0
+            if width and height:
+                return width >> 16, height >> 16
+            break
+    return None
 
 
 async def generate_new_video_element(
@@ -250,15 +403,17 @@ async def generate_new_video_element(
     fileid: str,
     video_data: Dict[str, Any],
     canvas_data: Optional[Dict[str, Any]] = None,
+    position: Optional[Tuple[float, float]] = None,
 ) -> Dict[str, Any]:
-    """Generate new video element for canvas"""
-    if canvas_data is None:
-        canvas = await db_service.get_canvas_data(canvas_id)
-        if canvas is None:
-            canvas = {"data": {}}
-        canvas_data = canvas.get("data", {})
-
-    new_x, new_y = await find_next_best_element_position(canvas_data)
+    """Generate new video element for canvas, at `position` if already laid out"""
+    if position is not None:
+        new_x, new_y = position
+    elif canvas_data is None:
+        # Incrementally maintained layout index of the stored canvas
+        canvas_index = await db_service.get_canvas_index(canvas_id)
+        new_x, new_y = canvas_index.next_position()
+    else:
+        new_x, new_y = await find_next_best_element_position(canvas_data)
 
     return {
         "type": "video",
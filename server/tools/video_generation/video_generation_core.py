@@ -13,7 +13,9 @@ from .video_canvas_utils import (
     send_video_start_notification,
     send_video_error_notification,
     process_video_result,
+    reuse_cached_video,
 )
+from tools.utils.generation_cache import generation_cache
 
 
 async def generate_video_with_provider(
@@ -26,6 +28,7 @@ async def generate_video_with_provider(
     config: Any,
     input_images: Optional[list[str]] = None,
     camera_fixed: bool = True,
+    use_cache: bool = True,
     **kwargs: Any
 ) -> str:
     """
@@ -41,6 +44,7 @@ async def generate_video_with_provider(
         config: Context runtime configuration containing canvas_id, session_id, model_info, injected by langgraph
         input_images: Optional input reference images list
         camera_fixed: Whether to keep camera fixed
+        use_cache: Set to False to skip the cached result, the new result replaces it
 
     Returns:
         str: Generation result message
@@ -72,6 +76,20 @@ async def generate_video_with_provider(
 
         print(f"🎥 Using provider: {provider_name} for {model_name}")
 
+        # The same request was generated before: place its video again
+        cache_key: Optional[str] = None
+        if generation_cache.enabled:
+            cache_key = await generation_cache.make_key(
+                "video", provider_name, model, prompt, input_images,
+                resolution=resolution, duration=duration, aspect_ratio=aspect_ratio,
+                camera_fixed=camera_fixed, **kwargs)
+            # Regenerating skips the cached result, the new one replaces it
+            if use_cache:
+                cached = await reuse_cached_video(
+                    session_id, canvas_id, cache_key, f"{provider_name}/{model_name}")
+                if cached is not None:
+                    return cached
+
         # Create provider instance
         provider_instance = VideoProviderBase.create_provider(provider_name)
 
@@ -105,7 +123,9 @@ async def generate_video_with_provider(
             video_url=video_url,
             session_id=session_id,
             canvas_id=canvas_id,
-            provider_name=f"{model_name} ({provider_name})"
+            provider_name=f"{model_name} ({provider_name})",
+            tool_call_id=tool_call_id,
+            cache_key=cache_key
         )
 
     except Exception as e:
@@ -1,58 +1,377 @@
-from typing import Optional, Dict, Any, Union
-from services.db_service import db_service
+import copy
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple, Iterable
+
+MEDIA_ELEMENT_TYPES = ("image", "embeddable", "video")
+
+
+def _is_media_element(element: Dict[str, Any]) -> bool:
+    return element.get("type") in MEDIA_ELEMENT_TYPES and not element.get("isDeleted")
+
+
+class _Row:
+    """Aggregates of one layout row, enough to answer placement queries"""
+
+    __slots__ = ("count", "sum_y", "min_y", "max_bottom", "right_x", "right_width")
+
+    def __init__(self, x: float, y: float, width: float, height: float):
+        self.count = 1
+        self.sum_y = y
+        self.min_y = y
+        self.max_bottom = y + height
+        self.right_x = x
+        self.right_width = width
+
+    def add(self, x: float, y: float, width: float, height: float) -> None:
+        self.count += 1
+        self.sum_y += y
+        self.min_y = min(self.min_y, y)
+        self.max_bottom = max(self.max_bottom, y + height)
+        # Later elements win ties, like the stable sort by x did
+        if x >= self.right_x:
+            self.right_x = x
+            self.right_width = width
+
+    @property
+    def avg_y(self) -> float:
+        return self.sum_y / self.count
+
+
+class _MaxTree:
+    """Growable segment tree of row bottoms: finds the first row whose bottom is below y"""
+
+    def __init__(self) -> None:
+        self._size = 1
+        self._tree: List[float] = [float("-inf")] * 2
+        self._count = 0
+
+    def append(self, value: float) -> None:
+        if self._count == self._size:
+            leaves = self._tree[self._size:self._size + self._count]
+            self._size *= 2
+            self._tree = [float("-inf")] * (2 * self._size)
+            self._tree[self._size:self._size + len(leaves)] = leaves
+            for i in range(self._size - 1, 0, -1):
+                self._tree[i] = max(self._tree[2 * i], self._tree[2 * i + 1])
+        self._count += 1
+        self.update(self._count - 1, value)
+
+    def update(self, index: int, value: float) -> None:
+        i = index + self._size
+        self._tree[i] = value
+        i //= 2
+        while i:
+            self._tree[i] = max(self._tree[2 * i], self._tree[2 * i + 1])
+            i //= 2
+
+    def first_greater_than(self, y: float) -> Optional[int]:
+        if self._tree[1] <= y:
+            return None
+        i = 1
+        while i < self._size:
+            i = 2 * i if self._tree[2 * i] > y else 2 * i + 1
+        return i - self._size
+
+
+class CanvasSpatialIndex:
+    """
+    Incremental index of media element bounding boxes on one canvas.
+
+    Reproduces the row layout of the original placement algorithm: media
+    elements sorted by (y, x, z-order) join the first row that already holds
+    a vertically overlapping element, and new elements go to the row with
+    the highest average y. Elements arriving in sorted order (the common
+    case for generated media) are added in O(log n); other changes mark the
+    index dirty and the rows are rebuilt in O(n log n) on the next query.
+    """
+
+    def __init__(self, elements: Iterable[Dict[str, Any]] = ()):
+        # id -> (y, x, order, width, height)
+        self._boxes: Dict[str, Tuple[float, float, int, float, float]] = {}
+        self._next_order = 0
+        self._reset_rows()
+        for position, element in enumerate(elements):
+            self.upsert(element, position)
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def _reset_rows(self) -> None:
+        self._rows: List[_Row] = []
+        self._bottoms = _MaxTree()
+        self._last_row: Optional[int] = None
+        self._max_key: Optional[Tuple[float, float, int]] = None
+        self._dirty = False
+
+    def upsert(self, element: Dict[str, Any], position: Optional[int] = None) -> None:
+        """Add or update an element, `position` is its z-order on the canvas"""
+        element_id = element.get("id")
+        if not element_id:
+            return
+        if position is not None:
+            # Non-media elements still take a z-order slot on the canvas
+            self._next_order = max(self._next_order, position + 1)
+        if not _is_media_element(element):
+            self.remove(element_id)
+            return
+
+        previous = self._boxes.get(element_id)
+        if position is not None:
+            order = position
+        elif previous is not None:
+            order = previous[2]
+        else:
+            order = self._next_order
+        self._next_order = max(self._next_order, order + 1)
+
+        box = (
+            element.get("y") or 0,
+            element.get("x") or 0,
+            order,
+            element.get("width") or 0,
+            element.get("height") or 0,
+        )
+        if previous == box:
+            return
+        self._boxes[element_id] = box
+
+        if previous is None and not self._dirty and (self._max_key is None or box[:3] > self._max_key):
+            self._place(box)
+        else:
+            self._dirty = True
+
+    def remove(self, element_id: str) -> None:
+        if self._boxes.pop(element_id, None) is not None:
+            self._dirty = True
+
+    def _place(self, box: Tuple[float, float, int, float, float]) -> None:
+        y, x, _, width, height = box
+        self._max_key = box[:3]
+
+        # Rows only hold elements with a smaller or equal y, so one overlaps
+        # this element iff its bottom is below y (and this element has a height)
+        row_index = self._bottoms.first_greater_than(y) if height > 0 else None
+        if row_index is None:
+            row_index = len(self._rows)
+            self._rows.append(_Row(x, y, width, height))
+            self._bottoms.append(y + height)
+        else:
+            row = self._rows[row_index]
+            row.add(x, y, width, height)
+            self._bottoms.update(row_index, row.max_bottom)
+
+        # y is the largest so far, so averages only grow: the last row (highest
+        # average, latest row on ties) can only be replaced by the row just touched
+        if self._last_row is None or (self._rows[row_index].avg_y, row_index) > (
+                self._rows[self._last_row].avg_y, self._last_row):
+            self._last_row = row_index
+
+    def _rebuild(self) -> None:
+        boxes = sorted(self._boxes.values())
+        self._reset_rows()
+        for box in boxes:
+            self._place(box)
+
+    def next_position(self, max_num_per_row: int = 4, spacing: int = 20) -> Tuple[float, float]:
+        """Position for the next media element, see find_next_best_element_position"""
+        if self._dirty:
+            self._rebuild()
+        if self._last_row is None:
+            return 0, 0
+
+        last_row = self._rows[self._last_row]
+        if last_row.count < max_num_per_row:
+            # Add to the last row, aligned with the top of the row
+            return last_row.right_x + last_row.right_width + spacing, last_row.min_y
+        # Start a new row below the entire last row
+        return 0, last_row.max_bottom + spacing
+
+    def next_positions(
+        self,
+        sizes: Iterable[Tuple[float, float]],
+        max_num_per_row: int = 4,
+        spacing: int = 20,
+    ) -> List[Tuple[float, float]]:
+        """
+        Positions for several new media elements of the given (width, height),
+        placed one after another in a single layout pass. The index itself is
+        not changed: the caller writes the elements, which updates it.
+        """
+        if self._dirty:
+            self._rebuild()
+        layout = self._copy()
+        positions: List[Tuple[float, float]] = []
+        for i, (width, height) in enumerate(sizes):
+            x, y = layout.next_position(max_num_per_row, spacing)
+            positions.append((x, y))
+            layout.upsert({"id": f"\0batch_{i}", "type": "image", "x": x, "y": y,
+                           "width": width, "height": height})
+        return positions
+
+    def _copy(self) -> "CanvasSpatialIndex":
+        clone = CanvasSpatialIndex.__new__(CanvasSpatialIndex)
+        clone._boxes = dict(self._boxes)
+        clone._next_order = self._next_order
+        clone._rows = [copy.copy(row) for row in self._rows]
+        clone._bottoms = copy.copy(self._bottoms)
+        clone._bottoms._tree = list(self._bottoms._tree)
+        clone._last_row = self._last_row
+        clone._max_key = self._max_key
+        clone._dirty = self._dirty
+        return clone
+
+
+class CanvasIndexRegistry:
+    """LRU of per-canvas spatial indexes, kept in sync by DatabaseService"""
+
+    def __init__(self, max_canvases: int = 64):
+        self.max_canvases = max_canvases
+        self._indexes: "OrderedDict[str, CanvasSpatialIndex]" = OrderedDict()
+
+    def get(self, canvas_id: str) -> Optional[CanvasSpatialIndex]:
+        index = self._indexes.get(canvas_id)
+        if index is not None:
+            self._indexes.move_to_end(canvas_id)
+        return index
+
+    def put(self, canvas_id: str, index: CanvasSpatialIndex) -> CanvasSpatialIndex:
+        self._indexes[canvas_id] = index
+        self._indexes.move_to_end(canvas_id)
+        while len(self._indexes) > self.max_canvases:
+            self._indexes.popitem(last=False)
+        return index
+
+    def drop(self, canvas_id: str) -> None:
+        self._indexes.pop(canvas_id, None)
+
+
+class CanvasDocument:
+    """Parsed canvas document: canvas data, name, elements in z-order and files"""
+
+    __slots__ = ("name", "data", "elements", "files", "sessions", "version", "sessions_version", "_positions")
+
+    def __init__(self, name: Optional[str], data: Dict[str, Any], elements: List[Dict[str, Any]],
+                 files: Dict[str, Any], version: int = 0):
+        self.name = name
+        self.data = data
+        self.elements = elements
+        self.files = files
+        # Stamp of the last write applied, see DatabaseService._canvas_written
+        self.version = version
+        self.sessions: Optional[List[Dict[str, Any]]] = None
+        self.sessions_version = 0
+        self._positions: Optional[Dict[Any, int]] = None
+
+    def _ids(self) -> Dict[Any, int]:
+        if self._positions is None:
+            self._positions = {element.get("id"): i for i, element in enumerate(self.elements)}
+        return self._positions
+
+    def replace(self, data: Dict[str, Any], elements: List[Dict[str, Any]], files: Dict[str, Any]) -> None:
+        self.data = data
+        self.elements = list(elements)
+        self.files = dict(files)
+        self._positions = None
+
+    def append(self, elements: List[Dict[str, Any]], files: Dict[str, Any]) -> None:
+        appended_ids = {element.get("id") for element in elements}
+        if not appended_ids.isdisjoint(self._ids()):
+            # Re-appended elements move to the top of the z-order
+            self.elements = [e for e in self.elements if e.get("id") not in appended_ids]
+            self._positions = None
+        ids = self._ids()
+        for element in elements:
+            ids[element.get("id")] = len(self.elements)
+            self.elements.append(element)
+        self.files.update(files)
+
+    def patch(self, element: Dict[str, Any]) -> None:
+        position = self._ids().get(element.get("id"))
+        if position is not None:
+            self.elements[position] = element
+
+    def remove(self, element_ids: Iterable[str]) -> None:
+        removed = set(element_ids)
+        self.elements = [e for e in self.elements if e.get("id") not in removed]
+        self._positions = None
+
+    def invalidate_sessions(self) -> None:
+        self.sessions = None
+        self.sessions_version += 1
+
+    def to_response(self) -> Dict[str, Any]:
+        """The get_canvas_data payload, with copies of the mutable containers"""
+        data = dict(self.data)
+        if data or self.elements or self.files:
+            data["elements"] = list(self.elements)
+            data["files"] = dict(self.files)
+        return {
+            "data": data,
+            "name": self.name,
+            "sessions": list(self.sessions or []),
+        }
+
+
+class CanvasDocumentCache:
+    """LRU of parsed canvas documents, kept in sync by DatabaseService writes"""
+
+    def __init__(self, max_canvases: int = 16):
+        self.max_canvases = max(1, max_canvases)
+        self._documents: "OrderedDict[str, CanvasDocument]" = OrderedDict()
+        # instrumentation
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.updates = 0
+
+    def get(self, canvas_id: str) -> Optional[CanvasDocument]:
+        """Look up a document for a read, counted as a hit or a miss"""
+        document = self._documents.get(canvas_id)
+        if document is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._documents.move_to_end(canvas_id)
+        return document
+
+    def for_write(self, canvas_id: str, version: int) -> Optional[CanvasDocument]:
+        """The cached document to update after a write, if any"""
+        document = self._documents.get(canvas_id)
+        if document is not None:
+            document.version = version
+            self.updates += 1
+        return document
+
+    def put(self, canvas_id: str, document: CanvasDocument) -> CanvasDocument:
+        self._documents[canvas_id] = document
+        self._documents.move_to_end(canvas_id)
+        while len(self._documents) > self.max_canvases:
+            self._documents.popitem(last=False)
+            self.evictions += 1
+        return document
+
+    def drop(self, canvas_id: str) -> None:
+        self._documents.pop(canvas_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "canvases": len(self._documents),
+            "max_canvases": self.max_canvases,
+            "elements": sum(len(document.elements) for document in self._documents.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "write_through_updates": self.updates,
+        }
+
 
 async def find_next_best_element_position(canvas_data, max_num_per_row=4, spacing=20):
     """
     Calculates the next best position for a new element on the canvas.
-    This final version uses a robust row detection algorithm to handle complex layouts.
+    Elements are grouped into rows by vertical overlap; the new element goes
+    to the end of the lowest row, or starts a new row below it when full.
     """
     elements = canvas_data.get("elements", [])
-    
-    media_elements = [
-        e for e in elements 
-        if e.get("type") in ["image", "embeddable", "video"] and not e.get("isDeleted")
-    ]
-
-    if not media_elements:
-        return 0, 0
-
-    # Sort elements by their top-left corner
-    media_elements.sort(key=lambda e: (e.get("y", 0), e.get("x", 0)))
-
-    # Group elements into rows based on vertical overlap
-    rows = []
-    for element in media_elements:
-        y, height = element.get("y", 0), element.get("height", 0)
-        placed = False
-        for row in rows:
-            # Check if the element vertically overlaps with any element in the row
-            if any(max(y, r.get("y", 0)) < min(y + height, r.get("y", 0) + r.get("height", 0)) for r in row):
-                row.append(element)
-                placed = True
-                break
-        if not placed:
-            rows.append([element])
-
-    # Sort rows by their average y-coordinate
-    rows.sort(key=lambda row: sum(e.get("y", 0) for e in row) / len(row))
-
-    if not rows:
-        return 0, 0
-
-    last_row = rows[-1]
-    last_row.sort(key=lambda e: e.get("x", 0))
-
-    if len(last_row) < max_num_per_row:
-        # Add to the last row
-        rightmost_element = last_row[-1]
-        new_x = rightmost_element.get("x", 0) + rightmost_element.get("width", 0) + spacing
-        # Align with the top of the last row for consistency
-        new_y = min(e.get("y", 0) for e in last_row)
-    else:
-        # Start a new row
-        new_x = 0
-        # Position below the entire last row
-        bottom_of_last_row = max(e.get("y", 0) + e.get("height", 0) for e in last_row)
-        new_y = bottom_of_last_row + spacing
-
-    return new_x, new_y
\ No newline at end of file
+    return CanvasSpatialIndex(elements).next_position(max_num_per_row, spacing)
@@ -6,6 +6,10 @@ HTTP 客户端工厂和管理器
 - 连接池管理和超时控制
 - 同步和异步客户端支持
 - 支持代理环境变量 (trust_env=True)
+- 共享的长连接池：create() / create_aiohttp() 复用同一个客户端，避免每次请求都重新握手
+
+共享客户端在启动时通过 HttpClient.open() 创建，在 lifespan 结束时通过
+HttpClient.close() 关闭；代理环境变量变化或调用 HttpClient.reset() 时会重建。
 
 使用指南：
 1. httpx 客户端：
@@ -22,18 +26,51 @@ HTTP 客户端工厂和管理器
        response = client.get("https://api.example.com/data")
 """
 
+import asyncio
+import os
 import ssl
+import time
 import certifi
 import httpx
-from typing import Optional, Dict, Any, AsyncGenerator, Generator
+from typing import Optional, Dict, Any, AsyncGenerator, Generator, Hashable, List, Tuple
 from contextlib import asynccontextmanager, contextmanager
 import aiohttp
 
+# 代理相关的环境变量，变化时重建共享客户端
+PROXY_ENV_VARS = (
+    'HTTP_PROXY', 'HTTPS_PROXY', 'ALL_PROXY', 'NO_PROXY',
+    'http_proxy', 'https_proxy', 'all_proxy', 'no_proxy',
+)
+
+# 被替换下来的客户端延迟关闭，让进行中的请求（最长 timeout=300s）先完成
+RETIRED_CLIENT_CLOSE_DELAY = 310
+
+
+class _SharedClient:
+    """一个共享的 httpx / aiohttp 客户端及其统计信息"""
+
+    def __init__(self, kind: str, client: Any, loop: asyncio.AbstractEventLoop):
+        self.kind = kind
+        self.client = client
+        self.loop = loop
+        self.created_at = time.time()
+        self.uses = 0
+
 
 class HttpClient:
     """HTTP 客户端工厂和管理器"""
 
     _ssl_context: Optional[ssl.SSLContext] = None
+    _shared: Dict[Hashable, _SharedClient] = {}
+    _proxy_signature: Optional[Tuple[Optional[str], ...]] = None
+    _retired: List[_SharedClient] = []
+    _retire_tasks: List['asyncio.Task[None]'] = []
+    _stats: Dict[str, int] = {
+        'shared_uses': 0,
+        'ephemeral_clients': 0,
+        'clients_created': 0,
+        'rebuilds': 0,
+    }
 
     @classmethod
     def _get_ssl_context(cls) -> ssl.SSLContext:
@@ -55,7 +92,7 @@ class HttpClient:
             'timeout': 300,
             'follow_redirects': True,
             'limits': httpx.Limits(
-                max_keepalive_connections=0, max_connections=200, keepalive_expiry=30
+                max_keepalive_connections=50, max_connections=200, keepalive_expiry=30
             ),
             **kwargs,
         }
@@ -72,7 +109,7 @@ class HttpClient:
                 ssl=cls._get_ssl_context(),
                 limit=200,
                 limit_per_host=50,
-                keepalive_timeout=0,
+                keepalive_timeout=30,
             ),
             'timeout': aiohttp.ClientTimeout(total=300),
             'trust_env': trust_env,  # 启用环境变量代理支持
@@ -81,6 +118,143 @@ class HttpClient:
 
         return config
 
+    # ========== 共享客户端 ==========
+
+    @classmethod
+    async def open(cls) -> None:
+        """启动时创建默认的共享客户端"""
+        cls._get_shared('httpx', {})
+        cls._get_shared('aiohttp', {'trust_env': True})
+        print(f"🌐 Shared HTTP clients opened: {len(cls._shared)}")
+
+    @classmethod
+    async def close(cls) -> None:
+        """关闭所有共享客户端（lifespan 结束时调用）"""
+        shared = list(cls._shared.values()) + cls._retired
+        cls._shared.clear()
+        cls._retired = []
+        for task in cls._retire_tasks:
+            task.cancel()
+        cls._retire_tasks.clear()
+        for entry in shared:
+            await cls._close_client(entry)
+
+    @classmethod
+    def reset(cls) -> None:
+        """代理设置变化后调用：之后的请求使用新建的客户端"""
+        if not cls._shared:
+            return
+        cls._stats['rebuilds'] += 1
+        retired = list(cls._shared.values())
+        cls._shared.clear()
+        for entry in retired:
+            cls._retire(entry)
+
+    @classmethod
+    def _retire(cls, entry: _SharedClient) -> None:
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is None or entry.loop is not running_loop or entry.loop.is_closed():
+            return
+
+        cls._retired.append(entry)
+
+        async def close_later() -> None:
+            await asyncio.sleep(RETIRED_CLIENT_CLOSE_DELAY)
+            if entry in cls._retired:
+                cls._retired.remove(entry)
+                await cls._close_client(entry)
+
+        task = running_loop.create_task(close_later())
+        cls._retire_tasks.append(task)
+        task.add_done_callback(lambda t: cls._retire_tasks.remove(t) if t in cls._retire_tasks else None)
+
+    @classmethod
+    async def _close_client(cls, entry: _SharedClient) -> None:
+        try:
+            if entry.kind == 'httpx':
+                await entry.client.aclose()
+            else:
+                await entry.client.close()
+        except Exception as e:
+            print(f"⚠️ Failed to close shared {entry.kind} client: {e}")
+
+    @classmethod
+    def _check_proxy_env(cls) -> None:
+        signature = tuple(os.environ.get(name) for name in PROXY_ENV_VARS)
+        if cls._proxy_signature is not None and signature != cls._proxy_signature:
+            print("🌐 Proxy environment changed, rebuilding shared HTTP clients")
+            cls.reset()
+        cls._proxy_signature = signature
+
+    @classmethod
+    def _get_shared(cls, kind: str, kwargs: Dict[str, Any]) -> Optional[Any]:
+        """获取共享客户端；参数不可哈希或不在事件循环中时返回 None（使用一次性客户端）"""
+        try:
+            loop = asyncio.get_running_loop()
+            # httpx.Timeout 不可哈希，用 repr 作为键
+            options = tuple(sorted(
+                (name, repr(value) if isinstance(value, httpx.Timeout) else value)
+                for name, value in kwargs.items()))
+            key = (kind, options)
+            hash(key)
+        except (RuntimeError, TypeError):
+            return None
+
+        cls._check_proxy_env()
+        entry = cls._shared.get(key)
+        if entry is not None and (entry.loop is not loop or entry.loop.is_closed()):
+            # 客户端绑定在创建它的事件循环上，其他循环只能使用一次性客户端
+            return None
+        if entry is None or cls._is_closed(entry):
+            if kind == 'httpx':
+                client = httpx.AsyncClient(**cls._get_client_config(**kwargs))
+            else:
+                client = aiohttp.ClientSession(**cls._get_aiohttp_config(**kwargs))
+            entry = _SharedClient(kind, client, loop)
+            cls._shared[key] = entry
+            cls._stats['clients_created'] += 1
+
+        entry.uses += 1
+        cls._stats['shared_uses'] += 1
+        return entry.client
+
+    @staticmethod
+    def _is_closed(entry: _SharedClient) -> bool:
+        return bool(entry.client.is_closed if entry.kind == 'httpx' else entry.client.closed)
+
+    @classmethod
+    def get_pool_stats(cls) -> Dict[str, Any]:
+        """共享连接池统计"""
+        clients: List[Dict[str, Any]] = []
+        for (kind, options), entry in cls._shared.items():
+            info: Dict[str, Any] = {
+                'kind': kind,
+                'options': {k: str(v) for k, v in options},
+                'uses': entry.uses,
+                'age_s': round(time.time() - entry.created_at, 1),
+            }
+            if kind == 'httpx':
+                pool = getattr(getattr(entry.client, '_transport', None), '_pool', None)
+                connections = getattr(pool, 'connections', [])
+                info['connections'] = len(connections)
+                info['idle_connections'] = sum(1 for c in connections if c.is_idle())
+            else:
+                connector = entry.client.connector
+                idle = getattr(connector, '_conns', {})
+                info['idle_connections'] = sum(len(conns) for conns in idle.values())
+                info['limit'] = connector.limit if connector else 0
+                info['limit_per_host'] = connector.limit_per_host if connector else 0
+            clients.append(info)
+
+        return {
+            **cls._stats,
+            'retired_pending_close': len(cls._retired),
+            'clients': clients,
+        }
+
     # ========== 工厂方法 ==========
 
     @classmethod
@@ -88,7 +262,13 @@ class HttpClient:
     async def create(
         cls, url: Optional[str] = None, **kwargs: Any
     ) -> AsyncGenerator[httpx.AsyncClient, None]:
-        """创建异步客户端上下文管理器"""
+        """获取异步客户端上下文管理器（优先复用共享客户端，退出时不关闭）"""
+        shared = cls._get_shared('httpx', kwargs)
+        if shared is not None:
+            yield shared
+            return
+
+        cls._stats['ephemeral_clients'] += 1
         config = cls._get_client_config(**kwargs)
         client = httpx.AsyncClient(**config)
         try:
@@ -127,12 +307,18 @@ class HttpClient:
     async def create_aiohttp(
         cls, trust_env: bool = True, **kwargs: Any
     ) -> AsyncGenerator['aiohttp.ClientSession', None]:
-        """创建 aiohttp 客户端上下文管理器
+        """获取 aiohttp 客户端上下文管理器（优先复用共享会话，退出时不关闭）
 
         Args:
             trust_env: 是否信任环境变量代理设置 (HTTP_PROXY, HTTPS_PROXY, etc.)
             **kwargs: 其他 aiohttp.ClientSession 参数
         """
+        shared = cls._get_shared('aiohttp', {'trust_env': trust_env, **kwargs})
+        if shared is not None:
+            yield shared
+            return
+
+        cls._stats['ephemeral_clients'] += 1
         config = cls._get_aiohttp_config(trust_env=trust_env, **kwargs)
         session = aiohttp.ClientSession(**config)
         try:
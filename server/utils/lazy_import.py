@@ -0,0 +1,18 @@
+"""
+Import of objects by dotted path, for things loaded on first use
+"""
+
+import importlib
+from typing import Any
+
+
+def import_object(path: str) -> Any:
+    """'package.module.attr' -> attr of package.module"""
+    module_name, _, attr = path.rpartition('.')
+    if not module_name:
+        raise ImportError(f"Not a dotted path to an object: {path}")
+    module = importlib.import_module(module_name)
+    try:
+        return getattr(module, attr)
+    except AttributeError:
+        raise ImportError(f"{module_name} has no attribute {attr}") from None
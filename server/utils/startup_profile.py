@@ -0,0 +1,135 @@
+"""
+Startup profiling mode: import time per module
+
+Enabled with JAAZ_PROFILE_STARTUP=1 or `python main.py --profile-startup`.
+main.py calls enable() before its other imports. Every module imported from
+then on is timed by wrapping builtins.__import__ and importlib.import_module,
+and report() prints the slowest ones:
+- cumulative: time of the import including the modules it imported
+- self: cumulative minus the nested imports
+mark() records named phases (e.g. the lifespan initialization) printed
+with the report.
+
+Timing overhead is a few microseconds per import statement, don't enable it
+for normal runs.
+"""
+
+import builtins
+import importlib
+import importlib.util
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_original_import = builtins.__import__
+_original_import_module = importlib.import_module
+
+_enabled = False
+_started_at = 0.0
+# module -> [cumulative seconds, self seconds]
+_modules: Dict[str, List[float]] = {}
+# Cumulative time of the nested imports of each import in progress
+_stack: List[float] = []
+_marks: List[Tuple[str, float]] = []
+
+
+def requested(argv: Optional[List[str]] = None) -> bool:
+    argv = sys.argv if argv is None else argv
+    return os.environ.get('JAAZ_PROFILE_STARTUP', '') not in ('', '0') or '--profile-startup' in argv
+
+
+def _timed(name: str, do_import: Any, submodules: Tuple[str, ...] = ()) -> Any:
+    """Time `do_import` if it loads `name` or one of `submodules`"""
+    if name in sys.modules:
+        # `from package import submodule` loads the submodule without __import__
+        submodules = tuple(m for m in submodules if m not in sys.modules)
+        if not submodules:
+            return do_import()
+    else:
+        submodules = ()
+    _stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        return do_import()
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = _stack.pop()
+        if _stack:
+            _stack[-1] += elapsed
+        loaded = [m for m in submodules if m in sys.modules]
+        if not submodules or loaded:
+            record = _modules.setdefault(loaded[0] if loaded else name, [0.0, 0.0])
+            record[0] += elapsed
+            record[1] += elapsed - nested
+
+
+def _profiled_import(name: str, globals: Any = None, locals: Any = None, fromlist: Any = (), level: int = 0) -> Any:
+    if level:
+        # Relative import: time it under its absolute name, package resolved like importlib does
+        globals = globals or {}
+        package = globals.get('__package__')
+        if package is None:
+            spec = globals.get('__spec__')
+            package = spec.parent if spec is not None else globals.get('__name__', '')
+            if spec is None and '__path__' not in globals:
+                package = package.rpartition('.')[0]
+        base = package.rsplit('.', level - 1)[0] if level > 1 else package
+        full_name = f'{base}.{name}' if name else base
+    else:
+        full_name = name
+    submodules = tuple(f'{full_name}.{item}' for item in fromlist or () if item != '*')
+    return _timed(full_name, lambda: _original_import(name, globals, locals, fromlist, level), submodules)
+
+
+def _profiled_import_module(name: str, package: Optional[str] = None) -> Any:
+    full_name = importlib.util.resolve_name(name, package) if name.startswith('.') else name
+    return _timed(full_name, lambda: _original_import_module(name, package))
+
+
+def enable() -> None:
+    global _enabled, _started_at
+    if _enabled:
+        return
+    _enabled = True
+    _started_at = time.perf_counter()
+    builtins.__import__ = _profiled_import
+    importlib.import_module = _profiled_import_module
+
+
+def disable() -> None:
+    global _enabled
+    builtins.__import__ = _original_import
+    importlib.import_module = _original_import_module
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def mark(phase: str) -> None:
+    """Record that `phase` finished, relative to enable()"""
+    if _enabled:
+        _marks.append((phase, time.perf_counter() - _started_at))
+
+
+def get_stats(top: int = 30) -> Dict[str, Any]:
+    by_cumulative = sorted(_modules.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    by_self = sorted(_modules.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    return {
+        'modules': len(_modules),
+        'marks': [{'phase': phase, 'at_s': round(at, 4)} for phase, at in _marks],
+        'cumulative': [{'module': m, 'seconds': round(t[0], 4)} for m, t in by_cumulative],
+        'self': [{'module': m, 'seconds': round(t[1], 4)} for m, t in by_self],
+    }
+
+
+def report(top: int = 30) -> None:
+    stats = get_stats(top)
+    print(f"⏱️ Startup profile: {stats['modules']} modules imported")
+    for item in stats['marks']:
+        print(f"   {item['at_s']:>8.3f}s  {item['phase']}")
+    print(f"   {'cumulative':>10}  {'self':>8}  module")
+    for item in stats['cumulative']:
+        print(f"   {item['seconds']:>9.3f}s  {_modules[item['module']][1]:>7.3f}s  {item['module']}")